@@ -1,9 +1,11 @@
+import asyncio
 from fastapi import FastAPI, HTTPException, status, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 from shared import config, setup_logging, get_logger, db
 from shared.session_middleware import SecureSessionMiddleware
+from shared.security import password_hasher
 from .routes import router
 
 setup_logging("auth-service")
@@ -147,6 +149,12 @@ async def startup_event():
                 logger.error("❌ Redis connection failed")
     except Exception as e:
         logger.error(f"❌ Database initialization failed: {e}")
+    try:
+        loop = asyncio.get_running_loop()
+        params = await loop.run_in_executor(None, password_hasher.calibrate)
+        logger.info(f"✅ Argon2 calibrated: {params}")
+    except Exception as e:
+        logger.error(f"❌ Argon2 calibration failed, using library defaults: {e}")
 
 
 app.include_router(router, prefix="/api/v1/auth")
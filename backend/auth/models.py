@@ -59,6 +59,11 @@ class Token(BaseModel):
     expires_in: int
     user_roles: List[str] = []
     user_permissions: List[str] = []
+    refresh_token: Optional[str] = None
+    refresh_expires_in: Optional[int] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: Optional[str] = None
 
 class RoleResponse(BaseModel):
     id: int
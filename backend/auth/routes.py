@@ -6,18 +6,22 @@ from datetime import datetime, timedelta
 import re
 import hashlib
 import uuid
+from mysql.connector import IntegrityError, errorcode
 from shared import (
-    config, db, verify_password, get_password_hash,
+    config, db,
     create_access_token, verify_token, validate_email,
-    validate_phone, sanitize_input, get_logger, rabbitmq_client, redis_client,
-    migrate_guest_cart_to_user
+    validate_phone, normalize_phone, sanitize_input, get_logger, rabbitmq_client, redis_client,
+    migrate_guest_cart_to_user, refresh_token_store
 )
-from shared.auth_middleware import get_current_user, blacklist_token
+from shared.auth_middleware import get_current_user, require_roles, blacklist_token, get_authz_version, invalidate_user_authorization
+from shared.permission_matrix import permission_matrix
+from shared.login_lookup import LOGIN_NEGATIVE_CACHE_TTL, unknown_login_key, forget_unknown_login_ids
 from shared.session_service import session_service, SessionType
+from shared.cart_migration import get_cart_version
 from shared.session_middleware import get_session, get_session_id, is_new_session
-from shared.security import validate_password_strength
+from shared.security import validate_password_strength, verify_password_async, get_password_hash_async, password_hasher
 from .models import (
-    UserCreate, UserLogin, Token, UserResponse,
+    UserCreate, UserLogin, Token, RefreshRequest, UserResponse,
     RoleResponse, PermissionCheck, HealthResponse
 )
 
@@ -76,6 +80,33 @@ def reset_failed_login(identifier: str):
     except Exception as e:
         logger.error(f"Failed to reset login attempts: {e}")
 
+def classify_login_id(login_id: str) -> List[str]:
+    """Columns to try, in order, for a login identifier. Each one is indexed."""
+    if '@' in login_id:
+        return ['email']
+    if validate_phone(normalize_phone(login_id)):
+        # Digit-only usernames are allowed, so fall back to username
+        return ['phone', 'username'] if validate_username(login_id) else ['phone']
+    return ['username']
+
+def _find_login_user(cursor, login_id: str) -> Optional[dict]:
+    if redis_client.exists(unknown_login_key(login_id)):
+        return None
+    for column in classify_login_id(login_id):
+        value = normalize_phone(login_id) if column == 'phone' else login_id
+        cursor.execute(f"""
+            SELECT
+                id, email, password_hash, first_name, last_name,
+                is_active, email_verified, phone_verified
+            FROM users
+            WHERE {column} = %s
+        """, (value,))
+        user = cursor.fetchone()
+        if user:
+            return user
+    redis_client.setex(unknown_login_key(login_id), LOGIN_NEGATIVE_CACHE_TTL, "1")
+    return None
+
 def validate_username(username: str) -> bool:
     if not username:
         return False
@@ -154,65 +185,84 @@ def _validate_registration_data(email: Optional[str], phone: Optional[str], user
             detail=password_validation["message"]
         )
 
-def _check_existing_users(cursor, email: Optional[str], phone: Optional[str], username: Optional[str]) -> None:
-    if email:
-        cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-        if cursor.fetchone():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-    if phone:
-        cursor.execute("SELECT id FROM users WHERE phone = %s", (phone,))
-        if cursor.fetchone():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Phone number already registered"
-            )
-    if username:
-        cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
-        if cursor.fetchone():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already taken"
-            )
+DUPLICATE_KEY_MESSAGES = {
+    'email': "Email already registered",
+    'phone': "Phone number already registered",
+    'uniq_phone': "Phone number already registered",
+    'username': "Username already taken",
+    'idx_username': "Username already taken",
+}
+
+def _translate_duplicate_key(error: IntegrityError) -> HTTPException:
+    match = re.search(r"for key '(?:\w+\.)?(\w+)'", str(error))
+    key = match.group(1) if match else None
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=DUPLICATE_KEY_MESSAGES.get(key, "Account already exists")
+    )
 
 def _setup_user_account(cursor, user_id: int) -> tuple[list, list]:
-    cursor.execute("SELECT id FROM user_roles WHERE name = 'customer'")
-    role = cursor.fetchone()
-    if role:
+    role_id = permission_matrix.get_role_id('customer')
+    role_ids = []
+    if role_id:
         cursor.execute("""
             INSERT INTO user_role_assignments (user_id, role_id, assigned_by)
             VALUES (%s, %s, %s)
-        """, (user_id, role['id'], user_id))
-        logger.info(f"Customer role assigned to user {user_id}")
+        """, (user_id, role_id, user_id))
+        role_ids.append(role_id)
     cursor.execute("""
         INSERT INTO user_notification_preferences (user_id, notification_method, is_enabled)
         VALUES (%s, 'email', TRUE)
         ON DUPLICATE KEY UPDATE is_enabled = TRUE
     """, (user_id,))
-    cursor.execute("""
-        SELECT
-            ur.name as role_name,
-            p.name as permission_name
-        FROM user_role_assignments ura
-        JOIN user_roles ur ON ura.role_id = ur.id
-        LEFT JOIN role_permissions rp ON ur.id = rp.role_id
-        LEFT JOIN permissions p ON rp.permission_id = p.id
-        WHERE ura.user_id = %s
-    """, (user_id,))
-    roles = set()
-    permissions = set()
-    for row in cursor.fetchall():
-        if row['role_name']:
-            roles.add(row['role_name'])
-        if row['permission_name']:
-            permissions.add(row['permission_name'])
+    roles, permissions = permission_matrix.resolve(role_ids)
     if not roles:
-        roles.add('customer')
-    return list(roles), list(permissions)
+        roles.append('customer')
+    return roles, permissions
+
+def _after_registration(user_data: dict, guest_session_id: Optional[str], user_session_id: Optional[str]):
+    """Post-commit work, run off the request path."""
+    if guest_session_id and guest_session_id != user_session_id:
+        try:
+            migrated_count = migrate_guest_cart_to_user(guest_session_id, user_data['id'])
+            logger.info(f"✅ Migrated {migrated_count} cart items for new user {user_data['id']}")
+        except Exception as e:
+            logger.error(f"Cart migration failed for new user {user_data['id']}: {e}")
+    publish_user_registration_event(user_data)
 
 # ===== AUTH ENDPOINTS =====
+def _access_token_lifetime(session_config) -> timedelta:
+    # Short-lived access tokens once configured; refresh tokens carry the session
+    if config.access_token_expiry_minutes:
+        return timedelta(minutes=config.access_token_expiry_minutes)
+    return timedelta(hours=session_config['token_expiry_hours'])
+
+def _issue_tokens(user_id: int, email: Optional[str], roles: list, permissions: list,
+                  refresh_token: Optional[str] = None) -> Token:
+    """Sign an access token and pair it with a refresh token (a new family unless one is given)."""
+    lifetime = _access_token_lifetime(config.get_session_config())
+    access_token = create_access_token(
+        data={
+            "sub": str(user_id),
+            "email": email,
+            "roles": list(roles),
+            "permissions": list(permissions),
+            "authz_ver": get_authz_version(user_id, use_local=False)
+        },
+        expires_delta=lifetime
+    )
+    if refresh_token is None:
+        refresh_token = refresh_token_store.issue(user_id, email)
+    return Token(
+        access_token=access_token,
+        token_type="bearer",
+        expires_in=int(lifetime.total_seconds()),
+        user_roles=list(roles),
+        user_permissions=list(permissions),
+        refresh_token=refresh_token,
+        refresh_expires_in=refresh_token_store.ttl if refresh_token else None
+    )
+
 @router.post("/register", response_model=Token)
 async def register_user(
         user_data: UserCreate,
@@ -228,7 +278,7 @@ async def register_user(
                 detail="Service is under maintenance. Registration is temporarily unavailable."
             )
         email = user_data.email
-        phone = user_data.phone
+        phone = normalize_phone(user_data.phone)
         username = user_data.username
         password = user_data.password
         first_name = user_data.first_name
@@ -239,100 +289,81 @@ async def register_user(
         first_name = sanitize_input(first_name)
         last_name = sanitize_input(last_name)
         _validate_registration_data(email, phone, username, password)
-        with db.get_cursor() as cursor:
-            _check_existing_users(cursor, email, phone, username)
-            password_hash = get_password_hash(password)
-            cursor.execute("""
-                INSERT INTO users (email, phone, username, password_hash, first_name, last_name, country_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (email, phone, username, password_hash, first_name, last_name, country_id))
-            user_id = cursor.lastrowid
-            logger.info(f"User created with ID: {user_id}")
-            roles, permissions = _setup_user_account(cursor, user_id)
-            ip_address = request.client.host if request.client else 'unknown'
-            user_agent = request.headers.get("user-agent", "")
-            current_session_id = get_session_id(request)
-            logger.info(f"🔄 Current guest session before registration: {current_session_id}")
-            session_service.invalidate_all_user_sessions(user_id)
-            user_session = session_service.get_or_create_user_session(user_id, ip_address, user_agent)
-            if not user_session:
-                logger.error(f"Failed to create user session for user {user_id}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to create user session"
-                )
-            logger.info(f"✅ Created user session: {user_session.session_id} for user {user_id}")
-            migrated_count = 0
-            if current_session_id and current_session_id != user_session.session_id:
-                logger.info(f"🔄 Migrating cart from guest session {current_session_id} to user session {user_session.session_id}")
-                migrated_count = migrate_guest_cart_to_user(current_session_id, user_id)
-                updated_user_session = session_service.get_session(user_session.session_id)
-                if updated_user_session and updated_user_session.cart_items:
-                    actual_items_count = len(updated_user_session.cart_items)
-                    logger.info(f"✅ Cart migration verified: {actual_items_count} items in user session")
-                else:
-                    logger.warning("❌ Cart migration may have failed - no items in user session")
-            else:
-                logger.info("🔄 No guest session found or session already belongs to user")
-            if user_session and response:
-                session_config = config.get_session_config()
-                session_timeout = session_config.get('user_session_duration', 2592000)
-                response.delete_cookie(
-                    key="guest_id",
-                    path="/",
-                    secure=not config.debug_mode,
-                    httponly=True,
-                    samesite="Lax"
-                )
-                samesite_value = "Lax" if config.debug_mode else "None"
-                secure_cookie = not config.debug_mode
-                response.set_cookie(
-                    key="session_id",
-                    value=user_session.session_id,
-                    max_age=session_timeout,
-                    httponly=True,
-                    secure=secure_cookie,
-                    samesite=samesite_value,
-                    path="/"
-                )
-                response.set_cookie(
-                    key="guest_id",
-                    value=f"user_{user_id}",
-                    max_age=session_timeout,
-                    httponly=True,
-                    secure=secure_cookie,
-                    samesite=samesite_value,
-                    path="/"
-                )
-                request.state.session = user_session
-                request.state.session_id = user_session.session_id
-                logger.info(f"Set user session cookie for user {user_id}: {user_session.session_id}")
-            if background_tasks:
-                cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-                user = cursor.fetchone()
-                background_tasks.add_task(
-                    publish_user_registration_event,
-                    user
-                )
-            session_config = config.get_session_config()
-            token_expiry_hours = session_config['token_expiry_hours']
-            access_token = create_access_token(
-                data={
-                    "sub": str(user_id),
-                    "email": email,
-                    "roles": roles,
-                    "permissions": permissions
-                },
-                expires_delta=timedelta(hours=token_expiry_hours)
+        password_hash = await get_password_hash_async(password)
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO users (email, phone, username, password_hash, first_name, last_name, country_id)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """, (email, phone, username, password_hash, first_name, last_name, country_id))
+                user_id = cursor.lastrowid
+                roles, permissions = _setup_user_account(cursor, user_id)
+        except IntegrityError as e:
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                raise _translate_duplicate_key(e)
+            raise
+        logger.info(f"User created with ID: {user_id}")
+        forget_unknown_login_ids(email, phone, username)
+        ip_address = request.client.host if request.client else 'unknown'
+        user_agent = request.headers.get("user-agent", "")
+        current_session_id = get_session_id(request)
+        user_session = session_service.get_or_create_user_session(user_id, ip_address, user_agent)
+        if not user_session:
+            logger.error(f"Failed to create user session for user {user_id}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to create user session"
+            )
+        logger.info(f"✅ Created user session: {user_session.session_id} for user {user_id}")
+        session_config = config.get_session_config()
+        if response:
+            session_timeout = session_config.get('user_session_duration', 2592000)
+            response.delete_cookie(
+                key="guest_id",
+                path="/",
+                secure=not config.debug_mode,
+                httponly=True,
+                samesite="Lax"
+            )
+            samesite_value = "Lax" if config.debug_mode else "None"
+            secure_cookie = not config.debug_mode
+            response.set_cookie(
+                key="session_id",
+                value=user_session.session_id,
+                max_age=session_timeout,
+                httponly=True,
+                secure=secure_cookie,
+                samesite=samesite_value,
+                path="/"
             )
-            logger.info(f"User registered successfully: {email or phone or username} with {migrated_count} cart items migrated")
-            return Token(
-                access_token=access_token,
-                token_type="bearer",
-                expires_in=token_expiry_hours * 3600,
-                user_roles=roles,
-                user_permissions=permissions
+            response.set_cookie(
+                key="guest_id",
+                value=f"user_{user_id}",
+                max_age=session_timeout,
+                httponly=True,
+                secure=secure_cookie,
+                samesite=samesite_value,
+                path="/"
             )
+            request.state.session = user_session
+            request.state.session_id = user_session.session_id
+            logger.info(f"Set user session cookie for user {user_id}: {user_session.session_id}")
+        registered_user = {
+            'id': user_id,
+            'email': email,
+            'phone': phone,
+            'username': username,
+            'first_name': first_name,
+            'last_name': last_name,
+            'country_id': country_id,
+            'created_at': datetime.utcnow()
+        }
+        if background_tasks is not None:
+            background_tasks.add_task(_after_registration, registered_user, current_session_id, user_session.session_id)
+        else:
+            _after_registration(registered_user, current_session_id, user_session.session_id)
+        logger.info(f"User registered successfully: {email or phone or username}")
+        return _issue_tokens(user_id, email, roles, permissions)
     except HTTPException:
         raise
     except Exception as e:
@@ -345,6 +376,7 @@ async def register_user(
 @router.post("/login", response_model=Token)
 async def login_user(
         login_data: UserLogin,
+        background_tasks: BackgroundTasks = None,
         request: Request = None,
         response: Response = None
 ):
@@ -370,21 +402,14 @@ async def login_user(
             )
         logger.info(f"Login attempt for: {login_data.login_id}")
         with db.get_cursor() as cursor:
-            cursor.execute("""
-                SELECT
-                    id, email, password_hash, first_name, last_name,
-                    is_active, email_verified, phone_verified
-                FROM users
-                WHERE email = %s OR phone = %s OR username = %s
-            """, (login_data.login_id, login_data.login_id, login_data.login_id))
-            user = cursor.fetchone()
+            user = _find_login_user(cursor, login_data.login_id.strip())
             if not user:
                 logger.warning(f"User not found: {login_data.login_id}")
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Invalid credentials"
                 )
-            if not verify_password(login_data.password, user['password_hash']):
+            if not await verify_password_async(login_data.password, user['password_hash']):
                 logger.warning(f"Invalid password for user: {user['email']}")
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -397,25 +422,10 @@ async def login_user(
                     detail="Account is deactivated"
                 )
             reset_failed_login(client_identifier)
-            cursor.execute("""
-                SELECT
-                    ur.name as role_name,
-                    p.name as permission_name
-                FROM user_role_assignments ura
-                JOIN user_roles ur ON ura.role_id = ur.id
-                LEFT JOIN role_permissions rp ON ur.id = rp.role_id
-                LEFT JOIN permissions p ON rp.permission_id = p.id
-                WHERE ura.user_id = %s
-            """, (user['id'],))
-            roles = set()
-            permissions = set()
-            for row in cursor.fetchall():
-                if row['role_name']:
-                    roles.add(row['role_name'])
-                if row['permission_name']:
-                    permissions.add(row['permission_name'])
+            role_ids = permission_matrix.get_user_role_ids(cursor, user['id'])
+            roles, permissions = permission_matrix.resolve(role_ids)
             if not roles:
-                roles.add('customer')
+                roles.append('customer')
             current_session_id = get_session_id(request)
             logger.info(f"🔄 Current guest session before login: {current_session_id}")
             ip_address = request.client.host if request.client else 'unknown'
@@ -430,21 +440,15 @@ async def login_user(
                 )
             logger.info(f"✅ User session: {user_session.session_id} for user {user['id']}")
             migrated_count = 0
+            cart_migration_pending = False
             if current_session_id and current_session_id != user_session.session_id:
-                logger.info(f"🔄 Migrating cart from guest {current_session_id} to user {user_session.session_id}")
-                guest_session = session_service.get_session(current_session_id)
-                guest_cart_count = len(guest_session.cart_items) if guest_session and guest_session.cart_items else 0
-                logger.info(f"📦 Guest cart has {guest_cart_count} items before migration")
-                migrated_count = migrate_guest_cart_to_user(current_session_id, user['id'])
-                cursor.execute("""
-                    SELECT COUNT(*) as db_count, SUM(quantity) as total_qty 
-                    FROM shopping_cart 
-                    WHERE user_id = %s
-                """, (user['id'],))
-                db_result = cursor.fetchone()
-                db_count = db_result['db_count'] or 0
-                total_qty = db_result['total_qty'] or 0
-                logger.info(f"✅ Migration result: {migrated_count} items migrated, DB now has {db_count} items, {total_qty} total quantity")
+                if config.defer_cart_migration and background_tasks is not None:
+                    background_tasks.add_task(migrate_guest_cart_to_user, current_session_id, user['id'])
+                    cart_migration_pending = True
+                    logger.info(f"🔄 Cart migration from guest {current_session_id} deferred until after login")
+                else:
+                    migrated_count = migrate_guest_cart_to_user(current_session_id, user['id'])
+                    logger.info(f"✅ Migration result: {migrated_count} items migrated")
             else:
                 logger.info("🔄 No guest session found or session already belongs to user")
             if user_session and response:
@@ -467,25 +471,11 @@ async def login_user(
                 request.state.session_id = user_session.session_id
                 logger.info(f"✅ Session cookies set for user {user['id']}: {user_session.session_id}")
             cursor.execute("UPDATE users SET last_login = NOW() WHERE id = %s", (user['id'],))
-            token_expiry_hours = session_config['token_expiry_hours']
-            access_token = create_access_token(
-                data={
-                    "sub": str(user['id']),
-                    "email": user['email'],
-                    "roles": list(roles),
-                    "permissions": list(permissions)
-                },
-                expires_delta=timedelta(hours=token_expiry_hours)
-            )
-            response_data = Token(
-                access_token=access_token,
-                token_type="bearer",
-                expires_in=token_expiry_hours * 3600,
-                user_roles=list(roles),
-                user_permissions=list(permissions)
-            )
+            response_data = _issue_tokens(user['id'], user['email'], roles, permissions)
             if response:
                 response.headers["X-Cart-Migrated"] = str(migrated_count)
+                response.headers["X-Cart-Migration"] = "pending" if cart_migration_pending else "complete"
+                response.headers["X-Cart-Version"] = str(get_cart_version(user['id']))
                 response.headers["X-User-Session"] = user_session.session_id
             logger.info(f"Login successful for user: {user['email']} with {migrated_count} cart items migrated")
             return response_data
@@ -502,10 +492,13 @@ async def login_user(
 async def logout_user(
         request: Request,
         response: Response,
+        refresh: Optional[RefreshRequest] = None,
         current_user: dict = Depends(get_current_user)
 ):
     try:
         user_id = current_user['sub']
+        if refresh and refresh.refresh_token:
+            refresh_token_store.revoke(refresh.refresh_token, user_id)
         auth_header = request.headers.get("Authorization")
         session_id = get_session_id(request)
         if session_id:
@@ -540,44 +533,51 @@ async def logout_user(
 @router.post("/refresh", response_model=Token)
 async def refresh_token(
         request: Request,
+        refresh: Optional[RefreshRequest] = None,
         response: Response = None
 ):
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    token = auth_header[7:]
-    payload = verify_token(token)
-    if not payload:
+    if not refresh or not refresh.refresh_token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token"
+            detail="Refresh token required"
         )
+    family, next_refresh_token = refresh_token_store.rotate(refresh.refresh_token)
+    user_id = family['user_id']
+    with db.get_cursor() as cursor:
+        cursor.execute("SELECT is_active FROM users WHERE id = %s", (user_id,))
+        user = cursor.fetchone()
+        if not user or not user['is_active']:
+            refresh_token_store.revoke(next_refresh_token)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found or inactive"
+            )
+        role_ids = permission_matrix.get_user_role_ids(cursor, user_id)
+    roles, permissions = permission_matrix.resolve(role_ids)
     session_id = get_session_id(request)
     if session_id:
         session_service.update_session_activity(session_id)
-        logger.info(f"Session activity refreshed for user {payload['sub']}")
-    session_config = config.get_session_config()
-    token_expiry_hours = session_config['token_expiry_hours']
-    new_token = create_access_token(
-        data={
-            "sub": payload['sub'],
-            "email": payload.get('email'),
-            "roles": payload.get('roles', []),
-            "permissions": payload.get('permissions', [])
-        },
-        expires_delta=timedelta(hours=token_expiry_hours)
-    )
-    logger.info(f"Token refreshed successfully for user {payload['sub']}")
-    return Token(
-        access_token=new_token,
-        token_type="bearer",
-        expires_in=token_expiry_hours * 3600,
-        user_roles=payload.get('roles', []),
-        user_permissions=payload.get('permissions', [])
-    )
+    logger.info(f"Refresh token rotated for user {user_id}")
+    return _issue_tokens(user_id, family['email'], roles, permissions, refresh_token=next_refresh_token)
+
+@router.post("/logout-all")
+async def logout_all_devices(
+        request: Request,
+        response: Response,
+        current_user: dict = Depends(get_current_user)
+):
+    user_id = int(current_user['sub'])
+    refresh_token_store.revoke_all(user_id)
+    # Drops cached principals; stateless access tokens fail their authz version check
+    invalidate_user_authorization(user_id)
+    session_service.invalidate_all_user_sessions(user_id)
+    auth_header = request.headers.get("Authorization")
+    if auth_header and auth_header.startswith("Bearer "):
+        blacklist_token(auth_header[7:])
+    response.delete_cookie(key="session_id", path="/")
+    response.delete_cookie(key="guest_id", path="/")
+    logger.info(f"User {user_id} logged out from all devices")
+    return {"message": "Logged out from all devices"}
 
 # ===== PASSWORD MANAGEMENT =====
 @router.post("/forgot-password")
@@ -635,8 +635,8 @@ async def reset_password(token: str = Form(...), new_password: str = Form(...)):
         if len(new_password) < 8:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                                 detail="Password must be at least 8 characters long")
+        new_password_hash = await get_password_hash_async(new_password)
         with db.get_cursor() as cursor:
-            new_password_hash = get_password_hash(new_password)
             cursor.execute("UPDATE users SET password_hash = %s WHERE id = %s", (new_password_hash, user_id))
             cursor.execute("INSERT INTO password_history (user_id, password_hash) VALUES (%s, %s)",
                            (user_id, new_password_hash))
@@ -644,8 +644,11 @@ async def reset_password(token: str = Form(...), new_password: str = Form(...)):
                 redis_client.delete(f"password_reset:{user_id}")
             except Exception as e:
                 logger.warning(f"Failed to delete reset token from Redis: {e}")
-            logger.info(f"Password reset successful for user {user_id}")
-            return {"message": "Password reset successfully"}
+        # Whoever held the old password may still hold refresh or access tokens
+        refresh_token_store.revoke_all(user_id)
+        invalidate_user_authorization(user_id)
+        logger.info(f"Password reset successful for user {user_id}")
+        return {"message": "Password reset successfully"}
     except HTTPException:
         raise
     except Exception as e:
@@ -1042,6 +1045,11 @@ async def debug_session_test(request: Request):
         "client_ip": request.client.host if request.client else 'unknown'
     }
 
+@router.get("/metrics/password-hashing")
+async def password_hashing_metrics(request: Request):
+    await require_roles(['admin'], request)
+    return password_hasher.metrics()
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     try:
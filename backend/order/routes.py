@@ -4,8 +4,9 @@ from decimal import Decimal
 import json
 from datetime import datetime
 
-from shared import config, db, sanitize_input, get_logger, rabbitmq_client, redis_client
+from shared import config, db, sanitize_input, get_logger, rabbitmq_client, redis_client, product_catalog
 from shared.auth_middleware import get_current_user
+from shared.conditional import content_versions
 from .models import (
     OrderCreate, OrderResponse, OrderWithItemsResponse,
     OrderListResponse, HealthResponse, OrderStatus, PaymentStatus,
@@ -15,6 +16,9 @@ from .models import (
 router = APIRouter()
 logger = get_logger(__name__)
 
+# The product service's search and facet indexes reload a product announced here
+PRODUCT_EVENTS_CHANNEL = "product_search:events"
+
 
 def require_roles(required_roles: List[str]):
     def role_dependency(current_user: dict = Depends(get_current_user)):
@@ -71,6 +75,12 @@ def get_cached_user_orders(user_id: int) -> Optional[dict]:
         return None
 
 
+def announce_product_changes(product_ids):
+    """Call after committing stock or total_sold changes to these products."""
+    for product_id in product_ids:
+        redis_client.publish(PRODUCT_EVENTS_CHANNEL, f"order:{product_id}")
+
+
 def invalidate_order_cache(order_id: int, user_id: int = None):
     try:
         keys = [f"order:{order_id}"]
@@ -168,15 +178,17 @@ async def create_order(
             try:
                 subtotal = Decimal('0')
                 items_data = []
+                # One read of every ordered product, inside the transaction and past the caches
+                products = product_catalog.get_many(
+                    [item.product_id for item in order_data.items],
+                    fields=('name', 'sku', 'main_image_url', 'base_price', 'gst_rate',
+                            'stock_quantity', 'stock_status', 'low_stock_threshold'),
+                    fresh=True,
+                    cursor=cursor
+                )
 
                 for item in order_data.items:
-                    cursor.execute("""
-                        SELECT name, sku, main_image_url, base_price, gst_rate,
-                               stock_quantity, stock_status, low_stock_threshold
-                        FROM products
-                        WHERE id = %s AND status = 'active'
-                    """, (item.product_id,))
-                    product = cursor.fetchone()
+                    product = products.get(item.product_id)
 
                     if not product:
                         raise HTTPException(
@@ -295,6 +307,10 @@ async def create_order(
                     """, (item['quantity'], item['quantity'], item['quantity'], item['quantity'], item['product_id']))
 
                 connection.commit()
+                ordered_ids = {item['product_id'] for item in items_data}
+                content_versions.bump(*{f"product:{product_id}" for product_id in ordered_ids})
+                product_catalog.invalidate(*ordered_ids)
+                announce_product_changes(ordered_ids)
 
                 cursor.execute("SELECT * FROM orders WHERE id = %s", (order_id,))
                 order = cursor.fetchone()
@@ -736,6 +752,19 @@ async def cancel_order(
                     updated_order,
                     'cancelled'
                 )
+                # Restocked products: bump after the cursor commits
+                background_tasks.add_task(
+                    content_versions.bump,
+                    *{f"product:{item['product_id']}" for item in order_items}
+                )
+                background_tasks.add_task(
+                    product_catalog.invalidate,
+                    *{item['product_id'] for item in order_items}
+                )
+                background_tasks.add_task(
+                    announce_product_changes,
+                    {item['product_id'] for item in order_items}
+                )
 
             invalidate_order_cache(order_id, user_id)
             logger.info(f"Order {order_id} cancelled by user {user_id}")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Cached product detail benchmark
+Run with: python backend/product/benchmark_response_cache.py
+
+Serves the same cached product two ways through FastAPI's TestClient, with a
+dict standing in for Redis so only the request path is measured:
+  before - json.loads of the cached dict, ProductResponse(**data), then
+           response_model validation and serialization by FastAPI
+  after  - the stored "<etag>\\n<body>" entry returned as a raw Response,
+           as shared.response_cache does
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from fastapi import FastAPI, Response  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from models import ProductResponse  # noqa: E402
+
+REQUESTS = 3000
+WARMUP = 200
+
+
+def sample_product() -> ProductResponse:
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    return ProductResponse(
+        id=1, uuid="9b2f6f1e-0000-4000-8000-000000000001", name="Handwoven Cotton Saree",
+        sku="SAR-0001", slug="handwoven-cotton-saree",
+        short_description="Soft handwoven cotton saree",
+        description="A breathable handwoven cotton saree with a contrast border. " * 8,
+        base_price=2499.0, compare_price=2999.0, category_id=3, brand_id=2,
+        specification={'material': 'cotton', 'length_m': 6.3, 'blouse_piece': True,
+                       'care': ['hand wash', 'dry in shade'], 'origin': 'India'},
+        gst_rate=5.0, is_gst_inclusive=True, track_inventory=True, stock_quantity=40,
+        low_stock_threshold=5, stock_status="in_stock", product_type="simple", weight_grams=650.0,
+        main_image_url="/uploads/products/saree_1.jpg",
+        image_gallery=[f"/uploads/products/saree_1_{n}.jpg" for n in range(6)],
+        status="active", is_featured=True, is_trending=False, is_bestseller=True,
+        view_count=1520, wishlist_count=88, total_sold=310, created_at=now, updated_at=now
+    )
+
+
+def build_app() -> FastAPI:
+    product = sample_product()
+    body = product.model_dump_json()
+    etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+    store = {
+        'product:1': json.dumps(product.model_dump(mode='json')),
+        'response:product:1': f"{etag}\n{body}",
+    }
+    app = FastAPI()
+
+    @app.get("/before/{product_id}", response_model=ProductResponse)
+    async def before(product_id: int):
+        return ProductResponse(**json.loads(store[f"product:{product_id}"]))
+
+    @app.get("/after/{product_id}", response_model=ProductResponse)
+    async def after(product_id: int):
+        cached_etag, _, cached_body = store[f"response:product:{product_id}"].partition("\n")
+        return Response(content=cached_body, media_type="application/json", headers={'ETag': cached_etag})
+
+    return app
+
+
+def run(client: TestClient, path: str) -> float:
+    for _ in range(WARMUP):
+        client.get(path)
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        client.get(path)
+    return REQUESTS / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    with TestClient(build_app()) as client:
+        assert client.get("/before/1").json() == client.get("/after/1").json()
+        before = run(client, "/before/1")
+        after = run(client, "/after/1")
+    print(f"{'before (model rebuild)':<28} {before:8.0f} req/s")
+    print(f"{'after (raw cached body)':<28} {after:8.0f} req/s")
+    print(f"Speed-up: {after / before:.2f}x")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Listing decode micro-benchmark
+Run with: python backend/product/benchmark_row_decoder.py
+
+Compares decoding specification/image_gallery for 100 product rows stored as
+Python literals (parsed with ast.literal_eval) against JSON columns decoded by
+row_decoder.
+"""
+
+import ast
+import os
+import sys
+import timeit
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+import row_decoder  # noqa: E402
+
+ROWS = 100
+REPEAT = 5
+NUMBER = 50
+
+
+def sample_rows():
+    rows = []
+    for i in range(ROWS):
+        specification = {
+            'brand': f'Brand {i}',
+            'material': 'cotton',
+            'dimensions': {'length_cm': 30 + i, 'width_cm': 20, 'height_cm': 5},
+            'features': ['washable', 'handmade', 'eco friendly'],
+            'warranty_months': 12,
+            'in_box': None,
+            'returnable': True
+        }
+        image_gallery = [f'https://cdn.example.com/uploads/products/product_{i}_{n}.jpg' for n in range(6)]
+        rows.append({
+            'literal': {'specification': str(specification), 'image_gallery': str(image_gallery),
+                        'main_image_url': image_gallery[0]},
+            'json': {'specification': row_decoder.encode_json_column(specification),
+                     'image_gallery': row_decoder.encode_json_column(image_gallery),
+                     'main_image_url': image_gallery[0]}
+        })
+    return rows
+
+
+def decode_literal(rows):
+    for row in rows:
+        product = row['literal']
+        ast.literal_eval(product['specification'])
+        row_decoder.normalize_image_urls(ast.literal_eval(product['image_gallery']))
+        row_decoder.normalize_image_urls(product['main_image_url'])
+
+
+def decode_json(rows):
+    for row in rows:
+        row_decoder.decode_product_row(row['json'])
+
+
+def report(name, func, rows):
+    best = min(timeit.repeat(lambda: func(rows), repeat=REPEAT, number=NUMBER)) / NUMBER
+    print(f"{name:<28} {best * 1000:8.3f} ms per {ROWS} rows")
+    return best
+
+
+if __name__ == "__main__":
+    rows = sample_rows()
+    print(f"JSON backend: {row_decoder._json_loads.__module__}")
+    literal = report("ast.literal_eval", decode_literal, rows)
+    decoded = report("row_decoder (JSON)", decode_json, rows)
+    print(f"Speed-up: {literal / decoded:.1f}x")
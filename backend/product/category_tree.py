@@ -0,0 +1,148 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from shared import db, get_logger
+from shared.conditional import content_versions
+from .row_decoder import normalize_image_urls
+
+logger = get_logger(__name__)
+
+TREE_QUERY = """
+    SELECT id, uuid, name, slug, description, parent_id, image_url, is_active, sort_order
+    FROM categories
+    WHERE is_active = 1
+    ORDER BY sort_order, name
+"""
+
+
+class _Snapshot:
+    """One immutable build of the tree.
+
+    The Euler tour lists every category in depth-first order; a category's
+    descendants are exactly order[enter[id]:exit[id]], so subtree queries are
+    a slice instead of recursive SQL.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.nodes: Dict[int, Dict[str, Any]] = {}
+        self.children: Dict[Optional[int], List[int]] = {}
+        for row in rows:
+            node = {
+                'id': row['id'],
+                'uuid': row['uuid'],
+                'name': row['name'],
+                'slug': row['slug'],
+                'description': row['description'],
+                'parent_id': row['parent_id'],
+                'image_url': normalize_image_urls(row['image_url']),
+                'is_active': bool(row['is_active']),
+                'sort_order': row['sort_order']
+            }
+            self.nodes[node['id']] = node
+        # rows arrive sorted, so sibling lists keep sort_order, name
+        for node in self.nodes.values():
+            self.children.setdefault(node['parent_id'], []).append(node['id'])
+        self.order: List[int] = []
+        self.enter: Dict[int, int] = {}
+        self.exit: Dict[int, int] = {}
+        self.depth: Dict[int, int] = {}
+        self.roots = list(self.children.get(None, []))
+        for root in self.roots:
+            self._tour(root)
+        # Categories under an inactive or missing parent are not reachable from navigation
+        for category_id in [category_id for category_id in self.nodes if category_id not in self.enter]:
+            del self.nodes[category_id]
+
+    def _tour(self, root: int):
+        stack = [(root, 0, False)]
+        while stack:
+            category_id, depth, leaving = stack.pop()
+            if leaving:
+                self.exit[category_id] = len(self.order)
+                continue
+            if category_id in self.enter:
+                continue
+            self.enter[category_id] = len(self.order)
+            self.depth[category_id] = depth
+            self.order.append(category_id)
+            stack.append((category_id, depth, True))
+            for child in reversed(self.children.get(category_id, [])):
+                stack.append((child, depth + 1, False))
+
+    def subtree(self, category_id: int) -> List[int]:
+        if category_id not in self.enter:
+            return []
+        return self.order[self.enter[category_id]:self.exit[category_id]]
+
+    def nested(self, category_id: int) -> Dict[str, Any]:
+        node = dict(self.nodes[category_id])
+        node['depth'] = self.depth[category_id]
+        node['children'] = [self.nested(child) for child in self.children.get(category_id, []) if child in self.nodes]
+        return node
+
+
+class CategoryTree:
+    """All active categories held in-process as a tree.
+
+    Rebuilt from MySQL when the "categories" content version changes (checked
+    at most every check_interval seconds), or after max_age seconds when Redis
+    cannot report a version.
+    """
+
+    def __init__(self, check_interval: int = 30, max_age: int = 300):
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._snapshot: Optional[_Snapshot] = None
+        self._version: Optional[str] = None
+        self._built_at = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _needs_rebuild(self, force_check: bool = False) -> bool:
+        if self._snapshot is None:
+            return True
+        now = time.time()
+        if not force_check and now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        version = content_versions.current("categories")
+        if version is None:
+            return now - self._built_at > self.max_age
+        return version != self._version
+
+    def snapshot(self, force_check: bool = False) -> _Snapshot:
+        if self._needs_rebuild(force_check):
+            with self._lock:
+                if self._snapshot is None or self._checked_at > self._built_at:
+                    self.rebuild()
+        return self._snapshot or _Snapshot([])
+
+    def rebuild(self) -> bool:
+        version = content_versions.current("categories")
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute(TREE_QUERY)
+                rows = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Failed to load category tree: {e}")
+            return False
+        self._snapshot = _Snapshot(rows)
+        self._version = version
+        self._built_at = self._checked_at = time.time()
+        logger.info(f"✅ Category tree built: {len(self._snapshot.nodes)} categories")
+        return True
+
+    def get(self, category_id: int) -> Optional[Dict[str, Any]]:
+        return self.snapshot().nodes.get(category_id)
+
+    def descendant_ids(self, category_id: int) -> List[int]:
+        """The category and every category below it; just the category when it is not in the tree."""
+        return self.snapshot().subtree(category_id) or [category_id]
+
+    def tree(self, force_check: bool = False) -> List[Dict[str, Any]]:
+        """Nested active categories; force_check skips the version-check throttle."""
+        snapshot = self.snapshot(force_check)
+        return [snapshot.nested(root) for root in snapshot.roots if root in snapshot.nodes]
+
+
+category_tree = CategoryTree()
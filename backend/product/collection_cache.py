@@ -0,0 +1,75 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+from shared import config, get_logger, redis_client
+
+logger = get_logger(__name__)
+
+COLLECTION_KEY_PREFIX = "products:collection:"
+
+
+class CollectionCache:
+    """Home-page product collections kept as ready-to-send JSON.
+
+    Each registered collection has a builder returning a response model for
+    (page, page_size). The first pages for the common page sizes are built at
+    startup, rebuilt on a schedule and after product writes; other pages are
+    built on first request and expire after ttl.
+    """
+
+    def __init__(self, ttl: int = 600, warm_page_sizes: Iterable[int] = (8, 12, 20), max_cached_page: int = 5):
+        self.ttl = ttl
+        self.warm_page_sizes = tuple(warm_page_sizes)
+        self.max_cached_page = max_cached_page
+        self._builders: Dict[str, Callable] = {}
+        self._refresher = None
+
+    def register(self, name: str, builder: Callable):
+        self._builders[name] = builder
+
+    def _key(self, name: str, page: int, page_size: int) -> str:
+        return f"{COLLECTION_KEY_PREFIX}{name}:{page_size}:{page}"
+
+    def build(self, name: str, page: int, page_size: int) -> str:
+        body = self._builders[name](page, page_size).model_dump_json()
+        if page <= self.max_cached_page:
+            redis_client.setex(self._key(name, page, page_size), self.ttl, body)
+        return body
+
+    def get(self, name: str, page: int, page_size: int) -> str:
+        if page <= self.max_cached_page:
+            body = redis_client.get(self._key(name, page, page_size))
+            if body:
+                return body
+        return self.build(name, page, page_size)
+
+    def refresh(self, name: Optional[str] = None):
+        """Rebuild the warm pages and drop every other cached page of the collection(s)."""
+        names = [name] if name else list(self._builders)
+        for collection in names:
+            stale = [key for key in redis_client.keys(f"{COLLECTION_KEY_PREFIX}{collection}:*")
+                     if not any(key == self._key(collection, 1, size) for size in self.warm_page_sizes)]
+            if stale:
+                redis_client.delete(*stale)
+            for page_size in self.warm_page_sizes:
+                try:
+                    self.build(collection, 1, page_size)
+                except Exception as e:
+                    logger.error(f"Failed to build {collection} collection (page_size={page_size}): {e}")
+        logger.info(f"✅ Refreshed product collections: {', '.join(names)}")
+
+    def start(self):
+        if self._refresher is None or not self._refresher.is_alive():
+            self._refresher = threading.Thread(target=self._refresh_loop, name="product-collections", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Product collection refresh error: {e}")
+            time.sleep(max(30, config.collection_cache_refresh_interval or 300))
+
+
+collection_cache = CollectionCache()
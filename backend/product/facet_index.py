@@ -0,0 +1,350 @@
+import bisect
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from shared import config, db, get_logger, redis_client
+from .search_index import SEARCH_EVENTS_CHANNEL
+
+logger = get_logger(__name__)
+
+SORTABLE = ('name', 'base_price', 'created_at', 'view_count', 'total_sold', 'wishlist_count')
+
+FLAGS = ('is_featured', 'is_trending', 'is_bestseller')
+
+FACET_QUERY = """
+    SELECT
+        p.id, p.name, p.status, p.category_id, p.brand_id, p.base_price, p.stock_status,
+        p.is_featured, p.is_trending, p.is_bestseller, p.created_at,
+        p.view_count, p.total_sold, p.wishlist_count,
+        c.name as category_name, b.name as brand_name
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.id
+    LEFT JOIN brands b ON p.brand_id = b.id
+"""
+
+
+def bitmap_from_positions(positions: Iterable[int], size: int) -> int:
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class _Facets:
+    """One generation of the bitmaps; mutated only under the owner's lock.
+
+    Every product gets a fixed position; a bitmap is a Python int with that
+    bit set for each product having the value. Prices are a sorted
+    (price, position) array so ranges are two bisects. For every sortable
+    column a (value, id, position) array is kept sorted, so a page is read by
+    walking it against the result bitmap instead of sorting the matches.
+    """
+
+    def __init__(self):
+        self.positions: Dict[int, int] = {}
+        self.ids: List[int] = []
+        self.rows: List[Optional[Dict[str, Any]]] = []
+        self.live = 0
+        self.values: Dict[str, Dict[Any, int]] = {'category_id': {}, 'brand_id': {}, 'stock_status': {}}
+        self.flags: Dict[str, int] = {flag: 0 for flag in FLAGS}
+        self.prices: List[Tuple[float, int]] = []
+        self.names: Dict[str, Dict[int, str]] = {'category_id': {}, 'brand_id': {}}
+        self.orders: Dict[str, List[Tuple[Any, int, int]]] = {column: [] for column in SORTABLE}
+
+    @classmethod
+    def build(cls, rows: List[Dict[str, Any]]) -> '_Facets':
+        facets = cls()
+        members: Dict[str, Dict[Any, List[int]]] = {dimension: {} for dimension in facets.values}
+        flag_members: Dict[str, List[int]] = {flag: [] for flag in FLAGS}
+        for position, row in enumerate(rows):
+            attributes = facets._attributes(row)
+            facets.positions[row['id']] = position
+            facets.ids.append(row['id'])
+            facets.rows.append(attributes)
+            for dimension in facets.values:
+                members[dimension].setdefault(attributes[dimension], []).append(position)
+            for flag in FLAGS:
+                if attributes[flag]:
+                    flag_members[flag].append(position)
+            facets.prices.append((attributes['base_price'], position))
+            for column in SORTABLE:
+                facets.orders[column].append((attributes[column], row['id'], position))
+            facets._remember_names(row)
+        size = len(rows)
+        facets.live = (1 << size) - 1
+        for dimension, groups in members.items():
+            facets.values[dimension] = {value: bitmap_from_positions(group, size) for value, group in groups.items()}
+        facets.flags = {flag: bitmap_from_positions(group, size) for flag, group in flag_members.items()}
+        facets.prices.sort()
+        for order in facets.orders.values():
+            order.sort()
+        return facets
+
+    @staticmethod
+    def _attributes(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'category_id': row['category_id'],
+            'brand_id': row['brand_id'],
+            'stock_status': row['stock_status'],
+            'is_featured': bool(row['is_featured']),
+            'is_trending': bool(row['is_trending']),
+            'is_bestseller': bool(row['is_bestseller']),
+            'base_price': float(row['base_price'] or 0),
+            # MySQL's collation compares names case-insensitively
+            'name': (row['name'] or '').casefold(),
+            'created_at': row['created_at'].timestamp() if row['created_at'] else 0,
+            'view_count': row['view_count'] or 0,
+            'total_sold': row['total_sold'] or 0,
+            'wishlist_count': row['wishlist_count'] or 0,
+        }
+
+    def _remember_names(self, row: Dict[str, Any]):
+        if row['category_id'] is not None and row.get('category_name'):
+            self.names['category_id'][row['category_id']] = row['category_name']
+        if row['brand_id'] is not None and row.get('brand_name'):
+            self.names['brand_id'][row['brand_id']] = row['brand_name']
+
+    def remove(self, product_id: int):
+        position = self.positions.get(product_id)
+        if position is None or self.rows[position] is None:
+            return
+        attributes = self.rows[position]
+        bit = 1 << position
+        for dimension, bitmaps in self.values.items():
+            value = attributes[dimension]
+            bitmaps[value] &= ~bit
+            if not bitmaps[value]:
+                del bitmaps[value]
+        for flag in FLAGS:
+            self.flags[flag] &= ~bit
+        index = bisect.bisect_left(self.prices, (attributes['base_price'], position))
+        if index < len(self.prices) and self.prices[index] == (attributes['base_price'], position):
+            del self.prices[index]
+        for column, order in self.orders.items():
+            entry = (attributes[column], product_id, position)
+            index = bisect.bisect_left(order, entry)
+            if index < len(order) and order[index] == entry:
+                del order[index]
+        self.live &= ~bit
+        self.rows[position] = None
+
+    def add(self, row: Dict[str, Any]):
+        self.remove(row['id'])
+        position = self.positions.get(row['id'])
+        if position is None:
+            position = len(self.ids)
+            self.positions[row['id']] = position
+            self.ids.append(row['id'])
+            self.rows.append(None)
+        attributes = self._attributes(row)
+        bit = 1 << position
+        for dimension, bitmaps in self.values.items():
+            value = attributes[dimension]
+            bitmaps[value] = bitmaps.get(value, 0) | bit
+        for flag in FLAGS:
+            if attributes[flag]:
+                self.flags[flag] |= bit
+        bisect.insort(self.prices, (attributes['base_price'], position))
+        for column, order in self.orders.items():
+            bisect.insort(order, (attributes[column], row['id'], position))
+        self.live |= bit
+        self.rows[position] = attributes
+        self._remember_names(row)
+
+    def page(self, result: int, sort_by: str, descending: bool, offset: int, limit: int) -> List[int]:
+        """Ids at [offset, offset + limit) of the matches in result, in sort order."""
+        # Bytes give O(1) bit tests; shifting a large int is linear in its size
+        bits = result.to_bytes((len(self.ids) + 7) // 8 or 1, 'little')
+        order = self.orders[sort_by]
+        page = []
+        skipped = 0
+        for _, product_id, position in (reversed(order) if descending else order):
+            if not bits[position >> 3] >> (position & 7) & 1:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            page.append(product_id)
+            if len(page) >= limit:
+                break
+        return page
+
+    def price_mask(self, min_price: Optional[float], max_price: Optional[float]) -> int:
+        low = bisect.bisect_left(self.prices, (min_price, -1)) if min_price is not None else 0
+        high = bisect.bisect_right(self.prices, (max_price, len(self.ids))) if max_price is not None else len(self.prices)
+        return bitmap_from_positions((position for _, position in self.prices[low:high]), len(self.ids))
+
+    def masks(self, filters: Dict[str, Any]) -> Dict[str, int]:
+        """One bitmap per active filter dimension."""
+        masks = {}
+        category = filters.get('category_id')
+        if category:
+            categories = category if isinstance(category, (set, frozenset, list, tuple)) else [category]
+            mask = 0
+            for category_id in categories:
+                mask |= self.values['category_id'].get(category_id, 0)
+            masks['category_id'] = mask
+        if filters.get('brand_id'):
+            masks['brand_id'] = self.values['brand_id'].get(filters['brand_id'], 0)
+        if filters.get('min_price') is not None or filters.get('max_price') is not None:
+            masks['price'] = self.price_mask(filters.get('min_price'), filters.get('max_price'))
+        if filters.get('in_stock'):
+            masks['stock_status'] = self.values['stock_status'].get('in_stock', 0)
+        for flag in FLAGS:
+            if filters.get(flag) is not None:
+                masks[flag] = self.flags[flag] if filters[flag] else self.live & ~self.flags[flag]
+        return masks
+
+    def counts(self, base: int, masks: Dict[str, int]) -> Dict[str, Any]:
+        """Disjunctive facet counts: each dimension is counted with every other filter applied."""
+        def without(dimension: str) -> int:
+            bitmap = base
+            for other, mask in masks.items():
+                if other != dimension:
+                    bitmap &= mask
+            return bitmap
+
+        facets: Dict[str, Any] = {}
+        for dimension, key in (('category_id', 'categories'), ('brand_id', 'brands')):
+            scope = without(dimension)
+            facets[key] = sorted(
+                ({'id': value, 'name': self.names[dimension].get(value), 'count': (scope & bitmap).bit_count()}
+                 for value, bitmap in self.values[dimension].items() if value is not None and scope & bitmap),
+                key=lambda item: (-item['count'], item['id'])
+            )
+        scope = without('stock_status')
+        facets['stock_status'] = {value: (scope & bitmap).bit_count()
+                                  for value, bitmap in self.values['stock_status'].items() if value and scope & bitmap}
+        facets['flags'] = {flag.removeprefix('is_'): (without(flag) & self.flags[flag]).bit_count() for flag in FLAGS}
+        scope = without('price')
+        facets['price'] = {
+            'min': next((price for price, position in self.prices if scope >> position & 1), None),
+            'max': next((price for price, position in reversed(self.prices) if scope >> position & 1), None)
+        }
+        return facets
+
+
+class FacetIndex:
+    """In-process bitmap indexes over active products for filtering and facet counts.
+
+    Rebuilt from MySQL every facet_index_rebuild_interval seconds and updated
+    per product from the product write events announced on the search
+    channel, so every process applies the same change.
+    """
+
+    def __init__(self):
+        self._facets = _Facets()
+        self._lock = threading.RLock()
+        self._listener = None
+        self._rebuilder = None
+        self.ready = False
+        self.built_at = 0.0
+
+    def rebuild(self) -> bool:
+        started = time.time()
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute(FACET_QUERY + " WHERE p.status = 'active'")
+                rows = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Failed to build product facet index: {e}")
+            return False
+        facets = _Facets.build(rows)
+        with self._lock:
+            self._facets = facets
+            self.ready = True
+            self.built_at = time.time()
+        logger.info(f"✅ Product facet index built: {len(rows)} products in {(time.time() - started) * 1000:.0f} ms")
+        return True
+
+    def start(self):
+        if self._rebuilder is None or not self._rebuilder.is_alive():
+            self._rebuilder = threading.Thread(target=self._rebuild_loop, name="product-facets-rebuild", daemon=True)
+            self._rebuilder.start()
+        if self._listener is None or not self._listener.is_alive():
+            self._listener = threading.Thread(target=self._listen, name="product-facets-listener", daemon=True)
+            self._listener.start()
+
+    def _rebuild_loop(self):
+        while True:
+            if not self.rebuild():
+                time.sleep(30)
+                continue
+            time.sleep(max(60, config.facet_index_rebuild_interval or 300))
+
+    def _listen(self):
+        while True:
+            pubsub = redis_client.pubsub()
+            if pubsub is None:
+                time.sleep(5)
+                continue
+            try:
+                pubsub.subscribe(SEARCH_EVENTS_CHANNEL)
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if not message or message.get('type') != 'message':
+                        continue
+                    _, _, product_id = message['data'].partition(':')
+                    if product_id.isdigit():
+                        self.refresh_product(int(product_id))
+            except Exception as e:
+                logger.error(f"Product facet listener error: {e}")
+                time.sleep(5)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    def refresh_product(self, product_id: int):
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute(FACET_QUERY + " WHERE p.id = %s", (product_id,))
+                row = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"Failed to reload product {product_id} into facet index: {e}")
+            return
+        with self._lock:
+            if row and row['status'] == 'active':
+                self._facets.add(row)
+            else:
+                self._facets.remove(product_id)
+
+    def query(self, filters: Dict[str, Any], sort_by: str = "created_at", sort_order: str = "desc",
+              offset: int = 0, limit: int = 20, within: Optional[Iterable[int]] = None,
+              with_facets: bool = False) -> Tuple[List[int], int, Optional[Dict[str, Any]]]:
+        """One page of matching product ids, the match count and, optionally, facet counts.
+
+        within restricts everything (results and counts) to the given product ids,
+        e.g. the matches of a text search.
+        """
+        if sort_by not in SORTABLE:
+            sort_by = "created_at"
+        with self._lock:
+            facets = self._facets
+            base = facets.live
+            if within is not None:
+                base &= bitmap_from_positions(
+                    (facets.positions[product_id] for product_id in within if product_id in facets.positions),
+                    len(facets.ids)
+                )
+            masks = facets.masks(filters)
+            result = base
+            for mask in masks.values():
+                result &= mask
+            page = facets.page(result, sort_by, sort_order == "desc", offset, limit)
+            counts = facets.counts(base, masks) if with_facets else None
+        return page, result.bit_count(), counts
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'products': self._facets.live.bit_count(),
+                'categories': len(self._facets.values['category_id']),
+                'brands': len(self._facets.values['brand_id']),
+                'built_at': self.built_at
+            }
+
+
+facet_index = FacetIndex()
@@ -0,0 +1,166 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+import aiofiles
+from fastapi import UploadFile
+from PIL import Image, ImageOps, features
+from shared import config, get_logger
+
+logger = get_logger(__name__)
+
+UPLOAD_DIR = "/app/uploads/products"
+UPLOAD_URL_PREFIX = "/uploads/products"
+CHUNK_SIZE = 64 * 1024
+
+# Longest edge per display context; images smaller than a size are not upscaled
+IMAGE_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'detail': 1200,
+}
+WEBP_QUALITY = 80
+AVIF_QUALITY = 55
+ORIENTATION_TAG = 0x0112
+# Decoded size is width x height x 4 bytes; a small compressed file can still decode to hundreds of MB
+MAX_IMAGE_PIXELS = 40_000_000
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class InvalidImage(Exception):
+    pass
+
+
+def _clean(image: Image.Image) -> Image.Image:
+    """Upright copy without EXIF, ICC, XMP or text chunks, in a mode every encoder accepts."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    image.info = {}
+    return image
+
+
+def _strip_original(source: Image.Image, clean: Image.Image, path: str):
+    """Rewrite the stored original without metadata."""
+    # GIFs are left as uploaded so animations survive; they carry no EXIF
+    if source.format == 'JPEG':
+        if source.getexif().get(ORIENTATION_TAG, 1) == 1:
+            # Same quantization tables, so the pixels are not re-degraded
+            source.save(path, 'JPEG', quality='keep', optimize=True)
+        else:
+            clean.convert('RGB').save(path, 'JPEG', quality=90, optimize=True)
+    elif source.format == 'PNG':
+        clean.save(path, 'PNG', optimize=True)
+    elif source.format == 'WEBP':
+        clean.save(path, 'WEBP', quality=90)
+
+
+def generate_variants(path: str) -> Dict[str, Any]:
+    """Decode the stored original once, strip its metadata and write every size.
+
+    Returns the variant map entry for the image: original dimensions plus, per
+    size, the dimensions and one URL per generated format.
+    """
+    try:
+        with Image.open(path) as source:
+            # Only the header has been read so far
+            width, height = source.size
+            if width * height > MAX_IMAGE_PIXELS:
+                raise InvalidImage(f"{width}x{height} exceeds {MAX_IMAGE_PIXELS} pixels")
+            source.load()
+            clean = _clean(source)
+            _strip_original(source, clean, path)
+    except Exception as e:
+        raise InvalidImage(str(e))
+    os.chmod(path, 0o644)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    directory = os.path.dirname(path)
+    formats = ['webp'] + (['avif'] if features.check('avif') else [])
+    entry: Dict[str, Any] = {'width': clean.width, 'height': clean.height}
+    for size, edge in IMAGE_SIZES.items():
+        resized = clean.copy()
+        resized.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        variant = {'width': resized.width, 'height': resized.height}
+        for image_format in formats:
+            filename = f"{stem}_{size}.{image_format}"
+            if image_format == 'webp':
+                resized.save(os.path.join(directory, filename), 'WEBP', quality=WEBP_QUALITY, method=4)
+            else:
+                resized.save(os.path.join(directory, filename), 'AVIF', quality=AVIF_QUALITY)
+            os.chmod(os.path.join(directory, filename), 0o644)
+            variant[image_format] = f"{UPLOAD_URL_PREFIX}/{filename}"
+        entry[size] = variant
+    return entry
+
+
+def variant_url(image_variants: Optional[Dict[str, Any]], url: Optional[str], size: Optional[str],
+                image_format: str = 'webp') -> Optional[str]:
+    """URL of url's variant at size, or url itself when no such variant was generated."""
+    if not url or not size or not image_variants:
+        return url
+    return ((image_variants.get(url) or {}).get(size) or {}).get(image_format) or url
+
+
+class ImagePipeline:
+    """Product image uploads: chunked writes to disk, then resizing in a worker pool.
+
+    save() copies the upload to disk CHUNK_SIZE bytes at a time with aiofiles,
+    enforcing the size limit as it goes. process() decodes, strips metadata
+    and encodes every size in a bounded thread pool (Pillow releases the GIL
+    while resampling and encoding), so neither step blocks the event loop.
+    """
+
+    def __init__(self):
+        self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            workers = max(1, config.image_processing_workers or 2)
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="product-images")
+        return self._executor
+
+    async def save(self, file: UploadFile, filename: str, max_bytes: int) -> str:
+        os.makedirs(UPLOAD_DIR, mode=0o755, exist_ok=True)
+        path = os.path.join(UPLOAD_DIR, filename)
+        written = 0
+        await file.seek(0)
+        try:
+            async with aiofiles.open(path, "wb") as buffer:
+                while True:
+                    chunk = await file.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > max_bytes:
+                        raise UploadTooLarge(file.filename)
+                    await buffer.write(chunk)
+        except Exception:
+            self.discard(path)
+            raise
+        return path
+
+    async def process(self, path: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), generate_variants, path)
+        except Exception:
+            self.discard(path)
+            raise
+
+    def discard(self, path: str):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        candidates = [path] + [os.path.join(UPLOAD_DIR, f"{stem}_{size}.{image_format}")
+                               for size in IMAGE_SIZES for image_format in ('webp', 'avif')]
+        for candidate in candidates:
+            try:
+                os.remove(candidate)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove {candidate}: {e}")
+
+
+image_pipeline = ImagePipeline()
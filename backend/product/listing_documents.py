@@ -0,0 +1,114 @@
+import html
+import json
+from typing import Dict, Iterable, List, Optional
+from shared import db, get_logger, redis_client
+from .models import ProductResponse
+from .image_pipeline import variant_url
+from .row_decoder import decode_product_row
+
+logger = get_logger(__name__)
+
+LISTING_DOCS_KEY = "product_listing:docs"
+
+# Columns that change outside the admin write paths (orders, views, wishlists)
+# are read from the row on every request; everything else comes from the document.
+VOLATILE_COLUMNS = ('stock_quantity', 'stock_status', 'view_count', 'wishlist_count', 'total_sold', 'updated_at')
+
+
+def build_listing_document(product: dict) -> dict:
+    """Escaped, parsed and normalized listing fields of one products row."""
+    decoded = decode_product_row(product)
+    return {
+        'id': product['id'],
+        'uuid': product['uuid'],
+        'name': html.escape(product['name']) if product['name'] else "",
+        'sku': product['sku'],
+        'slug': product['slug'],
+        'short_description': html.escape(product['short_description']) if product['short_description'] else "",
+        'description': html.escape(product['description']) if product['description'] else "",
+        'base_price': float(product['base_price']),
+        'compare_price': float(product['compare_price']) if product['compare_price'] else None,
+        'category_id': product['category_id'],
+        'brand_id': product['brand_id'],
+        'specification': decoded['specification'],
+        'gst_rate': float(product['gst_rate']),
+        'is_gst_inclusive': bool(product['is_gst_inclusive']),
+        'track_inventory': bool(product['track_inventory']),
+        'low_stock_threshold': product['low_stock_threshold'],
+        'product_type': product['product_type'],
+        'weight_grams': float(product['weight_grams']) if product['weight_grams'] else None,
+        'main_image_url': decoded['main_image_url'],
+        'image_gallery': decoded['image_gallery'],
+        'image_variants': decoded.get('image_variants'),
+        'status': product['status'],
+        'is_featured': bool(product['is_featured']),
+        'is_trending': bool(product['is_trending']),
+        'is_bestseller': bool(product['is_bestseller']),
+        'created_at': product['created_at'].isoformat() if product['created_at'] else None
+    }
+
+
+def store_listing_documents(documents: Iterable[dict]):
+    mapping = {str(doc['id']): json.dumps(doc) for doc in documents}
+    if mapping:
+        redis_client.hset(LISTING_DOCS_KEY, mapping)
+
+
+def refresh_listing_document(product_id: int):
+    """Rebuild the document after a committed write to the product."""
+    try:
+        with db.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
+            product = cursor.fetchone()
+        if product:
+            store_listing_documents([build_listing_document(product)])
+        else:
+            redis_client.hdel(LISTING_DOCS_KEY, str(product_id))
+    except Exception as e:
+        logger.error(f"Failed to refresh listing document for product {product_id}: {e}")
+        redis_client.hdel(LISTING_DOCS_KEY, str(product_id))
+
+
+def load_listing_documents(cursor, product_ids: List[int]) -> Dict[int, dict]:
+    """Documents for the given ids; missing ones are built from the table and stored."""
+    if not product_ids:
+        return {}
+    documents = {}
+    for product_id, raw in zip(product_ids, redis_client.hmget(LISTING_DOCS_KEY, [str(i) for i in product_ids])):
+        if raw:
+            try:
+                documents[product_id] = json.loads(raw)
+            except ValueError:
+                pass
+    missing = [product_id for product_id in product_ids if product_id not in documents]
+    if missing:
+        placeholders = ','.join(['%s'] * len(missing))
+        cursor.execute(f"SELECT * FROM products WHERE id IN ({placeholders})", missing)
+        built = [build_listing_document(row) for row in cursor.fetchall()]
+        store_listing_documents(built)
+        documents.update({doc['id']: doc for doc in built})
+        logger.info(f"📄 Built {len(built)} missing listing documents")
+    return documents
+
+
+def fetch_listing_rows(cursor, product_ids: List[int]) -> List[dict]:
+    """Volatile columns for the given ids by primary key, in the order of product_ids."""
+    if not product_ids:
+        return []
+    placeholders = ','.join(['%s'] * len(product_ids))
+    cursor.execute(f"SELECT id, {', '.join(VOLATILE_COLUMNS)} FROM products WHERE id IN ({placeholders})", product_ids)
+    rows = {row['id']: row for row in cursor.fetchall()}
+    return [rows[product_id] for product_id in product_ids if product_id in rows]
+
+
+def assemble_listing(rows: List[dict], documents: Dict[int, dict], image_size: Optional[str] = None) -> List[ProductResponse]:
+    """image_size swaps main_image_url for its generated variant of that size, where one exists."""
+    products = []
+    for row in rows:
+        document = documents.get(row['id'])
+        if not document:
+            continue
+        if image_size:
+            document = dict(document, main_image_url=variant_url(document.get('image_variants'), document['main_image_url'], image_size))
+        products.append(ProductResponse(**document, **{column: row[column] for column in VOLATILE_COLUMNS}))
+    return products
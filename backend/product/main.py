@@ -6,6 +6,11 @@ from fastapi.staticfiles import StaticFiles
 from shared import config, setup_logging, get_logger, db
 from shared.session_middleware import SecureSessionMiddleware, get_session_id
 from .routes import router
+from .search_index import product_search
+from .facet_index import facet_index
+from .view_counter import view_counter
+from .recommendations import recommendation_engine
+from .collection_cache import collection_cache
 import os
 
 setup_logging("product-service")
@@ -136,6 +141,16 @@ async def startup_event():
     try:
         db.initialize()
         logger.info("✅ Database initialized successfully")
+        product_search.start()
+        logger.info("✅ Product search index build started in background thread")
+        facet_index.start()
+        logger.info("✅ Product facet index build started in background thread")
+        view_counter.start()
+        logger.info("✅ Product view counter flusher started")
+        collection_cache.start()
+        logger.info("✅ Product collection cache warming started")
+        recommendation_engine.start()
+        logger.info("✅ Product recommendation builder started")
     except Exception as e:
         logger.error(f"❌ Database initialization failed: {e}")
 
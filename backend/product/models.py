@@ -54,6 +54,7 @@ class ProductResponse(ProductBase):
     weight_grams: Optional[float] = None
     main_image_url: Optional[str] = None
     image_gallery: Optional[List[str]] = None
+    image_variants: Optional[Dict[str, Any]] = None
     status: ProductStatus
     is_featured: bool
     is_trending: bool
@@ -76,6 +77,10 @@ class CategoryResponse(BaseModel):
     is_active: bool
     sort_order: int
 
+class CategoryTreeNode(CategoryResponse):
+    depth: int = 0
+    children: List['CategoryTreeNode'] = []
+
 class BrandResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: int
@@ -103,6 +108,8 @@ class ProductListResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    next_cursor: Optional[str] = None
+    facets: Optional[Dict[str, Any]] = None
 
 class HealthResponse(BaseModel):
     status: str
@@ -0,0 +1,95 @@
+import base64
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Tuple
+from fastapi import HTTPException, status
+from shared import get_logger, redis_client
+
+logger = get_logger(__name__)
+
+COUNT_CACHE_TTL = 60
+
+
+def _cursor_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPage:
+    """Cursor pagination over an ORDER BY that ends in a unique column.
+
+    order_by is a list of (sql column, row key, 'ASC' | 'DESC'). The cursor is an
+    opaque token holding the sort values of the last row served, so each page
+    is an index range read instead of an OFFSET scan.
+    """
+
+    def __init__(self, order_by: List[Tuple[str, str, str]], cursor: Optional[str] = None):
+        self.order_by = order_by
+        self.keys = [key for _, key, _ in order_by]
+        self.values = self.decode(cursor) if cursor else None
+
+    def decode(self, cursor: str) -> list:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if data.get('k') != self.keys or len(data.get('v', [])) != len(self.keys):
+                raise ValueError("cursor does not match sort order")
+            return data['v']
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
+
+    def encode(self, row: dict) -> str:
+        data = {'k': self.keys, 'v': [_cursor_value(row[key]) for key in self.keys]}
+        raw = json.dumps(data, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def where(self) -> Tuple[Optional[str], list]:
+        """Condition selecting rows after the cursor, expanded so MySQL can range-scan the index."""
+        if self.values is None:
+            return None, []
+        branches = []
+        params = []
+        for i, (column, _, direction) in enumerate(self.order_by):
+            parts = [f"{prev_column} = %s" for prev_column, _, _ in self.order_by[:i]]
+            parts.append(f"{column} {'<' if direction == 'DESC' else '>'} %s")
+            branches.append("(" + " AND ".join(parts) + ")")
+            params.extend(self.values[:i + 1])
+        return "(" + " OR ".join(branches) + ")", params
+
+    def page_clause(self, page_size: int) -> Tuple[str, list]:
+        """Tail of a query that already has a WHERE: keyset condition, ORDER BY and LIMIT."""
+        condition, params = self.where()
+        prefix = f"AND {condition} " if condition else ""
+        return f"{prefix}ORDER BY {self.order_sql()} LIMIT %s", params + [page_size + 1]
+
+    def order_sql(self) -> str:
+        return ", ".join(f"{column} {direction}" for column, _, direction in self.order_by)
+
+    def split(self, rows: list, page_size: int) -> Tuple[list, Optional[str]]:
+        """Rows were fetched with LIMIT page_size + 1; the extra row only signals another page."""
+        if len(rows) <= page_size:
+            return rows, None
+        rows = rows[:page_size]
+        return rows, self.encode(rows[-1])
+
+
+def cached_count(cursor, count_query: str, params: list, expire: int = COUNT_CACHE_TTL) -> int:
+    """COUNT query result cached briefly in Redis; cursor pages report it as an estimate."""
+    digest = hashlib.sha1(json.dumps([count_query, params], default=str).encode()).hexdigest()
+    cache_key = f"products:count:{digest}"
+    cached = redis_client.get(cache_key)
+    if cached is not None:
+        return int(cached)
+    cursor.execute(count_query, params)
+    row = cursor.fetchone()
+    total = int(list(row.values())[0]) if row else 0
+    redis_client.setex(cache_key, expire, str(total))
+    return total
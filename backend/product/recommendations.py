@@ -0,0 +1,259 @@
+import hashlib
+import heapq
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from shared import config, db, get_logger, redis_client
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+logger = get_logger(__name__)
+
+NEIGHBORS_KEY_PREFIX = "recommendations:neighbors:"
+NEIGHBOR_PRODUCTS_KEY = "recommendations:products"
+VIEW_BASKETS_KEY_PREFIX = "recommendations:views:"
+BUILD_LOCK_KEY = "recommendations:build_lock"
+META_KEY = "recommendations:meta"
+
+PURCHASE_WINDOW_DAYS = 365
+VIEW_WINDOW_DAYS = 7
+VIEW_BASKET_SIZE = 20
+NEIGHBORS_TTL = 7 * 86400
+
+# A product bought together counts for more than one browsed together
+PURCHASE_WEIGHT = 1.0
+VIEW_WEIGHT = 0.3
+
+# Seed weights at request time: wishlist above views, recent views above older ones
+WISHLIST_SEED_WEIGHT = 1.2
+VIEW_SEED_DECAY = 0.85
+
+BASKETS_QUERY = """
+    SELECT oi.order_id, oi.product_id
+    FROM order_items oi
+    JOIN orders o ON o.id = oi.order_id
+    WHERE o.status NOT IN ('cancelled', 'refunded')
+    AND o.created_at >= %s
+"""
+
+
+def _similarity(baskets: Sequence[Sequence[int]], index: Dict[int, int]):
+    """Cosine similarity between products over baskets, as a CSR matrix with a zero diagonal.
+
+    B is baskets x products (binary); B.T @ B counts baskets holding both
+    products and its diagonal counts baskets holding each one.
+    """
+    rows = []
+    cols = []
+    for row, basket in enumerate(baskets):
+        for product_id in basket:
+            rows.append(row)
+            cols.append(index[product_id])
+    size = len(index)
+    if not rows:
+        return sparse.csr_matrix((size, size), dtype=np.float32)
+    baskets_matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (np.array(rows), np.array(cols))),
+        shape=(len(baskets), size)
+    )
+    # Repeated lines of the same product in one basket count once
+    baskets_matrix.data[:] = 1.0
+    co_counts = (baskets_matrix.T @ baskets_matrix).tocsr()
+    counts = co_counts.diagonal()
+    co_counts.setdiag(0)
+    co_counts.eliminate_zeros()
+    inverse_norms = np.zeros(size, dtype=np.float32)
+    nonzero = counts > 0
+    inverse_norms[nonzero] = 1.0 / np.sqrt(counts[nonzero])
+    scale = sparse.diags(inverse_norms)
+    return (scale @ co_counts @ scale).tocsr()
+
+
+def _scaled(items: Sequence[Tuple[int, float]], weight: float):
+    """One seed's neighbour list as (-score * weight, id) pairs, ascending like heapq.merge expects."""
+    for neighbor_id, score in items:
+        yield -score * weight, neighbor_id
+
+
+def _top_neighbors(similarity, product_ids: List[int], count: int) -> Dict[int, List[Tuple[int, float]]]:
+    neighbors = {}
+    indptr, indices, data = similarity.indptr, similarity.indices, similarity.data
+    for row, product_id in enumerate(product_ids):
+        start, end = indptr[row], indptr[row + 1]
+        if start == end:
+            continue
+        scores = data[start:end]
+        columns = indices[start:end]
+        if end - start > count:
+            top = np.argpartition(-scores, count - 1)[:count]
+            scores, columns = scores[top], columns[top]
+        order = np.argsort(-scores, kind='stable')
+        neighbors[product_id] = [(product_ids[column], round(float(score), 4))
+                                 for column, score in zip(columns[order], scores[order])]
+    return neighbors
+
+
+class RecommendationEngine:
+    """Item-to-item recommendations from co-purchases and co-views.
+
+    A background build turns recent order baskets and session view baskets
+    into a sparse product x product cosine similarity, keeps the top
+    neighbor_count neighbours of every product and writes each list to Redis
+    (highest score first). One process builds at a time under a Redis lock,
+    and a build is skipped when no orders or views arrived since the last one.
+    recommend() is then an MGET of the seeds' lists and a K-way merge.
+    """
+
+    def __init__(self):
+        self._builder = None
+
+    def _neighbors_key(self, product_id: int) -> str:
+        return f"{NEIGHBORS_KEY_PREFIX}{product_id}"
+
+    def record_views(self, session_id: str, viewed_products: Sequence[int]):
+        """Keep the session's latest views as today's co-view basket (overwritten, not appended)."""
+        if not session_id or len(viewed_products) < 2:
+            return
+        key = f"{VIEW_BASKETS_KEY_PREFIX}{datetime.utcnow():%Y%m%d}"
+        redis_client.hset(key, mapping={session_id: ','.join(str(product_id) for product_id in viewed_products[:VIEW_BASKET_SIZE])})
+        redis_client.expire(key, (VIEW_WINDOW_DAYS + 1) * 86400)
+
+    def _view_baskets(self) -> List[List[int]]:
+        today = datetime.utcnow()
+        baskets = []
+        for days in range(VIEW_WINDOW_DAYS):
+            key = f"{VIEW_BASKETS_KEY_PREFIX}{today - timedelta(days=days):%Y%m%d}"
+            for value in redis_client.hgetall(key).values():
+                basket = [int(product_id) for product_id in value.split(',') if product_id.isdigit()]
+                if len(basket) > 1:
+                    baskets.append(basket)
+        return baskets
+
+    def _purchase_baskets(self) -> List[List[int]]:
+        since = datetime.utcnow() - timedelta(days=PURCHASE_WINDOW_DAYS)
+        grouped: Dict[int, List[int]] = {}
+        with db.get_cursor() as cursor:
+            cursor.execute(BASKETS_QUERY, (since,))
+            for row in cursor.fetchall():
+                grouped.setdefault(row['order_id'], []).append(row['product_id'])
+        return [basket for basket in grouped.values() if len(set(basket)) > 1]
+
+    def build(self, force: bool = False) -> int:
+        """Recompute and store neighbour lists; returns how many products got a list."""
+        if np is None:
+            logger.warning("⚠️ NumPy/SciPy not installed, recommendation build skipped")
+            return 0
+        started = time.time()
+        purchase_baskets = self._purchase_baskets()
+        view_baskets = self._view_baskets()
+        signature = hashlib.blake2b(json.dumps([purchase_baskets, view_baskets]).encode(), digest_size=16).hexdigest()
+        if not force and redis_client.hgetall(META_KEY).get('signature') == signature:
+            logger.info("Recommendation inputs unchanged, build skipped")
+            return 0
+        product_ids = sorted({product_id for basket in purchase_baskets + view_baskets for product_id in basket})
+        index = {product_id: position for position, product_id in enumerate(product_ids)}
+        similarity = (PURCHASE_WEIGHT * _similarity(purchase_baskets, index)
+                      + VIEW_WEIGHT * _similarity(view_baskets, index)).tocsr()
+        neighbors = _top_neighbors(similarity, product_ids, max(1, config.recommendation_neighbor_count or 50))
+        self._store(neighbors)
+        redis_client.hset(META_KEY, mapping={
+            'signature': signature,
+            'built_at': str(int(time.time())),
+            'products': str(len(neighbors)),
+            'purchase_baskets': str(len(purchase_baskets)),
+            'view_baskets': str(len(view_baskets))
+        })
+        logger.info(f"✅ Recommendations built for {len(neighbors)} products from {len(purchase_baskets)} orders "
+                    f"and {len(view_baskets)} view sessions in {time.time() - started:.2f}s")
+        return len(neighbors)
+
+    def _store(self, neighbors: Dict[int, List[Tuple[int, float]]]):
+        previous = {int(product_id) for product_id in redis_client.smembers(NEIGHBOR_PRODUCTS_KEY) if product_id.isdigit()}
+        pipeline = redis_client.pipeline()
+        for product_id, items in neighbors.items():
+            pipeline.setex(self._neighbors_key(product_id), NEIGHBORS_TTL, json.dumps(items))
+        pipeline.execute()
+        stale = previous - set(neighbors)
+        if stale:
+            redis_client.delete(*[self._neighbors_key(product_id) for product_id in stale])
+            redis_client.srem(NEIGHBOR_PRODUCTS_KEY, *[str(product_id) for product_id in stale])
+        if neighbors:
+            redis_client.sadd(NEIGHBOR_PRODUCTS_KEY, *[str(product_id) for product_id in neighbors])
+
+    def recommend(self, seeds: Sequence[Tuple[int, float]], limit: int,
+                  exclude: Iterable[int] = ()) -> List[int]:
+        """Product ids ranked by seed weight x similarity, best first, without the seeds themselves.
+
+        Each stored list is already sorted, so scaling it by its seed's weight
+        keeps it sorted and heapq.merge yields candidates in global order; the
+        first sighting of a product is its best score.
+        """
+        if not seeds or limit <= 0:
+            return []
+        lists = redis_client.mget([self._neighbors_key(product_id) for product_id, _ in seeds])
+        streams = []
+        for (_, weight), data in zip(seeds, lists):
+            if not data:
+                continue
+            try:
+                items = json.loads(data)
+            except ValueError:
+                continue
+            streams.append(_scaled(items, weight))
+        seen = {product_id for product_id, _ in seeds}
+        seen.update(exclude)
+        ranked = []
+        for _, product_id in heapq.merge(*streams):
+            if product_id in seen:
+                continue
+            seen.add(product_id)
+            ranked.append(product_id)
+            if len(ranked) >= limit:
+                break
+        return ranked
+
+    def session_seeds(self, viewed_products: Sequence[int], wishlist_items: Sequence[int],
+                      max_seeds: int = 20) -> List[Tuple[int, float]]:
+        weights: Dict[int, float] = {}
+        for product_id in wishlist_items:
+            weights[int(product_id)] = WISHLIST_SEED_WEIGHT
+        for position, product_id in enumerate(viewed_products[:max_seeds]):
+            weights[int(product_id)] = max(weights.get(int(product_id), 0.0), VIEW_SEED_DECAY ** position)
+        return sorted(weights.items(), key=lambda item: item[1], reverse=True)[:max_seeds]
+
+    def stats(self) -> Dict[str, Optional[str]]:
+        meta = redis_client.hgetall(META_KEY)
+        return {
+            'available': np is not None,
+            'built_at': meta.get('built_at'),
+            'products': meta.get('products'),
+            'purchase_baskets': meta.get('purchase_baskets'),
+            'view_baskets': meta.get('view_baskets')
+        }
+
+    def start(self):
+        if self._builder is None or not self._builder.is_alive():
+            self._builder = threading.Thread(target=self._build_loop, name="product-recommendations", daemon=True)
+            self._builder.start()
+
+    def _build_loop(self):
+        while True:
+            interval = max(60, config.recommendation_rebuild_interval or 3600)
+            # Only one process per interval does the (CPU heavy) build
+            if redis_client.ping() and redis_client.set_if_not_exists(BUILD_LOCK_KEY, str(os.getpid()), expire=interval):
+                try:
+                    self.build()
+                except Exception as e:
+                    logger.error(f"❌ Recommendation build failed: {e}")
+            time.sleep(interval)
+
+
+recommendation_engine = RecommendationEngine()
@@ -1,18 +1,31 @@
 import html
-from fastapi import APIRouter, HTTPException, Depends, Query, status, UploadFile, File, Request, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Query, status, UploadFile, File, Request, BackgroundTasks, Response
 from typing import Optional, List
-from shared import config, db, sanitize_input, get_logger, redis_client, rabbitmq_client
+from shared import config, db, sanitize_input, get_logger, redis_client, rabbitmq_client, response_cache, product_catalog
+from shared.conditional import content_versions, etag_matches, conditional_headers, not_modified
 from shared.auth_middleware import get_current_user, require_roles
-from shared.rate_limiter import rate_limiter
+from shared.rate_limiter import rate_limited, search_cost
 from shared.session_middleware import get_session, get_session_id
 from shared.session_service import session_service, SessionType
 from .models import (
-    ProductResponse, ProductListResponse, CategoryResponse,
+    ProductResponse, ProductListResponse, CategoryResponse, CategoryTreeNode,
     BrandResponse, ProductSearch, HealthResponse, ProductCreate, ProductStatus, StockStatus, ProductType
 )
+from .listing_documents import load_listing_documents, assemble_listing, refresh_listing_document, fetch_listing_rows
+from .search_index import product_search
+from .view_counter import view_counter
+from .collection_cache import collection_cache
+from .category_tree import category_tree
+from .slug_directory import slug_directory
+from .facet_index import facet_index
+from .recommendations import recommendation_engine
+from .image_pipeline import image_pipeline, InvalidImage, UploadTooLarge
+from .pagination import KeysetPage, cached_count
+from .row_decoder import decode_product_row, decode_json_column, encode_json_column, normalize_image_urls
 from datetime import datetime
-import ast
+import asyncio
 import os
+import uuid
 import json
 from urllib.parse import urlparse
 import re
@@ -23,88 +36,74 @@ logger = get_logger(__name__)
 # ===== PRODUCT VALIDATION FUNCTIONS =====
 def validate_product_for_cart(product_id: int, quantity: int, variation_id: Optional[int] = None) -> dict:
     try:
-        with db.get_cursor() as cursor:
-            query = """
-                SELECT
-                    p.id, p.name, p.sku, p.base_price, p.stock_quantity,
-                    p.stock_status, p.max_cart_quantity, p.status,
-                    p.track_inventory, p.low_stock_threshold
-                FROM products p
-                WHERE p.id = %s AND p.status = 'active'
-            """
-            cursor.execute(query, (product_id,))
-            product = cursor.fetchone()
-            if not product:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Product not found or not available"
-                )
-            config.refresh_cache()
-            max_cart_quantity = getattr(config, 'max_cart_quantity_per_product', 20)
-            product_max_quantity = product['max_cart_quantity']
-            if product_max_quantity:
-                max_quantity = min(product_max_quantity, max_cart_quantity)
-            else:
-                max_quantity = max_cart_quantity
-            if product['status'] != 'active':
+        product = product_catalog.get(product_id)
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Product not found or not available"
+            )
+        config.refresh_cache()
+        max_cart_quantity = getattr(config, 'max_cart_quantity_per_product', 20)
+        product_max_quantity = product['max_cart_quantity']
+        if product_max_quantity:
+            max_quantity = min(product_max_quantity, max_cart_quantity)
+        else:
+            max_quantity = max_cart_quantity
+        if product['stock_status'] == 'out_of_stock':
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Product is out of stock"
+            )
+        if product['stock_quantity'] is None:
+            logger.error(f"Product {product_id} has null stock_quantity")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Product data integrity error - contact administrator"
+            )
+        if product['track_inventory'] and product['stock_status'] != 'on_backorder':
+            stock_quantity = product['stock_quantity'] or 0
+            if quantity > stock_quantity:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Product is not available"
+                    detail="Insufficient stock available"
                 )
-            if product['stock_status'] == 'out_of_stock':
+        if quantity > max_quantity:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Maximum {max_quantity} items can be added to cart per order"
+            )
+        if variation_id:
+            with db.get_cursor() as cursor:
+                cursor.execute("""
+                    SELECT stock_quantity, stock_status
+                    FROM product_variations
+                    WHERE id = %s AND product_id = %s
+                """, (variation_id, product_id))
+                variation = cursor.fetchone()
+            if not variation:
                 raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Product is out of stock"
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Product variation not found"
                 )
-            if product['stock_quantity'] is None:
-                logger.error(f"Product {product_id} has null stock_quantity")
+            if variation['stock_status'] == 'out_of_stock':
                 raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Product data integrity error - contact administrator"
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Product variation is out of stock"
                 )
-            if product['track_inventory'] and product['stock_status'] != 'on_backorder':
-                stock_quantity = product['stock_quantity'] or 0
-                if quantity > stock_quantity and product['stock_status'] != 'on_backorder':
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Insufficient stock available"
-                    )
-            if quantity > max_quantity:
+            if quantity > variation['stock_quantity'] and variation['stock_status'] != 'on_backorder':
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Maximum {max_quantity} items can be added to cart per order"
+                    detail=f"Only {variation['stock_quantity']} items available for this variation"
                 )
-            if variation_id:
-                cursor.execute("""
-                    SELECT stock_quantity, stock_status
-                    FROM product_variations
-                    WHERE id = %s AND product_id = %s
-                """, (variation_id, product_id))
-                variation = cursor.fetchone()
-                if not variation:
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail="Product variation not found"
-                    )
-                if variation['stock_status'] == 'out_of_stock':
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Product variation is out of stock"
-                    )
-                if quantity > variation['stock_quantity'] and variation['stock_status'] != 'on_backorder':
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Only {variation['stock_quantity']} items available for this variation"
-                    )
-            return {
-                'id': product['id'],
-                'name': product['name'],
-                'price': float(product['base_price']),
-                'stock_quantity': product['stock_quantity'],
-                'stock_status': product['stock_status'],
-                'max_cart_quantity': max_quantity,
-                'track_inventory': bool(product['track_inventory'])
-            }
+        return {
+            'id': product['id'],
+            'name': product['name'],
+            'price': float(product['base_price']),
+            'stock_quantity': product['stock_quantity'],
+            'stock_status': product['stock_status'],
+            'max_cart_quantity': max_quantity,
+            'track_inventory': bool(product['track_inventory'])
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -116,47 +115,39 @@ def validate_product_for_cart(product_id: int, quantity: int, variation_id: Opti
 
 def get_product_cart_limits(product_id: int, variation_id: Optional[int] = None) -> dict:
     try:
-        with db.get_cursor() as cursor:
-            query = """
-                SELECT
-                    p.id, p.name, p.stock_quantity, p.stock_status,
-                    p.max_cart_quantity, p.track_inventory
-                FROM products p
-                WHERE p.id = %s AND p.status = 'active'
-            """
-            cursor.execute(query, (product_id,))
-            product = cursor.fetchone()
-            if not product:
-                return {
-                    'available': False,
-                    'max_quantity': 0,
-                    'stock_quantity': 0,
-                    'stock_status': 'out_of_stock'
-                }
-            max_quantity = product['max_cart_quantity'] or 20
-            variation_stock = None
-            if variation_id:
+        product = product_catalog.get(product_id)
+        if not product:
+            return {
+                'available': False,
+                'max_quantity': 0,
+                'stock_quantity': 0,
+                'stock_status': 'out_of_stock'
+            }
+        max_quantity = product['max_cart_quantity'] or 20
+        variation_stock = None
+        if variation_id:
+            with db.get_cursor() as cursor:
                 cursor.execute("""
                     SELECT stock_quantity, stock_status
                     FROM product_variations
                     WHERE id = %s AND product_id = %s
                 """, (variation_id, product_id))
                 variation = cursor.fetchone()
-                if variation:
-                    variation_stock = {
-                        'stock_quantity': variation['stock_quantity'],
-                        'stock_status': variation['stock_status']
-                    }
-            return {
-                'available': True,
-                'max_quantity': max_quantity,
-                'product_stock': {
-                    'stock_quantity': product['stock_quantity'],
-                    'stock_status': product['stock_status']
-                },
-                'variation_stock': variation_stock,
-                'track_inventory': bool(product['track_inventory'])
-            }
+            if variation:
+                variation_stock = {
+                    'stock_quantity': variation['stock_quantity'],
+                    'stock_status': variation['stock_status']
+                }
+        return {
+            'available': True,
+            'max_quantity': max_quantity,
+            'product_stock': {
+                'stock_quantity': product['stock_quantity'],
+                'stock_status': product['stock_status']
+            },
+            'variation_stock': variation_stock,
+            'track_inventory': bool(product['track_inventory'])
+        }
     except Exception as e:
         logger.error(f"Failed to get product cart limits: {e}")
         return {
@@ -180,6 +171,9 @@ def invalidate_product_cache_comprehensive(product_id: int):
         for key in keys_to_delete:
             pipeline.delete(key)
         pipeline.execute()
+        response_cache.delete(f"product:{product_id}", "categories:all")
+        content_versions.bump(f"product:{product_id}")
+        product_catalog.invalidate(product_id)
         pattern_keys = redis_client.keys("products:*")
         if pattern_keys:
             redis_client.delete(*pattern_keys)
@@ -234,50 +228,6 @@ def publish_product_event(product_data: dict, event_type: str):
     except Exception as e:
         logger.error(f"Failed to publish product event: {e}")
 
-def cache_product(product_id: int, product_data: dict, expire: int = 1800):
-    try:
-        key = f"product:{product_id}"
-        redis_client.setex(key, expire, json.dumps(product_data))
-        logger.info(f"Cached product {product_id}")
-    except Exception as e:
-        logger.error(f"Failed to cache product: {e}")
-
-def get_cached_product(product_id: int) -> Optional[dict]:
-    try:
-        key = f"product:{product_id}"
-        lock_key = f"product_lock:{product_id}"
-        data = redis_client.get(key)
-        if data:
-            return json.loads(data)
-        if redis_client.setnx(lock_key, "1") and redis_client.expire(lock_key, 10):
-            return None
-        else:
-            import time
-            time.sleep(0.1)
-            return get_cached_product(product_id)
-    except Exception as e:
-        logger.error(f"Failed to get cached product: {e}")
-        return None
-
-def cache_categories(categories_data: List[dict], expire: int = 3600):
-    try:
-        key = "categories:all"
-        redis_client.setex(key, expire, json.dumps(categories_data))
-        logger.info("Cached categories")
-    except Exception as e:
-        logger.error(f"Failed to cache categories: {e}")
-
-def get_cached_categories() -> Optional[List[dict]]:
-    try:
-        key = "categories:all"
-        data = redis_client.get(key)
-        if data:
-            return json.loads(data)
-        return None
-    except Exception as e:
-        logger.error(f"Failed to get cached categories: {e}")
-        return None
-
 def invalidate_product_cache(product_id: int):
     try:
         keys_to_delete = [
@@ -291,6 +241,9 @@ def invalidate_product_cache(product_id: int):
         for key in keys_to_delete:
             pipeline.delete(key)
         pipeline.execute()
+        response_cache.delete(f"product:{product_id}")
+        content_versions.bump(f"product:{product_id}")
+        product_catalog.invalidate(product_id)
         pattern_keys = redis_client.keys("products:search:*")
         if pattern_keys:
             redis_client.delete(*pattern_keys)
@@ -299,25 +252,6 @@ def invalidate_product_cache(product_id: int):
         logger.error(f"Failed to invalidate product cache: {e}")
 
 # ===== UTILITY FUNCTIONS =====
-def normalize_image_urls(image_data):
-    if not image_data:
-        return image_data
-    if isinstance(image_data, str):
-        if image_data.startswith(('http://', 'https://')):
-            parsed = urlparse(image_data)
-            return parsed.path
-        return image_data
-    elif isinstance(image_data, list):
-        normalized = []
-        for img_url in image_data:
-            if img_url and img_url.startswith(('http://', 'https://')):
-                parsed = urlparse(img_url)
-                normalized.append(parsed.path)
-            else:
-                normalized.append(img_url)
-        return normalized
-    return image_data
-
 def update_session_product_views(session, product_id: int, session_id: str):
     try:
         if not session or not session_id:
@@ -329,6 +263,7 @@ def update_session_product_views(session, product_id: int, session_id: str):
         session_service.update_session_data(session_id, {
             'viewed_products': viewed_products
         })
+        recommendation_engine.record_views(session_id, viewed_products)
     except Exception as e:
         logger.error(f"Failed to update session product views: {e}")
 
@@ -508,9 +443,12 @@ async def get_site_settings(current_user: dict = Depends(get_current_user)):
         )
 
 @router.get("/frontend-settings")
-async def get_frontend_settings():
+async def get_frontend_settings(request: Request, response: Response):
     try:
-        config.refresh_cache()
+        etag = content_versions.etag("settings")
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers.update(conditional_headers(etag))
         frontend_settings = {
             'site_name': config.site_name,
             'site_description': config.site_description,
@@ -539,7 +477,11 @@ async def get_frontend_settings():
         )
 
 # ===== PRODUCT LISTING ENDPOINTS =====
-@router.get("/", response_model=ProductListResponse)
+def listing_cost(request: Request) -> int:
+    """Searches answered by the in-memory index cost no more than a listing; only the MySQL fallback is charged extra."""
+    return 1 if product_search.ready else search_cost(request)
+
+@router.get("/", response_model=ProductListResponse, dependencies=[Depends(rate_limited('catalog', cost=listing_cost))])
 async def get_products(
         request: Request,
         search: Optional[str] = Query(None),
@@ -553,13 +495,17 @@ async def get_products(
         min_price: Optional[float] = Query(None),
         max_price: Optional[float] = Query(None),
         in_stock: Optional[bool] = Query(None),
-        sort_by: str = Query("created_at"),
+        include_subcategories: bool = Query(False),
+        include_facets: bool = Query(False),
+        image_size: Optional[str] = Query(None, pattern="^(thumb|card|detail)$"),
+        sort_by: Optional[str] = Query(None),
         sort_order: str = Query("desc"),
         page: int = Query(1, ge=1),
-        page_size: int = Query(20, ge=1, le=100)
+        page_size: int = Query(20, ge=1, le=100),
+        pagination: str = Query("offset", pattern="^(offset|cursor)$"),
+        page_cursor: Optional[str] = Query(None, alias="cursor")
 ):
     try:
-        await rate_limiter.check_rate_limit(request)
         config.refresh_cache()
         if config.maintenance_mode:
             raise HTTPException(
@@ -573,6 +519,71 @@ async def get_products(
             except Exception as e:
                 logger.warning(f"Failed to update session activity: {e}")
         logger.info(f"🔍 Fetching products with filters - search: {search}, category_id: {category_id}, page: {page}")
+        # Slugs become ids up front so filters hit the indexed id columns without joins
+        for slug, kind in ((category_slug, 'category'), (brand_slug, 'brand')):
+            if not slug:
+                continue
+            resolved_id = slug_directory.resolve(kind, sanitize_input(slug))
+            requested_id = category_id if kind == 'category' else brand_id
+            if not resolved_id or (requested_id and requested_id != resolved_id):
+                return ProductListResponse(products=[], total_count=0, page=page, page_size=page_size, total_pages=0)
+            if kind == 'category':
+                category_id = resolved_id
+            else:
+                brand_id = resolved_id
+        category_ids = None
+        if include_subcategories and category_id:
+            # Subtree from the in-process category tree instead of recursive SQL
+            category_ids = category_tree.descendant_ids(category_id)
+        filters = {
+            'category_id': frozenset(category_ids) if category_ids else category_id or None,
+            'brand_id': brand_id or None,
+            'min_price': min_price,
+            'max_price': max_price,
+            'in_stock': in_stock or None,
+            'is_featured': featured,
+            'is_trending': trending,
+            'is_bestseller': bestseller
+        }
+        facets = None
+        product_ids = None
+        if search and product_search.ready:
+            # Ranked in-process; MySQL is only asked for the page's rows by primary key
+            product_ids, total_count = product_search.search(
+                search,
+                filters=filters,
+                sort_by=sort_by,
+                sort_order=sort_order,
+                offset=(page - 1) * page_size,
+                limit=page_size
+            )
+            if include_facets and facet_index.ready:
+                _, _, facets = facet_index.query(filters, limit=0, within=product_search.match_ids(search),
+                                                 with_facets=True)
+            logger.info(f"✅ Search index matched {total_count} products")
+        elif not search and facet_index.ready and pagination == "offset" and not page_cursor:
+            # Filtered and sorted over in-memory bitmaps; facet counts come from the same pass
+            product_ids, total_count, facets = facet_index.query(
+                filters,
+                sort_by=sort_by or "created_at",
+                sort_order=sort_order if sort_order in ("asc", "desc") else "desc",
+                offset=(page - 1) * page_size,
+                limit=page_size,
+                with_facets=include_facets
+            )
+            logger.info(f"✅ Facet index matched {total_count} products")
+        if product_ids is not None:
+            with db.get_cursor() as cursor:
+                rows = fetch_listing_rows(cursor, product_ids)
+                documents = load_listing_documents(cursor, product_ids)
+            return ProductListResponse(
+                products=assemble_listing(rows, documents, image_size),
+                total_count=total_count,
+                page=page,
+                page_size=page_size,
+                total_pages=(total_count + page_size - 1) // page_size,
+                facets=facets
+            )
         query_conditions = ["p.status = 'active'"]
         query_params = []
         if search:
@@ -583,18 +594,15 @@ async def get_products(
             query_conditions.append(search_condition)
             search_term = f"%{sanitize_input(search)}%"
             query_params.extend([search, search_term, search_term, search_term])
-        if category_id:
+        if category_ids:
+            query_conditions.append(f"p.category_id IN ({','.join(['%s'] * len(category_ids))})")
+            query_params.extend(category_ids)
+        elif category_id:
             query_conditions.append("p.category_id = %s")
             query_params.append(category_id)
         if brand_id:
             query_conditions.append("p.brand_id = %s")
             query_params.append(brand_id)
-        if category_slug:
-            query_conditions.append("c.slug = %s")
-            query_params.append(sanitize_input(category_slug))
-        if brand_slug:
-            query_conditions.append("b.slug = %s")
-            query_params.append(sanitize_input(brand_slug))
         if min_price is not None:
             query_conditions.append("p.base_price >= %s")
             query_params.append(min_price)
@@ -620,98 +628,53 @@ async def get_products(
         if sort_order not in valid_sort_orders:
             sort_order = "desc"
         with db.get_cursor() as cursor:
-            products_query = f"""
-                SELECT
-                    p.*,
-                    c.name as category_name,
-                    c.slug as category_slug,
-                    b.name as brand_name,
-                    b.slug as brand_slug,
-                    COUNT(*) OVER() as total_count
+            count_query = f"""
+                SELECT COUNT(*) as total
                 FROM products p
-                LEFT JOIN categories c ON p.category_id = c.id
-                LEFT JOIN brands b ON p.brand_id = b.id
                 WHERE {where_clause}
-                ORDER BY p.{sort_by} {sort_order.upper()}
-                LIMIT %s OFFSET %s
             """
-            offset = (page - 1) * page_size
-            final_params = query_params + [page_size, offset]
-            logger.info(f"📦 Products query executing with {len(final_params)} parameters")
-            cursor.execute(products_query, final_params)
-            products = cursor.fetchall()
-            total_count = 0
-            if products:
-                total_count = products[0].get('total_count', 0)
+            next_cursor = None
+            if pagination == "cursor" or page_cursor:
+                # Index range per page; the total is a cached count, not a window over the whole set
+                direction = sort_order.upper()
+                keyset = KeysetPage([(f"p.{sort_by}", "sort_value", direction), ("p.id", "id", direction)], page_cursor)
+                page_clause, page_params = keyset.page_clause(page_size)
+                cursor.execute(f"""
+                    SELECT
+                        p.id, p.stock_quantity, p.stock_status, p.view_count,
+                        p.wishlist_count, p.total_sold, p.updated_at,
+                        p.{sort_by} as sort_value
+                    FROM products p
+                    WHERE {where_clause}
+                    {page_clause}
+                """, query_params + page_params)
+                products, next_cursor = keyset.split(cursor.fetchall(), page_size)
+                total_count = cached_count(cursor, count_query, query_params)
             else:
-                count_query = f"""
-                    SELECT COUNT(*) as total
+                products_query = f"""
+                    SELECT
+                        p.id, p.stock_quantity, p.stock_status, p.view_count,
+                        p.wishlist_count, p.total_sold, p.updated_at,
+                        COUNT(*) OVER() as total_count
                     FROM products p
-                    LEFT JOIN categories c ON p.category_id = c.id
-                    LEFT JOIN brands b ON p.brand_id = b.id
                     WHERE {where_clause}
+                    ORDER BY p.{sort_by} {sort_order.upper()}
+                    LIMIT %s OFFSET %s
                 """
-                cursor.execute(count_query, query_params)
-                total_count = cursor.fetchone()['total']
+                offset = (page - 1) * page_size
+                final_params = query_params + [page_size, offset]
+                logger.info(f"📦 Products query executing with {len(final_params)} parameters")
+                cursor.execute(products_query, final_params)
+                products = cursor.fetchall()
+                total_count = 0
+                if products:
+                    total_count = products[0].get('total_count', 0)
+                else:
+                    cursor.execute(count_query, query_params)
+                    total_count = cursor.fetchone()['total']
             logger.info(f"📦 Products fetched: {len(products)}, total: {total_count}")
-            product_list = []
-            for product in products:
-                safe_name = html.escape(product['name']) if product['name'] else ""
-                safe_short_description = html.escape(product['short_description']) if product['short_description'] else ""
-                safe_description = html.escape(product['description']) if product['description'] else ""
-                specification = None
-                image_gallery = None
-                if product['specification']:
-                    try:
-                        if isinstance(product['specification'], str):
-                            specification = ast.literal_eval(product['specification'])
-                        else:
-                            specification = product['specification']
-                    except:
-                        specification = None
-                if product['image_gallery']:
-                    try:
-                        if isinstance(product['image_gallery'], str):
-                            image_gallery = ast.literal_eval(product['image_gallery'])
-                        else:
-                            image_gallery = product['image_gallery']
-                    except:
-                        image_gallery = None
-                main_image_url = normalize_image_urls(product['main_image_url'])
-                image_gallery = normalize_image_urls(image_gallery)
-                product_list.append(ProductResponse(
-                    id=product['id'],
-                    uuid=product['uuid'],
-                    name=safe_name,
-                    sku=product['sku'],
-                    slug=product['slug'],
-                    short_description=safe_short_description,
-                    description=safe_description,
-                    base_price=float(product['base_price']),
-                    compare_price=float(product['compare_price']) if product['compare_price'] else None,
-                    category_id=product['category_id'],
-                    brand_id=product['brand_id'],
-                    specification=specification,
-                    gst_rate=float(product['gst_rate']),
-                    is_gst_inclusive=bool(product['is_gst_inclusive']),
-                    track_inventory=bool(product['track_inventory']),
-                    stock_quantity=product['stock_quantity'],
-                    low_stock_threshold=product['low_stock_threshold'],
-                    stock_status=product['stock_status'],
-                    product_type=product['product_type'],
-                    weight_grams=float(product['weight_grams']) if product['weight_grams'] else None,
-                    main_image_url=main_image_url,
-                    image_gallery=image_gallery,
-                    status=product['status'],
-                    is_featured=bool(product['is_featured']),
-                    is_trending=bool(product['is_trending']),
-                    is_bestseller=bool(product['is_bestseller']),
-                    view_count=product['view_count'],
-                    wishlist_count=product['wishlist_count'],
-                    total_sold=product['total_sold'],
-                    created_at=product['created_at'],
-                    updated_at=product['updated_at']
-                ))
+            documents = load_listing_documents(cursor, [product['id'] for product in products])
+            product_list = assemble_listing(products, documents, image_size)
             total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
             logger.info(f"✅ Successfully returning {len(product_list)} products")
             return ProductListResponse(
@@ -719,8 +682,11 @@ async def get_products(
                 total_count=total_count,
                 page=page,
                 page_size=page_size,
-                total_pages=total_pages
+                total_pages=total_pages,
+                next_cursor=next_cursor
             )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Failed to fetch products: {str(e)}")
         logger.error(f"❌ Error type: {type(e).__name__}")
@@ -731,14 +697,111 @@ async def get_products(
             detail="Failed to fetch products"
         )
 
-@router.get("/featured", response_model=ProductListResponse)
-async def get_featured_products(
-        request: Request,
-        page: int = Query(1, ge=1),
-        page_size: int = Query(20, ge=1, le=100)
-):
+# ===== HOME-PAGE COLLECTIONS =====
+COLLECTIONS = {
+    'featured': {
+        'label': "featured products",
+        'where': "p.status = 'active' AND p.is_featured = 1",
+        'order_by': [("p.created_at", "created_at", "DESC"), ("p.id", "id", "DESC")]
+    },
+    'bestsellers': {
+        'label': "bestseller products",
+        'where': "p.status = 'active' AND p.is_bestseller = 1",
+        'order_by': [("p.total_sold", "total_sold", "DESC"), ("p.created_at", "created_at", "DESC"), ("p.id", "id", "DESC")]
+    },
+    'new_arrivals': {
+        'label': "new arrivals",
+        'where': "p.status = 'active' AND p.created_at >= DATE_SUB(NOW(), INTERVAL 30 DAY)",
+        'order_by': [("p.created_at", "created_at", "DESC"), ("p.id", "id", "DESC")]
+    }
+}
+
+def _product_response(product: dict) -> ProductResponse:
+    decoded = decode_product_row(product)
+    return ProductResponse(
+        id=product['id'],
+        uuid=product['uuid'],
+        name=product['name'],
+        sku=product['sku'],
+        slug=product['slug'],
+        short_description=product['short_description'],
+        description=product['description'],
+        base_price=float(product['base_price']),
+        compare_price=float(product['compare_price']) if product['compare_price'] else None,
+        category_id=product['category_id'],
+        brand_id=product['brand_id'],
+        specification=decoded['specification'],
+        gst_rate=float(product['gst_rate']),
+        is_gst_inclusive=bool(product['is_gst_inclusive']),
+        track_inventory=bool(product['track_inventory']),
+        stock_quantity=product['stock_quantity'],
+        low_stock_threshold=product['low_stock_threshold'],
+        stock_status=product['stock_status'],
+        product_type=product['product_type'],
+        weight_grams=float(product['weight_grams']) if product['weight_grams'] else None,
+        main_image_url=decoded['main_image_url'],
+        image_gallery=decoded['image_gallery'],
+        image_variants=decoded.get('image_variants'),
+        status=product['status'],
+        is_featured=bool(product['is_featured']),
+        is_trending=bool(product['is_trending']),
+        is_bestseller=bool(product['is_bestseller']),
+        view_count=product['view_count'],
+        wishlist_count=product['wishlist_count'],
+        total_sold=product['total_sold'],
+        created_at=product['created_at'],
+        updated_at=product['updated_at']
+    )
+
+def load_collection_page(name: str, page: int, page_size: int, page_cursor: Optional[str] = None,
+                         use_cursor: bool = False) -> ProductListResponse:
+    collection = COLLECTIONS[name]
+    keyset = KeysetPage(collection['order_by'], page_cursor)
+    count_query = f"SELECT COUNT(*) as total FROM products p WHERE {collection['where']}"
+    next_cursor = None
+    with db.get_cursor() as cursor:
+        if use_cursor:
+            total_count = cached_count(cursor, count_query, [])
+            page_clause, page_params = keyset.page_clause(page_size)
+        else:
+            cursor.execute(count_query)
+            total_count = cursor.fetchone()['total']
+            page_clause = f"ORDER BY {keyset.order_sql()} LIMIT %s OFFSET %s"
+            page_params = [page_size, (page - 1) * page_size]
+        cursor.execute(f"""
+            SELECT
+                p.*,
+                c.name as category_name,
+                c.slug as category_slug,
+                b.name as brand_name,
+                b.slug as brand_slug
+            FROM products p
+            LEFT JOIN categories c ON p.category_id = c.id
+            LEFT JOIN brands b ON p.brand_id = b.id
+            WHERE {collection['where']}
+            {page_clause}
+        """, page_params)
+        products = cursor.fetchall()
+    if use_cursor:
+        products, next_cursor = keyset.split(products, page_size)
+    return ProductListResponse(
+        products=[_product_response(product) for product in products],
+        total_count=total_count,
+        page=page,
+        page_size=page_size,
+        total_pages=(total_count + page_size - 1) // page_size,
+        next_cursor=next_cursor
+    )
+
+for _collection_name in COLLECTIONS:
+    collection_cache.register(
+        _collection_name,
+        lambda page, page_size, name=_collection_name: load_collection_page(name, page, page_size)
+    )
+
+async def serve_collection(name: str, request: Request, page: int, page_size: int,
+                           pagination: str, page_cursor: Optional[str]):
     try:
-        await rate_limiter.check_rate_limit(request)
         config.refresh_cache()
         if config.maintenance_mode:
             raise HTTPException(
@@ -748,315 +811,70 @@ async def get_featured_products(
         session_id = get_session_id(request)
         if session_id:
             session_service.update_session_activity(session_id)
-        with db.get_cursor() as cursor:
-            count_query = "SELECT COUNT(*) as total FROM products WHERE status = 'active' AND is_featured = 1"
-            cursor.execute(count_query)
-            total_count = cursor.fetchone()['total']
-            offset = (page - 1) * page_size
-            products_query = """
-                SELECT
-                    p.*,
-                    c.name as category_name,
-                    c.slug as category_slug,
-                    b.name as brand_name,
-                    b.slug as brand_slug
-                FROM products p
-                LEFT JOIN categories c ON p.category_id = c.id
-                LEFT JOIN brands b ON p.brand_id = b.id
-                WHERE p.status = 'active' AND p.is_featured = 1
-                ORDER BY p.created_at DESC
-                LIMIT %s OFFSET %s
-            """
-            cursor.execute(products_query, [page_size, offset])
-            products = cursor.fetchall()
-            product_list = []
-            for product in products:
-                specification = None
-                image_gallery = None
-                if product['specification']:
-                    try:
-                        if isinstance(product['specification'], str):
-                            specification = ast.literal_eval(product['specification'])
-                        else:
-                            specification = product['specification']
-                    except:
-                        specification = None
-                if product['image_gallery']:
-                    try:
-                        if isinstance(product['image_gallery'], str):
-                            image_gallery = ast.literal_eval(product['image_gallery'])
-                        else:
-                            image_gallery = product['image_gallery']
-                    except:
-                        image_gallery = None
-                main_image_url = normalize_image_urls(product['main_image_url'])
-                image_gallery = normalize_image_urls(image_gallery)
-                product_list.append(ProductResponse(
-                    id=product['id'],
-                    uuid=product['uuid'],
-                    name=product['name'],
-                    sku=product['sku'],
-                    slug=product['slug'],
-                    short_description=product['short_description'],
-                    description=product['description'],
-                    base_price=float(product['base_price']),
-                    compare_price=float(product['compare_price']) if product['compare_price'] else None,
-                    category_id=product['category_id'],
-                    brand_id=product['brand_id'],
-                    specification=specification,
-                    gst_rate=float(product['gst_rate']),
-                    is_gst_inclusive=bool(product['is_gst_inclusive']),
-                    track_inventory=bool(product['track_inventory']),
-                    stock_quantity=product['stock_quantity'],
-                    low_stock_threshold=product['low_stock_threshold'],
-                    stock_status=product['stock_status'],
-                    product_type=product['product_type'],
-                    weight_grams=float(product['weight_grams']) if product['weight_grams'] else None,
-                    main_image_url=main_image_url,
-                    image_gallery=image_gallery,
-                    status=product['status'],
-                    is_featured=bool(product['is_featured']),
-                    is_trending=bool(product['is_trending']),
-                    is_bestseller=bool(product['is_bestseller']),
-                    view_count=product['view_count'],
-                    wishlist_count=product['wishlist_count'],
-                    total_sold=product['total_sold'],
-                    created_at=product['created_at'],
-                    updated_at=product['updated_at']
-                ))
-            total_pages = (total_count + page_size - 1) // page_size
-            return ProductListResponse(
-                products=product_list,
-                total_count=total_count,
-                page=page,
-                page_size=page_size,
-                total_pages=total_pages
-            )
+        if pagination == "cursor" or page_cursor:
+            return load_collection_page(name, page, page_size, page_cursor, use_cursor=True)
+        return Response(content=collection_cache.get(name, page, page_size), media_type="application/json")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Failed to fetch featured products: {e}")
+        logger.error(f"Failed to fetch {COLLECTIONS[name]['label']}: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to fetch featured products"
+            detail=f"Failed to fetch {COLLECTIONS[name]['label']}"
         )
 
-@router.get("/bestsellers", response_model=ProductListResponse)
+@router.get("/featured", response_model=ProductListResponse, dependencies=[Depends(rate_limited('catalog'))])
+async def get_featured_products(
+        request: Request,
+        page: int = Query(1, ge=1),
+        page_size: int = Query(20, ge=1, le=100),
+        pagination: str = Query("offset", pattern="^(offset|cursor)$"),
+        page_cursor: Optional[str] = Query(None, alias="cursor")
+):
+    return await serve_collection('featured', request, page, page_size, pagination, page_cursor)
+
+@router.get("/bestsellers", response_model=ProductListResponse, dependencies=[Depends(rate_limited('catalog'))])
 async def get_bestseller_products(
         request: Request,
         page: int = Query(1, ge=1),
-        page_size: int = Query(20, ge=1, le=100)
+        page_size: int = Query(20, ge=1, le=100),
+        pagination: str = Query("offset", pattern="^(offset|cursor)$"),
+        page_cursor: Optional[str] = Query(None, alias="cursor")
 ):
-    try:
-        await rate_limiter.check_rate_limit(request)
-        config.refresh_cache()
-        if config.maintenance_mode:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Service is under maintenance. Please try again later."
-            )
-        session_id = get_session_id(request)
-        if session_id:
-            session_service.update_session_activity(session_id)
-        with db.get_cursor() as cursor:
-            count_query = "SELECT COUNT(*) as total FROM products WHERE status = 'active' AND is_bestseller = 1"
-            cursor.execute(count_query)
-            total_count = cursor.fetchone()['total']
-            offset = (page - 1) * page_size
-            products_query = """
-                SELECT
-                    p.*,
-                    c.name as category_name,
-                    c.slug as category_slug,
-                    b.name as brand_name,
-                    b.slug as brand_slug
-                FROM products p
-                LEFT JOIN categories c ON p.category_id = c.id
-                LEFT JOIN brands b ON p.brand_id = b.id
-                WHERE p.status = 'active' AND p.is_bestseller = 1
-                ORDER BY p.total_sold DESC, p.created_at DESC
-                LIMIT %s OFFSET %s
-            """
-            cursor.execute(products_query, [page_size, offset])
-            products = cursor.fetchall()
-            product_list = []
-            for product in products:
-                specification = None
-                image_gallery = None
-                if product['specification']:
-                    try:
-                        if isinstance(product['specification'], str):
-                            specification = ast.literal_eval(product['specification'])
-                        else:
-                            specification = product['specification']
-                    except:
-                        specification = None
-                if product['image_gallery']:
-                    try:
-                        if isinstance(product['image_gallery'], str):
-                            image_gallery = ast.literal_eval(product['image_gallery'])
-                        else:
-                            image_gallery = product['image_gallery']
-                    except:
-                        image_gallery = None
-                main_image_url = normalize_image_urls(product['main_image_url'])
-                image_gallery = normalize_image_urls(image_gallery)
-                product_list.append(ProductResponse(
-                    id=product['id'],
-                    uuid=product['uuid'],
-                    name=product['name'],
-                    sku=product['sku'],
-                    slug=product['slug'],
-                    short_description=product['short_description'],
-                    description=product['description'],
-                    base_price=float(product['base_price']),
-                    compare_price=float(product['compare_price']) if product['compare_price'] else None,
-                    category_id=product['category_id'],
-                    brand_id=product['brand_id'],
-                    specification=specification,
-                    gst_rate=float(product['gst_rate']),
-                    is_gst_inclusive=bool(product['is_gst_inclusive']),
-                    track_inventory=bool(product['track_inventory']),
-                    stock_quantity=product['stock_quantity'],
-                    low_stock_threshold=product['low_stock_threshold'],
-                    stock_status=product['stock_status'],
-                    product_type=product['product_type'],
-                    weight_grams=float(product['weight_grams']) if product['weight_grams'] else None,
-                    main_image_url=main_image_url,
-                    image_gallery=image_gallery,
-                    status=product['status'],
-                    is_featured=bool(product['is_featured']),
-                    is_trending=bool(product['is_trending']),
-                    is_bestseller=bool(product['is_bestseller']),
-                    view_count=product['view_count'],
-                    wishlist_count=product['wishlist_count'],
-                    total_sold=product['total_sold'],
-                    created_at=product['created_at'],
-                    updated_at=product['updated_at']
-                ))
-            total_pages = (total_count + page_size - 1) // page_size
-            return ProductListResponse(
-                products=product_list,
-                total_count=total_count,
-                page=page,
-                page_size=page_size,
-                total_pages=total_pages
-            )
-    except Exception as e:
-        logger.error(f"Failed to fetch bestseller products: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to fetch bestseller products"
-        )
+    return await serve_collection('bestsellers', request, page, page_size, pagination, page_cursor)
 
-@router.get("/new-arrivals", response_model=ProductListResponse)
+@router.get("/new-arrivals", response_model=ProductListResponse, dependencies=[Depends(rate_limited('catalog'))])
 async def get_new_arrivals(
         request: Request,
         page: int = Query(1, ge=1),
-        page_size: int = Query(20, ge=1, le=100)
+        page_size: int = Query(20, ge=1, le=100),
+        pagination: str = Query("offset", pattern="^(offset|cursor)$"),
+        page_cursor: Optional[str] = Query(None, alias="cursor")
 ):
-    try:
-        await rate_limiter.check_rate_limit(request)
-        config.refresh_cache()
-        if config.maintenance_mode:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Service is under maintenance. Please try again later."
-            )
-        session_id = get_session_id(request)
-        if session_id:
-            session_service.update_session_activity(session_id)
-        with db.get_cursor() as cursor:
-            count_query = "SELECT COUNT(*) as total FROM products WHERE status = 'active' AND created_at >= DATE_SUB(NOW(), INTERVAL 30 DAY)"
-            cursor.execute(count_query)
-            total_count = cursor.fetchone()['total']
-            offset = (page - 1) * page_size
-            products_query = """
-                SELECT
-                    p.*,
-                    c.name as category_name,
-                    c.slug as category_slug,
-                    b.name as brand_name,
-                    b.slug as brand_slug
-                FROM products p
-                LEFT JOIN categories c ON p.category_id = c.id
-                LEFT JOIN brands b ON p.brand_id = b.id
-                WHERE p.status = 'active' AND p.created_at >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-                ORDER BY p.created_at DESC
-                LIMIT %s OFFSET %s
-            """
-            cursor.execute(products_query, [page_size, offset])
-            products = cursor.fetchall()
-            product_list = []
-            for product in products:
-                specification = None
-                image_gallery = None
-                if product['specification']:
-                    try:
-                        if isinstance(product['specification'], str):
-                            specification = ast.literal_eval(product['specification'])
-                        else:
-                            specification = product['specification']
-                    except:
-                        specification = None
-                if product['image_gallery']:
-                    try:
-                        if isinstance(product['image_gallery'], str):
-                            image_gallery = ast.literal_eval(product['image_gallery'])
-                        else:
-                            image_gallery = product['image_gallery']
-                    except:
-                        image_gallery = None
-                main_image_url = normalize_image_urls(product['main_image_url'])
-                image_gallery = normalize_image_urls(image_gallery)
-                product_list.append(ProductResponse(
-                    id=product['id'],
-                    uuid=product['uuid'],
-                    name=product['name'],
-                    sku=product['sku'],
-                    slug=product['slug'],
-                    short_description=product['short_description'],
-                    description=product['description'],
-                    base_price=float(product['base_price']),
-                    compare_price=float(product['compare_price']) if product['compare_price'] else None,
-                    category_id=product['category_id'],
-                    brand_id=product['brand_id'],
-                    specification=specification,
-                    gst_rate=float(product['gst_rate']),
-                    is_gst_inclusive=bool(product['is_gst_inclusive']),
-                    track_inventory=bool(product['track_inventory']),
-                    stock_quantity=product['stock_quantity'],
-                    low_stock_threshold=product['low_stock_threshold'],
-                    stock_status=product['stock_status'],
-                    product_type=product['product_type'],
-                    weight_grams=float(product['weight_grams']) if product['weight_grams'] else None,
-                    main_image_url=main_image_url,
-                    image_gallery=image_gallery,
-                    status=product['status'],
-                    is_featured=bool(product['is_featured']),
-                    is_trending=bool(product['is_trending']),
-                    is_bestseller=bool(product['is_bestseller']),
-                    view_count=product['view_count'],
-                    wishlist_count=product['wishlist_count'],
-                    total_sold=product['total_sold'],
-                    created_at=product['created_at'],
-                    updated_at=product['updated_at']
-                ))
-            total_pages = (total_count + page_size - 1) // page_size
-            return ProductListResponse(
-                products=product_list,
-                total_count=total_count,
-                page=page,
-                page_size=page_size,
-                total_pages=total_pages
-            )
-    except Exception as e:
-        logger.error(f"Failed to fetch new arrivals: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to fetch new arrivals"
-        )
+    return await serve_collection('new_arrivals', request, page, page_size, pagination, page_cursor)
 
 # ===== PRODUCT DETAIL ENDPOINTS =====
-@router.get("/{product_id}", response_model=ProductResponse)
+@router.get("/search/suggest", dependencies=[Depends(rate_limited('catalog'))])
+async def suggest_products(
+        q: str = Query(..., min_length=1, max_length=100),
+        limit: int = Query(8, ge=1, le=20)
+):
+    if not product_search.ready:
+        return {"query": q, "completions": [], "products": [], "ready": False}
+    suggestions = product_search.suggest(q, limit)
+    return {"query": q, **suggestions, "ready": True}
+
+@router.get("/search/stats")
+async def search_index_stats(request: Request):
+    await require_roles(['admin'], request)
+    return product_search.stats()
+
+@router.get("/facets/stats")
+async def facet_index_stats(request: Request):
+    await require_roles(['admin'], request)
+    return facet_index.stats()
+
+@router.get("/{product_id}", response_model=ProductResponse, dependencies=[Depends(rate_limited('catalog'))])
 async def get_product(product_id: int, request: Request):
     if product_id <= 0:
         raise HTTPException(
@@ -1064,13 +882,15 @@ async def get_product(product_id: int, request: Request):
             detail="Invalid product ID"
         )
     try:
-        await rate_limiter.check_rate_limit(request)
-        config.refresh_cache()
         if config.maintenance_mode:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Service is under maintenance. Please try again later."
             )
+        etag = content_versions.etag(f"product:{product_id}")
+        if etag_matches(request, etag):
+            view_counter.record(product_id)
+            return not_modified(etag)
         session = get_session(request)
         session_id = get_session_id(request)
         if session_id:
@@ -1080,10 +900,10 @@ async def get_product(product_id: int, request: Request):
                     update_session_product_views(session, product_id, session_id)
             except Exception as e:
                 logger.warning(f"Failed to update session views: {e}")
-        cached_product = get_cached_product(product_id)
-        if cached_product:
-            logger.info(f"Returning cached product {product_id}")
-            return ProductResponse(**cached_product)
+        view_counter.record(product_id)
+        cached = response_cache.get(f"product:{product_id}", etag)
+        if cached:
+            return response_cache.respond(*cached, headers=conditional_headers(etag))
         with db.get_cursor() as cursor:
             cursor.execute("""
                 SELECT
@@ -1103,29 +923,10 @@ async def get_product(product_id: int, request: Request):
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Product not found"
                 )
-            cursor.execute("""
-                UPDATE products SET view_count = view_count + 1 WHERE id = %s
-            """, (product_id,))
-            specification = None
-            image_gallery = None
-            if product['specification']:
-                try:
-                    if isinstance(product['specification'], str):
-                        specification = ast.literal_eval(product['specification'])
-                    else:
-                        specification = product['specification']
-                except:
-                    specification = None
-            if product['image_gallery']:
-                try:
-                    if isinstance(product['image_gallery'], str):
-                        image_gallery = ast.literal_eval(product['image_gallery'])
-                    else:
-                        image_gallery = product['image_gallery']
-                except:
-                    image_gallery = None
-            main_image_url = normalize_image_urls(product['main_image_url'])
-            image_gallery = normalize_image_urls(image_gallery)
+            decoded = decode_product_row(product)
+            specification = decoded['specification']
+            image_gallery = decoded['image_gallery']
+            main_image_url = decoded['main_image_url']
             max_cart_quantity = product['max_cart_quantity'] or 20
             safe_name = html.escape(product['name']) if product['name'] else ""
             safe_short_description = html.escape(product['short_description']) if product['short_description'] else ""
@@ -1153,18 +954,19 @@ async def get_product(product_id: int, request: Request):
                 weight_grams=float(product['weight_grams']) if product['weight_grams'] else None,
                 main_image_url=main_image_url,
                 image_gallery=image_gallery,
+                image_variants=decoded.get('image_variants'),
                 status=product['status'],
                 is_featured=bool(product['is_featured']),
                 is_trending=bool(product['is_trending']),
                 is_bestseller=bool(product['is_bestseller']),
-                view_count=product['view_count'] + 1,
+                view_count=product['view_count'],
                 wishlist_count=product['wishlist_count'],
                 total_sold=product['total_sold'],
                 created_at=product['created_at'],
                 updated_at=product['updated_at']
             )
-            cache_product(product_id, product_response.dict())
-            return product_response
+            body, body_etag = response_cache.set(f"product:{product_id}", product_response, expire=1800, etag=etag)
+            return response_cache.respond(body, body_etag, headers=conditional_headers(etag))
     except HTTPException:
         raise
     except Exception as e:
@@ -1174,128 +976,41 @@ async def get_product(product_id: int, request: Request):
             detail="Failed to fetch product"
         )
 
-@router.get("/slug/{product_slug}", response_model=ProductResponse)
+@router.get("/slug/{product_slug}", response_model=ProductResponse, dependencies=[Depends(rate_limited('catalog'))])
 async def get_product_by_slug(product_slug: str, request: Request):
-    try:
-        await rate_limiter.check_rate_limit(request)
-        config.refresh_cache()
-        if config.maintenance_mode:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Service is under maintenance. Please try again later."
-            )
-        session = get_session(request)
-        session_id = get_session_id(request)
-        if session_id:
-            session_service.update_session_activity(session_id)
-        with db.get_cursor() as cursor:
-            cursor.execute("""
-                SELECT
-                    p.*,
-                    c.name as category_name,
-                    c.slug as category_slug,
-                    b.name as brand_name,
-                    b.slug as brand_slug
-                FROM products p
-                LEFT JOIN categories c ON p.category_id = c.id
-                LEFT JOIN brands b ON p.brand_id = b.id
-                WHERE p.slug = %s AND p.status = 'active'
-            """, (sanitize_input(product_slug),))
-            product = cursor.fetchone()
-            if not product:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Product not found"
-                )
-            cursor.execute("""
-                UPDATE products SET view_count = view_count + 1 WHERE id = %s
-            """, (product['id'],))
-            if session_id:
-                update_session_product_views(session, product['id'], session_id)
-            specification = None
-            image_gallery = None
-            if product['specification']:
-                try:
-                    if isinstance(product['specification'], str):
-                        specification = ast.literal_eval(product['specification'])
-                    else:
-                        specification = product['specification']
-                except:
-                    specification = None
-            if product['image_gallery']:
-                try:
-                    if isinstance(product['image_gallery'], str):
-                        image_gallery = ast.literal_eval(product['image_gallery'])
-                    else:
-                        image_gallery = product['image_gallery']
-                except:
-                    image_gallery = None
-            main_image_url = normalize_image_urls(product['main_image_url'])
-            image_gallery = normalize_image_urls(image_gallery)
-            return ProductResponse(
-                id=product['id'],
-                uuid=product['uuid'],
-                name=product['name'],
-                sku=product['sku'],
-                slug=product['slug'],
-                short_description=product['short_description'],
-                description=product['description'],
-                base_price=float(product['base_price']),
-                compare_price=float(product['compare_price']) if product['compare_price'] else None,
-                category_id=product['category_id'],
-                brand_id=product['brand_id'],
-                specification=specification,
-                gst_rate=float(product['gst_rate']),
-                is_gst_inclusive=bool(product['is_gst_inclusive']),
-                track_inventory=bool(product['track_inventory']),
-                stock_quantity=product['stock_quantity'],
-                low_stock_threshold=product['low_stock_threshold'],
-                stock_status=product['stock_status'],
-                product_type=product['product_type'],
-                weight_grams=float(product['weight_grams']) if product['weight_grams'] else None,
-                main_image_url=main_image_url,
-                image_gallery=image_gallery,
-                status=product['status'],
-                is_featured=bool(product['is_featured']),
-                is_trending=bool(product['is_trending']),
-                is_bestseller=bool(product['is_bestseller']),
-                view_count=product['view_count'] + 1,
-                wishlist_count=product['wishlist_count'],
-                total_sold=product['total_sold'],
-                created_at=product['created_at'],
-                updated_at=product['updated_at']
-            )
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Failed to fetch product by slug: {e}")
+    # Same id-keyed response cache, ETag and view counting as the id route
+    product_id = slug_directory.resolve('product', sanitize_input(product_slug))
+    if not product_id:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to fetch product"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
         )
+    return await get_product(product_id, request)
 
 # ===== CATEGORY AND BRAND ENDPOINTS =====
-@router.get("/categories/all", response_model=List[CategoryResponse])
+@router.get("/categories/all", response_model=List[CategoryResponse], dependencies=[Depends(rate_limited('exempt'))])
 async def get_categories(
         request: Request,
+        response: Response,
         parent_id: Optional[int] = Query(None),
         featured: Optional[bool] = Query(None)
 ):
     try:
-        await rate_limiter.check_rate_limit(request)
-        config.refresh_cache()
         if config.maintenance_mode:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Service is under maintenance. Please try again later."
             )
+        etag = content_versions.etag("categories", f"{parent_id}:{featured}")
+        if etag_matches(request, etag):
+            return not_modified(etag)
         session_id = get_session_id(request)
         if session_id:
             session_service.update_session_activity(session_id)
-        cached_categories = get_cached_categories()
-        if cached_categories and parent_id is None and featured is None:
-            logger.info("Returning cached categories")
-            return [CategoryResponse(**cat) for cat in cached_categories]
+        if parent_id is None and featured is None:
+            cached = response_cache.get("categories:all", etag)
+            if cached:
+                return response_cache.respond(*cached, headers=conditional_headers(etag))
         with db.get_cursor() as cursor:
             query_conditions = ["is_active = 1"]
             query_params = []
@@ -1329,8 +1044,12 @@ async def get_categories(
                 for cat in categories
             ]
             if parent_id is None and featured is None:
-                cache_categories([cat.dict() for cat in category_list])
+                body, body_etag = response_cache.set("categories:all", category_list, expire=3600, etag=etag)
+                return response_cache.respond(body, body_etag, headers=conditional_headers(etag))
+            response.headers.update(conditional_headers(etag))
             return category_list
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to fetch categories: {e}")
         raise HTTPException(
@@ -1338,10 +1057,35 @@ async def get_categories(
             detail="Failed to fetch categories"
         )
 
-@router.get("/categories/{category_id}", response_model=CategoryResponse)
+@router.get("/categories/tree", response_model=List[CategoryTreeNode], dependencies=[Depends(rate_limited('exempt'))])
+async def get_category_tree(request: Request):
+    try:
+        if config.maintenance_mode:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Service is under maintenance. Please try again later."
+            )
+        etag = content_versions.etag("categories", "tree")
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        cached = response_cache.get("categories:tree", etag)
+        if cached:
+            return response_cache.respond(*cached, headers=conditional_headers(etag))
+        tree = [CategoryTreeNode(**node) for node in category_tree.tree(force_check=True)]
+        body, body_etag = response_cache.set("categories:tree", tree, expire=3600, etag=etag)
+        return response_cache.respond(body, body_etag, headers=conditional_headers(etag))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to fetch category tree: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch category tree"
+        )
+
+@router.get("/categories/{category_id}", response_model=CategoryResponse, dependencies=[Depends(rate_limited('exempt'))])
 async def get_category(category_id: int, request: Request):
     try:
-        await rate_limiter.check_rate_limit(request)
         config.refresh_cache()
         if config.maintenance_mode:
             raise HTTPException(
@@ -1382,10 +1126,9 @@ async def get_category(category_id: int, request: Request):
             detail="Failed to fetch category"
         )
 
-@router.get("/categories/slug/{category_slug}", response_model=CategoryResponse)
+@router.get("/categories/slug/{category_slug}", response_model=CategoryResponse, dependencies=[Depends(rate_limited('exempt'))])
 async def get_category_by_slug(category_slug: str, request: Request):
     try:
-        await rate_limiter.check_rate_limit(request)
         config.refresh_cache()
         if config.maintenance_mode:
             raise HTTPException(
@@ -1395,11 +1138,20 @@ async def get_category_by_slug(category_slug: str, request: Request):
         session_id = get_session_id(request)
         if session_id:
             session_service.update_session_activity(session_id)
+        category_id = slug_directory.resolve('category', sanitize_input(category_slug))
+        if not category_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Category not found"
+            )
+        node = category_tree.get(category_id)
+        if node:
+            return CategoryResponse(**node)
         with db.get_cursor() as cursor:
             cursor.execute("""
                 SELECT * FROM categories
-                WHERE slug = %s AND is_active = 1
-            """, (sanitize_input(category_slug),))
+                WHERE id = %s AND is_active = 1
+            """, (category_id,))
             category = cursor.fetchone()
             if not category:
                 raise HTTPException(
@@ -1426,16 +1178,18 @@ async def get_category_by_slug(category_slug: str, request: Request):
             detail="Failed to fetch category"
         )
 
-@router.get("/brands/all", response_model=List[BrandResponse])
-async def get_brands(request: Request, featured: Optional[bool] = Query(None)):
+@router.get("/brands/all", response_model=List[BrandResponse], dependencies=[Depends(rate_limited('exempt'))])
+async def get_brands(request: Request, response: Response, featured: Optional[bool] = Query(None)):
     try:
-        await rate_limiter.check_rate_limit(request)
-        config.refresh_cache()
         if config.maintenance_mode:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Service is under maintenance. Please try again later."
             )
+        etag = content_versions.etag("brands", str(featured))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers.update(conditional_headers(etag))
         session_id = get_session_id(request)
         if session_id:
             session_service.update_session_activity(session_id)
@@ -1460,6 +1214,8 @@ async def get_brands(request: Request, featured: Optional[bool] = Query(None)):
                 )
                 for brand in brands
             ]
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to fetch brands: {e}")
         raise HTTPException(
@@ -1467,10 +1223,9 @@ async def get_brands(request: Request, featured: Optional[bool] = Query(None)):
             detail="Failed to fetch brands"
         )
 
-@router.get("/brands/{brand_id}", response_model=BrandResponse)
+@router.get("/brands/{brand_id}", response_model=BrandResponse, dependencies=[Depends(rate_limited('exempt'))])
 async def get_brand(brand_id: int, request: Request):
     try:
-        await rate_limiter.check_rate_limit(request)
         config.refresh_cache()
         if config.maintenance_mode:
             raise HTTPException(
@@ -1647,7 +1402,7 @@ async def remove_from_wishlist(
         )
 
 # ===== PRODUCT VALIDATION ENDPOINTS =====
-@router.get("/{product_id}/cart-validation")
+@router.get("/{product_id}/cart-validation", dependencies=[Depends(rate_limited('cart'))])
 async def validate_product_cart_addition(
         product_id: int,
         quantity: int = Query(1, ge=1),
@@ -1655,7 +1410,6 @@ async def validate_product_cart_addition(
         request: Request = None
 ):
     try:
-        await rate_limiter.check_rate_limit(request)
         if quantity < 1:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -1680,13 +1434,12 @@ async def validate_product_cart_addition(
             detail="Failed to validate product for cart"
         )
 
-@router.post("/bulk-cart-info")
+@router.post("/bulk-cart-info", dependencies=[Depends(rate_limited('bulk'))])
 async def get_bulk_cart_product_info(
         product_ids: List[int],
         request: Request = None
 ):
     try:
-        await rate_limiter.check_rate_limit(request)
         if not product_ids:
             return {"products": []}
         if len(product_ids) > 50:
@@ -1694,43 +1447,32 @@ async def get_bulk_cart_product_info(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Maximum 50 products allowed per request"
             )
-        with db.get_cursor() as cursor:
-            placeholders = ','.join(['%s'] * len(product_ids))
-            query = f"""
-                SELECT
-                    p.id, p.name, p.slug, p.main_image_url, p.base_price,
-                    p.stock_quantity, p.stock_status, p.max_cart_quantity,
-                    p.track_inventory, p.status
-                FROM products p
-                WHERE p.id IN ({placeholders}) AND p.status = 'active'
-            """
-            cursor.execute(query, product_ids)
-            products = cursor.fetchall()
-            product_map = {}
-            for product in products:
-                max_quantity = product['max_cart_quantity'] or 20
-                product_map[product['id']] = {
-                    'id': product['id'],
-                    'name': product['name'],
-                    'slug': product['slug'],
-                    'image_url': product['main_image_url'],
-                    'price': float(product['base_price']),
-                    'stock_status': product['stock_status'],
-                    'max_cart_quantity': max_quantity,
-                    'available': True,
-                    'track_inventory': bool(product['track_inventory'])
-                }
-            result_products = []
-            for pid in product_ids:
-                if pid in product_map:
-                    result_products.append(product_map[pid])
-                else:
-                    result_products.append({
-                        'id': pid,
-                        'available': False,
-                        'stock_status': 'out_of_stock'
-                    })
-            return {"products": result_products}
+        products = product_catalog.get_many(product_ids)
+        product_map = {}
+        for product in products.values():
+            max_quantity = product['max_cart_quantity'] or 20
+            product_map[product['id']] = {
+                'id': product['id'],
+                'name': product['name'],
+                'slug': product['slug'],
+                'image_url': product['main_image_url'],
+                'price': float(product['base_price']),
+                'stock_status': product['stock_status'],
+                'max_cart_quantity': max_quantity,
+                'available': True,
+                'track_inventory': bool(product['track_inventory'])
+            }
+        result_products = []
+        for pid in product_ids:
+            if pid in product_map:
+                result_products.append(product_map[pid])
+            else:
+                result_products.append({
+                    'id': pid,
+                    'available': False,
+                    'stock_status': 'out_of_stock'
+                })
+        return {"products": result_products}
     except Exception as e:
         logger.error(f"Failed to get bulk cart info: {e}")
         raise HTTPException(
@@ -1738,51 +1480,42 @@ async def get_bulk_cart_product_info(
             detail="Failed to get product information"
         )
 
-@router.get("/stock-status/bulk")
+@router.get("/stock-status/bulk", dependencies=[Depends(rate_limited('bulk'))])
 async def get_bulk_stock_status(
         product_ids: List[int] = Query(...),
         request: Request = None
 ):
     try:
-        await rate_limiter.check_rate_limit(request)
         if not product_ids or len(product_ids) > 50:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Maximum 50 products allowed per request"
             )
-        with db.get_cursor() as cursor:
-            placeholders = ','.join(['%s'] * len(product_ids))
-            query = f"""
-                SELECT
-                    id, name, stock_quantity, stock_status,
-                    max_cart_quantity, status
-                FROM products
-                WHERE id IN ({placeholders})
-            """
-            cursor.execute(query, product_ids)
-            products = cursor.fetchall()
-            status_map = {}
-            for product in products:
-                max_quantity = product['max_cart_quantity'] or 20
-                status_map[product['id']] = {
-                    'product_id': product['id'],
-                    'name': product['name'],
-                    'stock_status': product['stock_status'],
-                    'max_cart_quantity': max_quantity,
-                    'available': product['status'] == 'active'
-                }
-            result = []
-            for pid in product_ids:
-                if pid in status_map:
-                    result.append(status_map[pid])
-                else:
-                    result.append({
-                        'product_id': pid,
-                        'available': False,
-                        'stock_status': 'out_of_stock',
-                        'max_cart_quantity': 0
-                    })
-            return {"products": result}
+        products = product_catalog.get_many(
+            product_ids, fields=('id', 'name', 'stock_status', 'max_cart_quantity', 'status'), active_only=False
+        )
+        status_map = {}
+        for product in products.values():
+            max_quantity = product['max_cart_quantity'] or 20
+            status_map[product['id']] = {
+                'product_id': product['id'],
+                'name': product['name'],
+                'stock_status': product['stock_status'],
+                'max_cart_quantity': max_quantity,
+                'available': product['status'] == 'active'
+            }
+        result = []
+        for pid in product_ids:
+            if pid in status_map:
+                result.append(status_map[pid])
+            else:
+                result.append({
+                    'product_id': pid,
+                    'available': False,
+                    'stock_status': 'out_of_stock',
+                    'max_cart_quantity': 0
+                })
+        return {"products": result}
     except Exception as e:
         logger.error(f"Failed to get bulk stock status: {e}")
         raise HTTPException(
@@ -1816,33 +1549,28 @@ async def get_personalized_recommendations(
                 return {"recommendations": products, "source": "featured"}
         viewed_products = getattr(session, 'viewed_products', [])
         wishlist_items = getattr(session, 'wishlist_items', [])
+        seeds = recommendation_engine.session_seeds(viewed_products, wishlist_items)
+        # Over-fetch so inactive neighbours can be dropped without a second round trip
+        ranked = recommendation_engine.recommend(seeds, limit * 2)
         with db.get_cursor() as cursor:
-            if viewed_products:
-                placeholders = ','.join(['%s'] * len(viewed_products))
+            if ranked:
+                placeholders = ','.join(['%s'] * len(ranked))
                 cursor.execute(f"""
-                    SELECT DISTINCT p.*
-                    FROM products p
-                    WHERE p.status = 'active'
-                    AND p.id NOT IN ({placeholders})
-                    AND (p.category_id IN (
-                        SELECT DISTINCT category_id FROM products WHERE id IN ({placeholders})
-                    ) OR p.brand_id IN (
-                        SELECT DISTINCT brand_id FROM products WHERE id IN ({placeholders})
-                    ))
-                    ORDER BY p.view_count DESC, p.created_at DESC
-                    LIMIT %s
-                """, viewed_products + viewed_products + viewed_products + [limit])
-                recommendations = cursor.fetchall()
-                return {"recommendations": recommendations, "source": "viewed_products"}
-            else:
-                cursor.execute("""
                     SELECT * FROM products
-                    WHERE status = 'active' AND is_trending = 1
-                    ORDER BY view_count DESC, created_at DESC
-                    LIMIT %s
-                """, (limit,))
-                recommendations = cursor.fetchall()
-                return {"recommendations": recommendations, "source": "trending"}
+                    WHERE id IN ({placeholders}) AND status = 'active'
+                """, ranked)
+                rows = {row['id']: row for row in cursor.fetchall()}
+                recommendations = [rows[product_id] for product_id in ranked if product_id in rows][:limit]
+                if recommendations:
+                    return {"recommendations": recommendations, "source": "similar_products"}
+            cursor.execute("""
+                SELECT * FROM products
+                WHERE status = 'active' AND is_trending = 1
+                ORDER BY view_count DESC, created_at DESC
+                LIMIT %s
+            """, (limit,))
+            recommendations = cursor.fetchall()
+            return {"recommendations": recommendations, "source": "trending"}
     except Exception as e:
         logger.error(f"Failed to get recommendations: {e}")
         with db.get_cursor() as cursor:
@@ -1939,7 +1667,7 @@ async def create_product(
                 sanitize_input(product_data.slug),
                 sanitize_input(product_data.short_description) if product_data.short_description else None,
                 sanitize_input(product_data.description) if product_data.description else None,
-                str(product_data.specification) if product_data.specification else None,
+                encode_json_column(product_data.specification) if product_data.specification else None,
                 product_data.base_price,
                 product_data.compare_price,
                 product_data.category_id,
@@ -1957,17 +1685,10 @@ async def create_product(
             product_id = cursor.lastrowid
             cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
             product = cursor.fetchone()
-            specification = None
-            if product['specification']:
-                try:
-                    if isinstance(product['specification'], str):
-                        specification = ast.literal_eval(product['specification'])
-                    else:
-                        specification = product['specification']
-                except:
-                    specification = None
-            main_image_url = normalize_image_urls(product['main_image_url'])
-            image_gallery = normalize_image_urls(product['image_gallery'])
+            decoded = decode_product_row(product)
+            specification = decoded['specification']
+            image_gallery = decoded['image_gallery']
+            main_image_url = decoded['main_image_url']
             product_response = ProductResponse(
                 id=product['id'],
                 uuid=product['uuid'],
@@ -1991,6 +1712,7 @@ async def create_product(
                 weight_grams=float(product['weight_grams']) if product['weight_grams'] else None,
                 main_image_url=main_image_url,
                 image_gallery=image_gallery,
+                image_variants=decoded.get('image_variants'),
                 status=product['status'],
                 is_featured=bool(product['is_featured']),
                 is_trending=bool(product['is_trending']),
@@ -2007,6 +1729,9 @@ async def create_product(
                     product,
                     'created'
                 )
+                background_tasks.add_task(refresh_listing_document, product_id)
+                background_tasks.add_task(product_search.refresh_product, product_id)
+                background_tasks.add_task(collection_cache.refresh)
             logger.info(f"Product created successfully: {product_data.name}")
             return product_response
     except HTTPException:
@@ -2069,7 +1794,7 @@ async def update_product(
                 sanitize_input(product_data.slug),
                 sanitize_input(product_data.short_description) if product_data.short_description else None,
                 sanitize_input(product_data.description) if product_data.description else None,
-                str(product_data.specification) if product_data.specification else None,
+                encode_json_column(product_data.specification) if product_data.specification else None,
                 product_data.base_price,
                 product_data.compare_price,
                 product_data.category_id,
@@ -2090,17 +1815,14 @@ async def update_product(
                     'updated'
                 )
             background_tasks.add_task(invalidate_product_cache_comprehensive, product_id)
-            specification = None
-            if product['specification']:
-                try:
-                    if isinstance(product['specification'], str):
-                        specification = ast.literal_eval(product['specification'])
-                    else:
-                        specification = product['specification']
-                except:
-                    specification = None
-            main_image_url = normalize_image_urls(product['main_image_url'])
-            image_gallery = normalize_image_urls(product['image_gallery'])
+            background_tasks.add_task(refresh_listing_document, product_id)
+            background_tasks.add_task(product_search.refresh_product, product_id)
+            background_tasks.add_task(collection_cache.refresh)
+            background_tasks.add_task(slug_directory.invalidate, 'product')
+            decoded = decode_product_row(product)
+            specification = decoded['specification']
+            image_gallery = decoded['image_gallery']
+            main_image_url = decoded['main_image_url']
             return ProductResponse(
                 id=product['id'],
                 uuid=product['uuid'],
@@ -2124,6 +1846,7 @@ async def update_product(
                 weight_grams=float(product['weight_grams']) if product['weight_grams'] else None,
                 main_image_url=main_image_url,
                 image_gallery=image_gallery,
+                image_variants=decoded.get('image_variants'),
                 status=product['status'],
                 is_featured=bool(product['is_featured']),
                 is_trending=bool(product['is_trending']),
@@ -2162,145 +1885,145 @@ async def upload_product_images(
         if session_id:
             session_service.update_session_activity(session_id)
         with db.get_cursor() as cursor:
-            cursor.execute("SELECT id, image_gallery FROM products WHERE id = %s", (product_id,))
+            cursor.execute("SELECT id, main_image_url, image_gallery FROM products WHERE id = %s", (product_id,))
             product = cursor.fetchone()
             if not product:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Product not found"
                 )
-            invalid_files = []
-            valid_files = []
-            for file in files:
-                if not validate_uploaded_file(file):
-                    invalid_files.append(file.filename)
-                else:
-                    valid_files.append(file)
-            if invalid_files:
-                logger.warning(f"Invalid files rejected for product {product_id}: {invalid_files}")
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Invalid or malicious files detected: {', '.join(invalid_files)}. Only valid JPEG, PNG, GIF, and WebP images are allowed."
-                )
-            if not valid_files:
+        invalid_files = []
+        valid_files = []
+        for file in files:
+            if not validate_uploaded_file(file):
+                invalid_files.append(file.filename)
+            else:
+                valid_files.append(file)
+        if invalid_files:
+            logger.warning(f"Invalid files rejected for product {product_id}: {invalid_files}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid or malicious files detected: {', '.join(invalid_files)}. Only valid JPEG, PNG, GIF, and WebP images are allowed."
+            )
+        if not valid_files:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No valid files to upload"
+            )
+        max_total_files = 20
+        existing_gallery = decode_json_column(product['image_gallery'], list, 'image_gallery') or []
+        current_file_count = len(existing_gallery)
+        if current_file_count + len(valid_files) > max_total_files:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Maximum {max_total_files} images allowed per product. Currently have {current_file_count}, trying to add {len(valid_files)}."
+            )
+        saved = []
+        for file in valid_files:
+            original_filename = file.filename
+            file_extension = original_filename.split('.')[-1].lower() if '.' in original_filename else ''
+            if file_extension not in ['jpg', 'jpeg', 'png', 'gif', 'webp']:
+                content_type_to_extension = {
+                    'image/jpeg': 'jpg',
+                    'image/png': 'png',
+                    'image/gif': 'gif',
+                    'image/webp': 'webp'
+                }
+                file_extension = content_type_to_extension.get(file.content_type, 'jpg')
+            unique_filename = f"product_{product_id}_{uuid.uuid4().hex}.{file_extension}"
+            try:
+                saved.append((original_filename, await image_pipeline.save(file, unique_filename, 5 * 1024 * 1024)))
+            except UploadTooLarge:
+                for _, path in saved:
+                    image_pipeline.discard(path)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="No valid files to upload"
+                    detail=f"File {original_filename} too large. Maximum size is 5MB."
                 )
-            max_total_files = 20
-            uploaded_urls = []
-            existing_gallery = []
-            if product['image_gallery']:
-                try:
-                    if isinstance(product['image_gallery'], str):
-                        existing_gallery = ast.literal_eval(product['image_gallery'])
-                    else:
-                        existing_gallery = product['image_gallery']
-                except:
-                    existing_gallery = []
-            current_file_count = len(existing_gallery)
-            if current_file_count + len(valid_files) > max_total_files:
+            except PermissionError as e:
+                logger.error(f"Permission denied writing upload: {e}")
+                raise HTTPException(status_code=500, detail="Server configuration error")
+            except OSError as e:
+                logger.error(f"Failed to write upload {original_filename}: {e}")
+                raise HTTPException(status_code=500, detail="Server storage error")
+        # All files resize concurrently in the worker pool
+        results = await asyncio.gather(*[image_pipeline.process(path) for _, path in saved], return_exceptions=True)
+        uploaded_urls = []
+        new_variants = {}
+        for (original_filename, path), result in zip(saved, results):
+            if isinstance(result, InvalidImage):
+                logger.error(f"Final image validation failed for {original_filename}: {result}")
+                for other_path in [other for _, other in saved if other != path]:
+                    image_pipeline.discard(other_path)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Maximum {max_total_files} images allowed per product. Currently have {current_file_count}, trying to add {len(valid_files)}."
-                )
-            for file in valid_files:
-                try:
-                    original_filename = file.filename
-                    safe_filename = "".join(
-                        c for c in original_filename if c.isalnum() or c in ('-', '_', '.')).rstrip()
-                    if not safe_filename:
-                        safe_filename = "image"
-                    file_extension = original_filename.split('.')[-1].lower() if '.' in original_filename else ''
-                    if file_extension not in ['jpg', 'jpeg', 'png', 'gif', 'webp']:
-                        content_type_to_extension = {
-                            'image/jpeg': 'jpg',
-                            'image/png': 'png',
-                            'image/gif': 'gif',
-                            'image/webp': 'webp'
-                        }
-                        file_extension = content_type_to_extension.get(file.content_type, 'jpg')
-                    unique_filename = f"product_{product_id}_{int(datetime.now().timestamp())}_{len(uploaded_urls)}.{file_extension}"
-                    upload_dir = "/app/uploads/products"
-                    try:
-                        os.makedirs(upload_dir, mode=0o755, exist_ok=True)
-                    except PermissionError as e:
-                        logger.error(f"Permission denied creating upload directory: {e}")
-                        raise HTTPException(status_code=500, detail="Server configuration error")
-                    except OSError as e:
-                        logger.error(f"Failed to create upload directory: {e}")
-                        raise HTTPException(status_code=500, detail="Server storage error")
-                    file_path = os.path.join(upload_dir, unique_filename)
-                    if not file_path.startswith("/app/uploads/"):
-                        logger.error(f"Potential path traversal attack: {file_path}")
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Invalid file path"
-                        )
-                    file_content = await file.read()
-                    file_size = len(file_content)
-                    if file_size > 5 * 1024 * 1024:
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=f"File {original_filename} too large. Maximum size is 5MB."
-                        )
-                    try:
-                        from PIL import Image
-                        import io
-                        image = Image.open(io.BytesIO(file_content))
-                        if hasattr(image, 'tell'):
-                            image.tell()
-                        if image.mode in ('RGBA', 'LA', 'P'):
-                            image = image.convert('RGB')
-                    except Exception as img_error:
-                        logger.error(f"Final image validation failed for {original_filename}: {img_error}")
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=f"Invalid image file: {original_filename}"
-                        )
-                    with open(file_path, "wb") as buffer:
-                        buffer.write(file_content)
-                    os.chmod(file_path, 0o644)
-                    image_url = f"/uploads/products/{unique_filename}"
-                    uploaded_urls.append(image_url)
-                    logger.info(f"Successfully uploaded image for product {product_id}: {unique_filename}")
-                except HTTPException:
-                    raise
-                except Exception as file_error:
-                    logger.error(f"Failed to process file {file.filename}: {file_error}")
-                    continue
-            if not uploaded_urls:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to process any files"
+                    detail=f"Invalid image file: {original_filename}"
                 )
-            updated_gallery = existing_gallery + uploaded_urls
-            if not product['main_image_url'] and uploaded_urls:
-                cursor.execute(
-                    "UPDATE products SET main_image_url = %s WHERE id = %s",
-                    (uploaded_urls[0], product_id)
-                )
-                logger.info(f"Set main image for product {product_id}: {uploaded_urls[0]}")
-            cursor.execute(
-                "UPDATE products SET image_gallery = %s WHERE id = %s",
-                (str(updated_gallery), product_id)
+            if isinstance(result, Exception):
+                logger.error(f"Failed to process file {original_filename}: {result}")
+                continue
+            image_url = f"/uploads/products/{os.path.basename(path)}"
+            uploaded_urls.append(image_url)
+            new_variants[image_url] = result
+            logger.info(f"Successfully uploaded image for product {product_id}: {os.path.basename(path)}")
+        if not uploaded_urls:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to process any files"
             )
-            if background_tasks:
-                cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
-                updated_product = cursor.fetchone()
-                background_tasks.add_task(
-                    publish_product_event,
-                    updated_product,
-                    'images_updated'
+        try:
+            with db.get_cursor() as cursor:
+                # Re-read under a row lock so concurrent uploads to one product do not drop each other's images
+                cursor.execute("SELECT main_image_url, image_gallery, image_variants FROM products WHERE id = %s FOR UPDATE", (product_id,))
+                product = cursor.fetchone()
+                if not product:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Product not found"
+                    )
+                existing_gallery = decode_json_column(product['image_gallery'], list, 'image_gallery') or []
+                if len(existing_gallery) + len(uploaded_urls) > max_total_files:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Maximum {max_total_files} images allowed per product. Currently have {len(existing_gallery)}, trying to add {len(uploaded_urls)}."
+                    )
+                updated_gallery = existing_gallery + uploaded_urls
+                if not product['main_image_url'] and uploaded_urls:
+                    cursor.execute(
+                        "UPDATE products SET main_image_url = %s WHERE id = %s",
+                        (uploaded_urls[0], product_id)
+                    )
+                    logger.info(f"Set main image for product {product_id}: {uploaded_urls[0]}")
+                image_variants = decode_json_column(product['image_variants'], dict, 'image_variants') or {}
+                image_variants.update(new_variants)
+                cursor.execute(
+                    "UPDATE products SET image_gallery = %s, image_variants = %s WHERE id = %s",
+                    (encode_json_column(updated_gallery), encode_json_column(image_variants), product_id)
                 )
-            invalidate_product_cache(product_id)
-            return {
-                "success": True,
-                "message": f"Successfully uploaded {len(uploaded_urls)} images",
-                "uploaded_urls": uploaded_urls,
-                "total_images": len(updated_gallery),
-                "rejected_files": invalid_files
-            }
+                if background_tasks:
+                    cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
+                    updated_product = cursor.fetchone()
+                    background_tasks.add_task(
+                        publish_product_event,
+                        updated_product,
+                        'images_updated'
+                    )
+                    background_tasks.add_task(refresh_listing_document, product_id)
+                    background_tasks.add_task(product_search.refresh_product, product_id)
+                    background_tasks.add_task(collection_cache.refresh)
+                invalidate_product_cache(product_id)
+                return {
+                    "success": True,
+                    "message": f"Successfully uploaded {len(uploaded_urls)} images",
+                    "uploaded_urls": uploaded_urls,
+                    "total_images": len(updated_gallery),
+                    "rejected_files": invalid_files
+                }
+        except Exception:
+            # Nothing references the new files unless the gallery update committed
+            for _, path in saved:
+                image_pipeline.discard(path)
+            raise
     except HTTPException:
         raise
     except Exception as e:
@@ -2342,6 +2065,10 @@ async def delete_product(
                     product,
                     'deleted'
                 )
+                background_tasks.add_task(refresh_listing_document, product_id)
+                background_tasks.add_task(product_search.refresh_product, product_id)
+                background_tasks.add_task(collection_cache.refresh)
+                background_tasks.add_task(slug_directory.invalidate, 'product')
             invalidate_product_cache(product_id)
             logger.info(f"Product {product_id} archived by user {current_user.get('sub')}")
             return {"message": "Product archived successfully"}
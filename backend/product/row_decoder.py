@@ -0,0 +1,73 @@
+import json
+import logging
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+JSON_COLUMNS = {
+    'specification': dict,
+    'image_gallery': list,
+    'image_variants': dict,
+}
+
+
+def normalize_image_urls(image_data):
+    if not image_data:
+        return image_data
+    if isinstance(image_data, str):
+        if image_data.startswith(('http://', 'https://')):
+            parsed = urlparse(image_data)
+            return parsed.path
+        return image_data
+    elif isinstance(image_data, list):
+        normalized = []
+        for img_url in image_data:
+            if img_url and img_url.startswith(('http://', 'https://')):
+                parsed = urlparse(img_url)
+                normalized.append(parsed.path)
+            else:
+                normalized.append(img_url)
+        return normalized
+    return image_data
+
+
+def decode_json_column(value: Any, expected_type: Optional[type] = None, column: str = "json") -> Any:
+    """Decode a MySQL JSON column value. Returns None for empty or malformed data."""
+    if value is None or value == '' or value == b'':
+        return None
+    if isinstance(value, (str, bytes, bytearray)):
+        try:
+            value = _json_loads(value)
+        except ValueError:
+            logger.warning(f"⚠️ Malformed {column} value ignored: {str(value)[:80]}")
+            return None
+    if expected_type is not None and not isinstance(value, expected_type):
+        logger.warning(f"⚠️ Unexpected {column} type {type(value).__name__}, expected {expected_type.__name__}")
+        return None
+    return value
+
+
+def encode_json_column(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return json.dumps(value)
+
+
+def decode_product_row(product: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a products row with JSON columns decoded and image URLs normalized."""
+    decoded = dict(product)
+    for column, expected_type in JSON_COLUMNS.items():
+        if column in decoded:
+            decoded[column] = decode_json_column(decoded[column], expected_type, column)
+    if 'image_gallery' in decoded:
+        decoded['image_gallery'] = normalize_image_urls(decoded['image_gallery'])
+    if 'main_image_url' in decoded:
+        decoded['main_image_url'] = normalize_image_urls(decoded['main_image_url'])
+    return decoded
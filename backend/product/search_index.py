@@ -0,0 +1,319 @@
+import bisect
+import math
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from shared import config, db, get_logger, redis_client
+
+logger = get_logger(__name__)
+
+SEARCH_EVENTS_CHANNEL = "product_search:events"
+
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'category_name': 2.0,
+    'brand_name': 2.0,
+    'short_description': 1.5,
+    'description': 1.0,
+}
+
+STOPWORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is',
+    'it', 'of', 'on', 'or', 'the', 'to', 'with'
+})
+
+SORTABLE = ('name', 'base_price', 'created_at', 'view_count', 'total_sold', 'wishlist_count')
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+INDEX_QUERY = """
+    SELECT
+        p.id, p.name, p.slug, p.short_description, p.description, p.status,
+        p.category_id, p.brand_id, p.base_price, p.stock_status,
+        p.is_featured, p.is_trending, p.is_bestseller, p.created_at,
+        p.view_count, p.total_sold, p.wishlist_count,
+        c.name as category_name, c.slug as category_slug,
+        b.name as brand_name, b.slug as brand_slug
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.id
+    LEFT JOIN brands b ON p.brand_id = b.id
+"""
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class _Index:
+    """One generation of the inverted index; mutated only under the owner's lock."""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self.doc_terms: Dict[int, List[str]] = {}
+        self.doc_length: Dict[int, float] = {}
+        self.attributes: Dict[int, Dict[str, Any]] = {}
+        self.total_length = 0.0
+        self._sorted_terms: Optional[List[str]] = None
+
+    def add(self, row: Dict[str, Any]):
+        doc_id = row['id']
+        self.remove(doc_id)
+        frequencies: Dict[str, float] = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(row.get(field)):
+                frequencies[token] += weight
+        for term, frequency in frequencies.items():
+            self.postings[term][doc_id] = frequency
+        length = sum(frequencies.values())
+        self.doc_terms[doc_id] = list(frequencies)
+        self.doc_length[doc_id] = length
+        self.total_length += length
+        self.attributes[doc_id] = {
+            'name': row['name'] or '',
+            'slug': row['slug'],
+            'category_id': row['category_id'],
+            'brand_id': row['brand_id'],
+            'category_slug': row.get('category_slug'),
+            'brand_slug': row.get('brand_slug'),
+            'base_price': float(row['base_price'] or 0),
+            'stock_status': row['stock_status'],
+            'is_featured': bool(row['is_featured']),
+            'is_trending': bool(row['is_trending']),
+            'is_bestseller': bool(row['is_bestseller']),
+            'created_at': row['created_at'].timestamp() if row['created_at'] else 0,
+            'view_count': row['view_count'] or 0,
+            'total_sold': row['total_sold'] or 0,
+            'wishlist_count': row['wishlist_count'] or 0,
+        }
+        self._sorted_terms = None
+
+    def remove(self, doc_id: int):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_length.pop(doc_id, 0.0)
+        self.attributes.pop(doc_id, None)
+        self._sorted_terms = None
+
+    def complete(self, prefix: str, limit: int) -> List[str]:
+        """Indexed terms starting with prefix, most frequent first."""
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        start = bisect.bisect_left(self._sorted_terms, prefix)
+        matches = []
+        for term in self._sorted_terms[start:]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        matches.sort(key=lambda term: len(self.postings[term]), reverse=True)
+        return matches[:limit]
+
+
+class ProductSearchIndex:
+    """In-process BM25 search over active products.
+
+    Built from MySQL at startup and rebuilt every search_index_rebuild_interval
+    seconds. Admin writes update it incrementally and announce the product id
+    on a Redis channel so every product-service process applies the same change.
+    """
+
+    k1 = 1.2
+    b = 0.75
+    prefix_expansions = 10
+    prefix_weight = 0.8
+
+    def __init__(self):
+        self._index = _Index()
+        self._lock = threading.RLock()
+        self._origin = uuid.uuid4().hex
+        self._listener = None
+        self._rebuilder = None
+        self.ready = False
+        self.built_at = 0.0
+
+    # ----- building -----
+    def rebuild(self) -> bool:
+        started = time.time()
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute(INDEX_QUERY + " WHERE p.status = 'active'")
+                rows = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Failed to build product search index: {e}")
+            return False
+        index = _Index()
+        for row in rows:
+            index.add(row)
+        with self._lock:
+            self._index = index
+            self.ready = True
+            self.built_at = time.time()
+        logger.info(f"✅ Product search index built: {len(rows)} products, {len(index.postings)} terms "
+                    f"in {(time.time() - started) * 1000:.0f} ms")
+        return True
+
+    def start(self):
+        """Build in the background and keep the index in sync with other processes."""
+        if self._rebuilder is None or not self._rebuilder.is_alive():
+            self._rebuilder = threading.Thread(target=self._rebuild_loop, name="product-search-rebuild", daemon=True)
+            self._rebuilder.start()
+        if self._listener is None or not self._listener.is_alive():
+            self._listener = threading.Thread(target=self._listen, name="product-search-listener", daemon=True)
+            self._listener.start()
+
+    def _rebuild_loop(self):
+        while True:
+            if not self.rebuild():
+                time.sleep(30)
+                continue
+            time.sleep(max(60, config.search_index_rebuild_interval or 600))
+
+    def _listen(self):
+        while True:
+            pubsub = redis_client.pubsub()
+            if pubsub is None:
+                time.sleep(5)
+                continue
+            try:
+                pubsub.subscribe(SEARCH_EVENTS_CHANNEL)
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if not message or message.get('type') != 'message':
+                        continue
+                    origin, _, product_id = message['data'].partition(':')
+                    if origin != self._origin and product_id.isdigit():
+                        self._reload_product(int(product_id))
+            except Exception as e:
+                logger.error(f"Product search listener error: {e}")
+                time.sleep(5)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    # ----- incremental updates -----
+    def _reload_product(self, product_id: int):
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute(INDEX_QUERY + " WHERE p.id = %s", (product_id,))
+                row = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"Failed to reload product {product_id} into search index: {e}")
+            return
+        with self._lock:
+            if row and row['status'] == 'active':
+                self._index.add(row)
+            else:
+                self._index.remove(product_id)
+
+    def refresh_product(self, product_id: int):
+        """Call after a committed write to a product."""
+        self._reload_product(product_id)
+        redis_client.publish(SEARCH_EVENTS_CHANNEL, f"{self._origin}:{product_id}")
+
+    # ----- querying -----
+    def _query_terms(self, query: str, index: _Index) -> Dict[str, float]:
+        tokens = tokenize(query)
+        if not tokens:
+            return {}
+        terms = {token: 1.0 for token in tokens}
+        # Autocomplete: the word being typed also matches longer indexed terms
+        if not query.endswith(' '):
+            last = tokens[-1]
+            for term in index.complete(last, self.prefix_expansions):
+                terms.setdefault(term, self.prefix_weight)
+        return terms
+
+    def _score(self, terms: Dict[str, float], index: _Index) -> Dict[int, float]:
+        doc_count = len(index.doc_length)
+        if not doc_count:
+            return {}
+        average_length = index.total_length / doc_count or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        for term, boost in terms.items():
+            postings = index.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * index.doc_length[doc_id] / average_length)
+                scores[doc_id] += boost * idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+    @staticmethod
+    def _matches(attributes: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+        for key, value in filters.items():
+            if value is None:
+                continue
+            if key == 'min_price':
+                if attributes['base_price'] < value:
+                    return False
+            elif key == 'max_price':
+                if attributes['base_price'] > value:
+                    return False
+            elif key == 'in_stock':
+                if value and attributes['stock_status'] != 'in_stock':
+                    return False
+            elif isinstance(value, (set, frozenset)):
+                if attributes.get(key) not in value:
+                    return False
+            elif attributes.get(key) != value:
+                return False
+        return True
+
+    def search(self, query: str, filters: Optional[Dict[str, Any]] = None, sort_by: Optional[str] = None,
+               sort_order: str = "desc", offset: int = 0, limit: int = 20) -> Tuple[List[int], int]:
+        """Ids of matching active products for one page, and the total number of matches."""
+        filters = filters or {}
+        with self._lock:
+            index = self._index
+            scores = self._score(self._query_terms(query, index), index)
+            matches = [(doc_id, score) for doc_id, score in scores.items()
+                       if self._matches(index.attributes[doc_id], filters)]
+            if sort_by in SORTABLE:
+                matches.sort(key=lambda match: (index.attributes[match[0]][sort_by], match[0]),
+                             reverse=sort_order == "desc")
+            else:
+                matches.sort(key=lambda match: (-match[1], -match[0]))
+        return [doc_id for doc_id, _ in matches[offset:offset + limit]], len(matches)
+
+    def match_ids(self, query: str) -> List[int]:
+        """Every active product matching the query, unfiltered and unordered."""
+        with self._lock:
+            index = self._index
+            return list(self._score(self._query_terms(query, index), index))
+
+    def suggest(self, prefix: str, limit: int = 10) -> Dict[str, list]:
+        with self._lock:
+            index = self._index
+            tokens = tokenize(prefix)
+            completions = index.complete(tokens[-1], limit) if tokens else []
+            scores = self._score(self._query_terms(prefix, index), index)
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            products = [{'id': doc_id, 'name': index.attributes[doc_id]['name'],
+                         'slug': index.attributes[doc_id]['slug']} for doc_id, _ in ranked]
+        return {'completions': completions, 'products': products}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'products': len(self._index.doc_length),
+                'terms': len(self._index.postings),
+                'built_at': self.built_at
+            }
+
+
+product_search = ProductSearchIndex()
@@ -0,0 +1,112 @@
+import threading
+import time
+from typing import Dict, Optional
+from shared import db, get_logger, redis_client
+from shared.conditional import content_versions
+
+logger = get_logger(__name__)
+
+SLUG_KEY_PREFIX = "slugs:"
+
+# kind -> (table, condition for a slug to be served)
+SLUG_SOURCES = {
+    'product': ("products", "status = 'active'"),
+    'category': ("categories", "is_active = 1"),
+    'brand': ("brands", "is_active = 1"),
+}
+
+
+class SlugDirectory:
+    """Slug -> id maps for products, categories and brands.
+
+    Each process keeps the maps in dicts loaded from Redis hashes (built from
+    MySQL when missing). Writers call invalidate(), which drops the hash and
+    bumps the "slugs" content version; every process reloads when it sees the
+    new version, checked at most every check_interval seconds. A slug missing
+    from the map is looked up in MySQL once and added.
+    """
+
+    def __init__(self, check_interval: int = 10, ttl: int = 3600):
+        self.check_interval = check_interval
+        self.ttl = ttl
+        self._maps: Dict[str, Dict[str, int]] = {}
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _key(self, kind: str) -> str:
+        return f"{SLUG_KEY_PREFIX}{kind}"
+
+    def _check_version(self):
+        now = time.time()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        version = content_versions.current("slugs")
+        if version != self._version:
+            with self._lock:
+                self._maps = {}
+                self._version = version
+
+    def _load(self, kind: str) -> Dict[str, int]:
+        mapping = self._maps.get(kind)
+        if mapping is not None:
+            return mapping
+        with self._lock:
+            mapping = self._maps.get(kind)
+            if mapping is not None:
+                return mapping
+            cached = redis_client.hgetall(self._key(kind))
+            if cached:
+                mapping = {slug: int(entity_id) for slug, entity_id in cached.items()}
+            else:
+                try:
+                    with db.get_cursor() as cursor:
+                        table, condition = SLUG_SOURCES[kind]
+                        cursor.execute(f"SELECT id, slug FROM {table} WHERE {condition}")
+                        mapping = {row['slug']: row['id'] for row in cursor.fetchall() if row['slug']}
+                except Exception as e:
+                    logger.error(f"❌ Failed to load {kind} slugs: {e}")
+                    return {}
+                if mapping:
+                    redis_client.hset(self._key(kind), mapping={slug: str(entity_id) for slug, entity_id in mapping.items()})
+                    redis_client.expire(self._key(kind), self.ttl)
+                logger.info(f"✅ Loaded {len(mapping)} {kind} slugs")
+            self._maps[kind] = mapping
+            return mapping
+
+    def _lookup(self, kind: str, slug: str) -> Optional[int]:
+        try:
+            with db.get_cursor() as cursor:
+                table, condition = SLUG_SOURCES[kind]
+                cursor.execute(f"SELECT id FROM {table} WHERE slug = %s AND {condition}", (slug,))
+                row = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"Failed to look up {kind} slug {slug}: {e}")
+            return None
+        if not row:
+            return None
+        self._load(kind)[slug] = row['id']
+        # Only extend a complete map; a lone entry would look like a loaded directory
+        if redis_client.exists(self._key(kind)):
+            redis_client.hset(self._key(kind), mapping={slug: str(row['id'])})
+        return row['id']
+
+    def resolve(self, kind: str, slug: Optional[str]) -> Optional[int]:
+        if not slug:
+            return None
+        self._check_version()
+        entity_id = self._load(kind).get(slug)
+        if entity_id is None:
+            entity_id = self._lookup(kind, slug)
+        return entity_id
+
+    def invalidate(self, kind: str):
+        """Call after a committed write that may add, rename or retire a slug."""
+        redis_client.delete(self._key(kind))
+        content_versions.bump("slugs")
+        with self._lock:
+            self._maps.pop(kind, None)
+
+
+slug_directory = SlugDirectory()
@@ -0,0 +1,111 @@
+import threading
+import time
+import uuid
+from typing import Dict
+from shared import config, db, get_logger, redis_client
+
+logger = get_logger(__name__)
+
+PENDING_VIEWS_KEY = "product_views:pending"
+FLUSHING_VIEWS_PREFIX = "product_views:flushing:"
+FLUSH_BATCH_SIZE = 500
+# A flushing key older than this is taken to belong to a flusher that died
+ORPHAN_GRACE_SECONDS = 600
+
+
+class ViewCounter:
+    """Product views buffered in a Redis hash and written back in batches.
+
+    Every view is one HINCRBY. The flusher renames the pending hash to a key
+    of its own (atomic, so two flushers never take the same views), then
+    applies all deltas with one UPDATE ... CASE per batch of products. A
+    flushing key is only applied by the flusher that renamed it; keys left by
+    a flusher that died are claimed, again by RENAME, once they are older
+    than ORPHAN_GRACE_SECONDS.
+    """
+
+    def __init__(self):
+        self._flusher = None
+        self._retry = []
+
+    def record(self, product_id: int):
+        redis_client.hincrby(PENDING_VIEWS_KEY, str(product_id))
+
+    def _flushing_key(self) -> str:
+        return f"{FLUSHING_VIEWS_PREFIX}{int(time.time())}:{uuid.uuid4().hex}"
+
+    def _claim_orphans(self):
+        claimed = []
+        now = time.time()
+        for key in redis_client.keys(f"{FLUSHING_VIEWS_PREFIX}*"):
+            if key in self._retry:
+                continue
+            created_at = key[len(FLUSHING_VIEWS_PREFIX):].partition(':')[0]
+            # Younger keys may be in the middle of being applied by their owner
+            if created_at.isdigit() and now - int(created_at) < ORPHAN_GRACE_SECONDS:
+                continue
+            own_key = self._flushing_key()
+            if redis_client.rename(key, own_key):
+                logger.warning(f"Claimed orphaned product view batch {key}")
+                claimed.append(own_key)
+        return claimed
+
+    def _renew(self, key: str):
+        # A fresh timestamp keeps our own failed batch from looking orphaned while we retry it
+        own_key = self._flushing_key()
+        return own_key if redis_client.rename(key, own_key) else None
+
+    def flush(self) -> int:
+        keys = [key for key in map(self._renew, self._retry) if key] + self._claim_orphans()
+        self._retry = []
+        flushing_key = self._flushing_key()
+        if redis_client.rename(PENDING_VIEWS_KEY, flushing_key):
+            keys.append(flushing_key)
+        flushed = 0
+        for key in keys:
+            deltas = {int(product_id): int(count) for product_id, count in redis_client.hgetall(key).items()
+                      if product_id.isdigit() and int(count) > 0}
+            if deltas and not self._apply(deltas):
+                self._retry.append(key)
+                continue
+            redis_client.delete(key)
+            flushed += sum(deltas.values())
+        if flushed:
+            logger.info(f"✅ Flushed {flushed} product views")
+        return flushed
+
+    def _apply(self, deltas: Dict[int, int]) -> bool:
+        items = list(deltas.items())
+        try:
+            with db.get_cursor() as cursor:
+                for start in range(0, len(items), FLUSH_BATCH_SIZE):
+                    batch = items[start:start + FLUSH_BATCH_SIZE]
+                    cases = " ".join(["WHEN %s THEN %s"] * len(batch))
+                    placeholders = ','.join(['%s'] * len(batch))
+                    params = [value for item in batch for value in item] + [product_id for product_id, _ in batch]
+                    cursor.execute(f"""
+                        UPDATE products
+                        SET view_count = view_count + CASE id {cases} ELSE 0 END,
+                            updated_at = updated_at
+                        WHERE id IN ({placeholders})
+                    """, params)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Failed to flush product views, will retry: {e}")
+            return False
+
+    def start(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._flush_loop, name="product-view-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(max(5, config.view_count_flush_interval or 30))
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Product view flusher error: {e}")
+
+
+view_counter = ViewCounter()
@@ -2,28 +2,41 @@ from .config import config
 from .database import db
 from .security import (
     verify_password, get_password_hash, create_access_token,
-    verify_token, sanitize_input, validate_email, validate_phone
+    verify_token, sanitize_input, validate_email, validate_phone, normalize_phone,
+    verify_password_async, get_password_hash_async, password_hasher
 )
 from .logging_config import setup_logging, get_logger
 from .session_service import session_service
 from .redis_client import redis_client
 from .rabbitmq_client import rabbitmq_client
-from .auth_middleware import get_current_user, require_roles, require_permissions
-from .rate_limiter import rate_limiter
+from .auth_middleware import get_current_user, require_roles, require_permissions, invalidate_user_authorization
+from .principal_cache import principal_cache
+from .permission_matrix import permission_matrix
+from .token_blacklist import token_blacklist
+from .refresh_tokens import refresh_token_store
+from .response_cache import response_cache
+from .conditional import content_versions
+from .product_catalog import product_catalog
+from .rate_limiter import rate_limiter, rate_limited, RateLimitPolicy
 from .session_middleware import SecureSessionMiddleware, get_session, get_session_id, is_new_session
 from .session_models import SessionData, SessionType
 from .cart_migration import migrate_guest_cart_to_user
+from .login_lookup import forget_unknown_login_ids
 
 __all__ = [
     'config',
     'db',
     'verify_password',
     'get_password_hash',
+    'verify_password_async',
+    'get_password_hash_async',
+    'password_hasher',
     'create_access_token',
     'verify_token',
     'sanitize_input',
     'validate_email',
     'validate_phone',
+    'normalize_phone',
     'setup_logging',
     'get_logger',
     'redis_client',
@@ -31,7 +44,17 @@ __all__ = [
     'get_current_user',
     'require_roles',
     'require_permissions',
+    'invalidate_user_authorization',
+    'principal_cache',
+    'permission_matrix',
+    'token_blacklist',
+    'refresh_token_store',
+    'response_cache',
+    'content_versions',
+    'product_catalog',
     'rate_limiter',
+    'rate_limited',
+    'RateLimitPolicy',
     'SecureSessionMiddleware',
     'get_session',
     'get_session_id',
@@ -40,6 +63,7 @@ __all__ = [
     'SessionData',
     'SessionType',
     'migrate_guest_cart_to_user',
+    'forget_unknown_login_ids',
 ]
 
 # Backward compatibility
@@ -3,9 +3,75 @@ from typing import Optional, Dict, Any, List
 from .security import verify_token
 from .redis_client import redis_client
 from .database import db
+from .principal_cache import principal_cache
+from .permission_matrix import permission_matrix
+from .token_blacklist import token_blacklist
+from .refresh_tokens import refresh_token_store
+from .config import config
 import logging
+import threading
+import time
+from collections import OrderedDict
 logger = logging.getLogger(__name__)
 
+AUTHZ_VERSION_TTL = 5
+AUTHZ_VERSION_MAX_ENTRIES = 10000
+# user_id -> (expires_at, version), least recently used first
+_authz_versions: "OrderedDict[int, tuple]" = OrderedDict()
+_authz_versions_lock = threading.Lock()
+
+def get_authz_version(user_id: int, use_local: bool = True) -> int:
+    """Per-user authorization version; bumped whenever roles or account status change."""
+    now = time.time()
+    if use_local:
+        with _authz_versions_lock:
+            cached = _authz_versions.get(user_id)
+            if cached and cached[0] > now:
+                _authz_versions.move_to_end(user_id)
+                return cached[1]
+    value = redis_client.get(f"authz_version:{user_id}")
+    version = int(value) if value else 0
+    with _authz_versions_lock:
+        _authz_versions[user_id] = (now + AUTHZ_VERSION_TTL, version)
+        _authz_versions.move_to_end(user_id)
+        while len(_authz_versions) > AUTHZ_VERSION_MAX_ENTRIES:
+            _authz_versions.popitem(last=False)
+    return version
+
+def invalidate_user_authorization(user_id: int):
+    """Call after changing a user's roles, status or password."""
+    redis_client.incr(f"authz_version:{user_id}")
+    with _authz_versions_lock:
+        _authz_versions.pop(user_id, None)
+    principal_cache.invalidate_user(user_id)
+
+def _token_revoked(user_id: int, authz_ver: Optional[int], issued_at: Optional[float]) -> bool:
+    """True once a logout-all, password change or role change happened after the token was issued."""
+    if authz_ver is not None:
+        return authz_ver != get_authz_version(user_id)
+    # Tokens signed before authz_ver existed are checked against the logout-all timestamp
+    return refresh_token_store.revoked_before(user_id, issued_at)
+
+def _principal_from_claims(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if config.auth_verification_mode != 'stateless':
+        return None
+    if 'authz_ver' not in payload or 'iat' not in payload:
+        return None
+    if payload['exp'] - payload['iat'] > (config.stateless_token_max_lifetime or 900):
+        return None
+    user_id = int(payload['sub'])
+    if payload['authz_ver'] != get_authz_version(user_id):
+        return None
+    return {
+        'sub': user_id,
+        'email': payload.get('email'),
+        'is_active': True,
+        'roles': payload.get('roles', []),
+        'permissions': payload.get('permissions', []),
+        'authz_ver': payload['authz_ver'],
+        'stateless': True
+    }
+
 async def get_current_user(request: Request) -> Dict[str, Any]:
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
@@ -14,13 +80,20 @@ async def get_current_user(request: Request) -> Dict[str, Any]:
             detail="Invalid authentication credentials"
         )
     token = auth_header[7:]
-    if redis_client.exists(f"token_blacklist:{token}"):
+    if token_blacklist.is_blacklisted(token):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has been invalidated"
         )
-    cached_user = redis_client.get_cached_session(f"token:{token}")
+    cached_user = principal_cache.get(token)
     if cached_user:
+        # Another process may have revoked the user since this entry was cached
+        if _token_revoked(cached_user['sub'], cached_user.get('authz_ver'), cached_user.get('iat')):
+            principal_cache.invalidate_token(token)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked"
+            )
         logger.debug("User authenticated from cache")
         return cached_user
     payload = verify_token(token)
@@ -29,6 +102,14 @@ async def get_current_user(request: Request) -> Dict[str, Any]:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token"
         )
+    claims_user = _principal_from_claims(payload)
+    if claims_user:
+        return claims_user
+    if _token_revoked(int(payload['sub']), payload.get('authz_ver'), payload.get('iat')):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked"
+        )
     try:
         with db.get_cursor() as cursor:
             cursor.execute("""
@@ -43,26 +124,11 @@ async def get_current_user(request: Request) -> Dict[str, Any]:
             user_data = cursor.fetchone()
             if not user_data:
                 raise HTTPException(
-                    status_code=status.HTTP_401_UNANAUTHORIZED,
+                    status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="User not found or inactive"
                 )
-            cursor.execute("""
-                SELECT
-                    ur.name as role_name,
-                    p.name as permission_name
-                FROM user_role_assignments ura
-                JOIN user_roles ur ON ura.role_id = ur.id
-                LEFT JOIN role_permissions rp ON ur.id = rp.role_id
-                LEFT JOIN permissions p ON rp.permission_id = p.id
-                WHERE ura.user_id = %s
-            """, (user_data['id'],))
-            roles = set()
-            permissions = set()
-            for row in cursor.fetchall():
-                if row['role_name']:
-                    roles.add(row['role_name'])
-                if row['permission_name']:
-                    permissions.add(row['permission_name'])
+            role_ids = permission_matrix.get_user_role_ids(cursor, user_data['id'])
+            roles, permissions = permission_matrix.resolve(role_ids)
             user_payload = {
                 'sub': user_data['id'],
                 'uuid': user_data['uuid'],
@@ -77,14 +143,13 @@ async def get_current_user(request: Request) -> Dict[str, Any]:
                 'preferred_currency': user_data['preferred_currency'],
                 'preferred_language': user_data['preferred_language'],
                 'avatar_url': user_data['avatar_url'],
-                'roles': list(roles),
-                'permissions': list(permissions)
+                'role_ids': role_ids,
+                'roles': roles,
+                'permissions': permissions,
+                'authz_ver': payload.get('authz_ver'),
+                'iat': payload.get('iat')
             }
-            redis_client.cache_user_session(
-                user_id=user_data['id'],
-                session_data=user_payload,
-                expire=3600
-            )
+            principal_cache.set(token, user_payload, payload['exp'])
             return user_payload
     except HTTPException:
         raise
@@ -95,12 +160,21 @@ async def get_current_user(request: Request) -> Dict[str, Any]:
             detail="Failed to authenticate user"
         )
 
+def _user_role_mask(user: Dict[str, Any]) -> int:
+    if 'role_ids' in user:
+        return permission_matrix.role_mask(role_ids=user['role_ids'])
+    return permission_matrix.role_mask(role_names=user.get('roles', []))
+
+def _user_permission_mask(user: Dict[str, Any]) -> int:
+    if 'role_ids' in user:
+        return permission_matrix.permission_mask(role_ids=user['role_ids'])
+    return permission_matrix.permission_mask(permission_names=user.get('permissions', []))
+
 async def require_roles(required_roles: List[str], request: Request):
     user = await get_current_user(request)
-    user_roles = user.get('roles', [])
-    if not any(role in user_roles for role in required_roles):
+    if not _user_role_mask(user) & permission_matrix.role_mask(role_names=required_roles):
         logger.warning(
-            f"User {user['sub']} with roles {user_roles} attempted to access endpoint requiring {required_roles}")
+            f"User {user['sub']} with roles {user.get('roles', [])} attempted to access endpoint requiring {required_roles}")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Insufficient role permissions"
@@ -109,10 +183,9 @@ async def require_roles(required_roles: List[str], request: Request):
 
 async def require_permissions(required_permissions: List[str], request: Request):
     user = await get_current_user(request)
-    user_permissions = user.get('permissions', [])
-    if not any(perm in user_permissions for perm in required_permissions):
+    if not _user_permission_mask(user) & permission_matrix.permission_mask(permission_names=required_permissions):
         logger.warning(
-            f"User {user['sub']} with permissions {user_permissions} attempted to access endpoint requiring {required_permissions}")
+            f"User {user['sub']} with permissions {user.get('permissions', [])} attempted to access endpoint requiring {required_permissions}")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Insufficient permissions"
@@ -121,10 +194,9 @@ async def require_permissions(required_permissions: List[str], request: Request)
 
 async def require_any_role(required_roles: List[str], request: Request):
     user = await get_current_user(request)
-    user_roles = user.get('roles', [])
-    if not any(role in user_roles for role in required_roles):
+    if not _user_role_mask(user) & permission_matrix.role_mask(role_names=required_roles):
         logger.warning(
-            f"User {user['sub']} with roles {user_roles} attempted to access endpoint requiring any of {required_roles}")
+            f"User {user['sub']} with roles {user.get('roles', [])} attempted to access endpoint requiring any of {required_roles}")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Insufficient role permissions"
@@ -133,10 +205,11 @@ async def require_any_role(required_roles: List[str], request: Request):
 
 async def require_all_roles(required_roles: List[str], request: Request):
     user = await get_current_user(request)
-    user_roles = user.get('roles', [])
-    if not all(role in user_roles for role in required_roles):
+    required_mask = permission_matrix.role_mask(role_names=required_roles)
+    known = all(role in permission_matrix.role_ids for role in required_roles)
+    if not known or _user_role_mask(user) & required_mask != required_mask:
         logger.warning(
-            f"User {user['sub']} with roles {user_roles} attempted to access endpoint requiring all of {required_roles}")
+            f"User {user['sub']} with roles {user.get('roles', [])} attempted to access endpoint requiring all of {required_roles}")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Missing required roles"
@@ -145,11 +218,8 @@ async def require_all_roles(required_roles: List[str], request: Request):
 
 def blacklist_token(token: str, expire: int = 86400):
     try:
-        success = redis_client.setex(
-            f"token_blacklist:{token}",
-            expire,
-            "blacklisted"
-        )
+        principal_cache.invalidate_token(token)
+        success = token_blacklist.add(token, expire)
         if success:
             logger.info("Token blacklisted successfully")
         else:
@@ -0,0 +1,89 @@
+import hashlib
+import time
+from typing import Dict, Optional
+from fastapi import Request, Response
+from .redis_client import redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY_PREFIX = "content_version:"
+
+# Versions expire no later than the cached responses they describe, so a write
+# that forgets to bump still shows up once the cache turns over.
+SCOPE_TTLS = {
+    'product': 1800,
+    'categories': 3600,
+    'brands': 3600,
+    'settings': 300,
+}
+
+CURRENT_VERSION_SCRIPT = """
+local version = redis.call('GET', KEYS[1])
+if not version then
+    version = ARGV[1]
+    redis.call('SET', KEYS[1], version, 'EX', ARGV[2])
+end
+return version
+"""
+
+
+def _fresh_version() -> str:
+    return str(time.time_ns() // 1000)
+
+
+class ContentVersions:
+    """Per-scope content version counters behind catalog ETags.
+
+    Scopes are "product:<id>", "categories", "brands" and "settings". Writers
+    bump a scope after committing; readers turn the current version (plus the
+    query variant) into a strong ETag without touching MySQL or the cached body.
+    A missing version is seeded from the clock, so a Redis flush can never hand
+    an old ETag back out for different content.
+    """
+
+    def _key(self, scope: str) -> str:
+        return f"{VERSION_KEY_PREFIX}{scope}"
+
+    def _ttl(self, scope: str) -> int:
+        return SCOPE_TTLS.get(scope.split(':', 1)[0], 3600)
+
+    def current(self, scope: str) -> Optional[str]:
+        version = redis_client.eval(CURRENT_VERSION_SCRIPT, [self._key(scope)], [_fresh_version(), self._ttl(scope)])
+        return str(version) if version is not None else None
+
+    def bump(self, *scopes: str, version: Optional[str] = None):
+        for scope in scopes:
+            redis_client.setex(self._key(scope), self._ttl(scope), str(version) if version is not None else _fresh_version())
+
+    def etag(self, scope: str, variant: str = "") -> Optional[str]:
+        """Strong ETag for the scope's current version, or None when Redis is unavailable."""
+        version = self.current(scope)
+        if version is None:
+            return None
+        return '"' + hashlib.sha256(f"{scope}|{version}|{variant}".encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """If-None-Match check (weak comparison, so ETags weakened by a gzip proxy still match)."""
+    if not etag:
+        return False
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(candidate.strip().removeprefix('W/') == etag for candidate in header.split(','))
+
+
+def conditional_headers(etag: Optional[str]) -> Dict[str, str]:
+    if not etag:
+        return {}
+    return {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=conditional_headers(etag))
+
+
+content_versions = ContentVersions()
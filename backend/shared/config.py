@@ -4,7 +4,58 @@ import json
 import time
 from typing import Any, Optional, Dict, List
 import secrets
+from dataclasses import dataclass, fields, asdict
 logger = logging.getLogger(__name__)
+@dataclass(frozen=True)
+class SessionConfig:
+    inactivity_timeout: int = 1800
+    guest_session_duration: int = 86400
+    user_session_duration: int = 2592000
+    max_session_age: int = 604800
+    session_timeout: int = 3600
+    max_sessions_per_user: int = 5
+    session_rotation_interval: int = 3600
+    session_cleanup_interval: int = 86400
+    session_rate_limit_attempts: int = 10
+    session_rate_limit_window: int = 60
+    rate_limit_login_attempts: int = 10
+    rate_limit_login_window: int = 900
+    rate_limit_session_create: int = 5
+    rate_limit_session_access: int = 50
+    rate_limit_session_update: int = 20
+    rate_limit_session_delete: int = 10
+    max_login_attempts: int = 5
+    login_lockout_minutes: int = 15
+    login_rate_limit_window: int = 900
+    max_failed_attempts: int = 5
+    failed_attempts_window: int = 900
+    token_expiry_hours: int = 24
+    enable_csrf_protection: bool = True
+    enable_ip_validation: bool = True
+    enable_user_agent_validation: bool = True
+    enable_session_rotation: bool = True
+    require_security_token: bool = True
+    enable_secure_cookies: bool = True
+    enable_session_fingerprinting: bool = True
+    cookie_samesite: str = 'Strict'
+    cookie_httponly: bool = True
+    cookie_secure: bool = True
+    # Fields whose session_settings key differs from the field name
+    _DB_KEYS = {'inactivity_timeout': 'session_inactivity_timeout'}
+    @classmethod
+    def db_key(cls, name: str) -> str:
+        return cls._DB_KEYS.get(name, name)
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+    def items(self):
+        return asdict(self).items()
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
 class DatabaseConfig:
     def __init__(self):
         self._cache = {}
@@ -13,6 +64,9 @@ class DatabaseConfig:
         self._cache_duration = 100
         self._last_settings_check = 0
         self._settings_version = 0
+        self._published_settings_version = 0
+        self._session_config = SessionConfig()
+        self._session_config_loaded_at = 0
         self._validate_required_settings()
     def _validate_required_settings(self):
         required_settings = ['DB_HOST', 'DB_NAME', 'DB_USER', 'DB_PASSWORD']
@@ -211,12 +265,23 @@ class DatabaseConfig:
                     logger.info("Settings updated in database, clearing cache")
                     self._cache.clear()
                     self._cache_timestamps.clear()
+                    self._session_config_loaded_at = 0
                     self._settings_version = new_version
+                if new_version != self._published_settings_version:
+                    self._publish_settings_version(new_version)
         except Exception as e:
             logger.warning(f"Failed to check settings version: {e}")
         finally:
             if connection and connection.is_connected():
                 connection.close()
+    def _publish_settings_version(self, version: int):
+        # Settings ETags are keyed on this; every process publishes the same value
+        try:
+            from .conditional import content_versions
+            content_versions.bump("settings", version=str(version))
+            self._published_settings_version = version
+        except Exception as e:
+            logger.warning(f"Failed to publish settings version: {e}")
     def _get_setting(self, key: str, default: Any = None) -> Any:
         self._check_settings_version()
         current_time = time.time()
@@ -402,6 +467,7 @@ class DatabaseConfig:
     def refresh_cache(self):
         self._cache.clear()
         self._cache_timestamps.clear()
+        self._session_config_loaded_at = 0
         self._settings_version = 0
         self._last_settings_check = 0
         logger.info("Configuration cache forcefully refreshed")
@@ -410,6 +476,7 @@ class DatabaseConfig:
         for key in session_keys:
             self._cache.pop(key, None)
             self._cache_timestamps.pop(key, None)
+        self._session_config_loaded_at = 0
         logger.info("Session configuration cache refreshed")
     @property
     def db_host(self) -> str:
@@ -526,6 +593,60 @@ class DatabaseConfig:
     def rate_limit_window(self) -> int:
         return self._get_setting('rate_limit_window', 900)
     @property
+    def defer_cart_migration(self) -> bool:
+        return self._get_setting('defer_cart_migration', False)
+    @property
+    def auth_verification_mode(self) -> str:
+        return self._get_setting('auth_verification_mode', 'database')
+    @property
+    def stateless_token_max_lifetime(self) -> int:
+        return self._get_setting('stateless_token_max_lifetime', 900)
+    @property
+    def access_token_expiry_minutes(self) -> int:
+        return self._get_setting('access_token_expiry_minutes', 0)
+    @property
+    def refresh_token_expiry_days(self) -> int:
+        return self._get_setting('refresh_token_expiry_days', 30)
+    @property
+    def search_index_rebuild_interval(self) -> int:
+        return self._get_setting('search_index_rebuild_interval', 600)
+    @property
+    def facet_index_rebuild_interval(self) -> int:
+        return self._get_setting('facet_index_rebuild_interval', 300)
+    @property
+    def image_processing_workers(self) -> int:
+        return self._get_setting('image_processing_workers', 2)
+    @property
+    def recommendation_rebuild_interval(self) -> int:
+        return self._get_setting('recommendation_rebuild_interval', 3600)
+    @property
+    def recommendation_neighbor_count(self) -> int:
+        return self._get_setting('recommendation_neighbor_count', 50)
+    @property
+    def view_count_flush_interval(self) -> int:
+        return self._get_setting('view_count_flush_interval', 30)
+    @property
+    def collection_cache_refresh_interval(self) -> int:
+        return self._get_setting('collection_cache_refresh_interval', 300)
+    @property
+    def password_hash_workers(self) -> int:
+        return self._get_setting('password_hash_workers', 4)
+    @property
+    def password_hash_queue_limit(self) -> int:
+        return self._get_setting('password_hash_queue_limit', 32)
+    @property
+    def argon2_time_cost(self) -> int:
+        return self._get_setting('argon2_time_cost', 0)
+    @property
+    def argon2_memory_cost(self) -> int:
+        return self._get_setting('argon2_memory_cost', 65536)
+    @property
+    def argon2_parallelism(self) -> int:
+        return self._get_setting('argon2_parallelism', 2)
+    @property
+    def argon2_target_ms(self) -> int:
+        return self._get_setting('argon2_target_ms', 50)
+    @property
     def razorpay_test_mode(self) -> bool:
         return self._get_setting('razorpay_test_mode', True)
     @property
@@ -633,41 +754,30 @@ class DatabaseConfig:
     @property
     def return_period_days(self) -> int:
         return self.get_frontend_setting('return_period_days', 10)
-    def get_session_config(self) -> Dict[str, Any]:
-        return {
-            'inactivity_timeout': self._get_session_setting('session_inactivity_timeout', 1800),
-            'guest_session_duration': self._get_session_setting('guest_session_duration', 86400),
-            'user_session_duration': self._get_session_setting('user_session_duration', 2592000),
-            'max_session_age': self._get_session_setting('max_session_age', 604800),
-            'session_timeout': self._get_session_setting('session_timeout', 3600),
-            'max_sessions_per_user': self._get_session_setting('max_sessions_per_user', 5),
-            'session_rotation_interval': self._get_session_setting('session_rotation_interval', 3600),
-            'session_cleanup_interval': self._get_session_setting('session_cleanup_interval', 86400),
-            'session_rate_limit_attempts': self._get_session_setting('session_rate_limit_attempts', 10),
-            'session_rate_limit_window': self._get_session_setting('session_rate_limit_window', 60),
-            'rate_limit_login_attempts': self._get_session_setting('rate_limit_login_attempts', 10),
-            'rate_limit_login_window': self._get_session_setting('rate_limit_login_window', 900),
-            'rate_limit_session_create': self._get_session_setting('rate_limit_session_create', 5),
-            'rate_limit_session_access': self._get_session_setting('rate_limit_session_access', 50),
-            'rate_limit_session_update': self._get_session_setting('rate_limit_session_update', 20),
-            'rate_limit_session_delete': self._get_session_setting('rate_limit_session_delete', 10),
-            'max_login_attempts': self._get_session_setting('max_login_attempts', 5),
-            'login_lockout_minutes': self._get_session_setting('login_lockout_minutes', 15),
-            'login_rate_limit_window': self._get_session_setting('login_rate_limit_window', 900),
-            'max_failed_attempts': self._get_session_setting('max_failed_attempts', 5),
-            'failed_attempts_window': self._get_session_setting('failed_attempts_window', 900),
-            'token_expiry_hours': self._get_session_setting('token_expiry_hours', 24),
-            'enable_csrf_protection': self._get_session_setting('enable_csrf_protection', True),
-            'enable_ip_validation': self._get_session_setting('enable_ip_validation', True),
-            'enable_user_agent_validation': self._get_session_setting('enable_user_agent_validation', True),
-            'enable_session_rotation': self._get_session_setting('enable_session_rotation', True),
-            'require_security_token': self._get_session_setting('require_security_token', True),
-            'enable_secure_cookies': self._get_session_setting('enable_secure_cookies', True),
-            'enable_session_fingerprinting': self._get_session_setting('enable_session_fingerprinting', True),
-            'cookie_samesite': self._get_session_setting('cookie_samesite', 'Strict'),
-            'cookie_httponly': self._get_session_setting('cookie_httponly', True),
-            'cookie_secure': self._get_session_setting('cookie_secure', True)
-        }
+    def _load_session_config(self) -> Optional[SessionConfig]:
+        rows = self._get_all_session_settings()
+        if not rows and self._session_config_loaded_at:
+            # Keep the last good snapshot if the database is unreachable
+            return None
+        values = {}
+        for field in fields(SessionConfig):
+            env_key = f"SESSION_{SessionConfig.db_key(field.name).upper()}"
+            if env_key in os.environ:
+                values[field.name] = self._convert_value(os.environ[env_key], type(field.default))
+            elif SessionConfig.db_key(field.name) in rows and rows[SessionConfig.db_key(field.name)] is not None:
+                values[field.name] = rows[SessionConfig.db_key(field.name)]
+        return SessionConfig(**values)
+    def get_session_config(self) -> SessionConfig:
+        self._check_settings_version()
+        current_time = time.time()
+        if current_time - self._session_config_loaded_at >= self._cache_duration:
+            # Build the new snapshot fully, then swap the reference
+            loaded = self._load_session_config()
+            if loaded is not None:
+                self._session_config = loaded
+            if self._get_db():
+                self._session_config_loaded_at = current_time
+        return self._session_config
     def get_security_config(self) -> Dict[str, Any]:
         session_config = self.get_session_config()
         return {k: v for k, v in session_config.items() if any(
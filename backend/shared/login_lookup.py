@@ -0,0 +1,21 @@
+import hashlib
+from .redis_client import redis_client
+from .security import validate_phone, normalize_phone
+
+# Identifiers that matched no account are remembered this long, so repeated
+# guesses at unknown logins skip the users table
+LOGIN_NEGATIVE_CACHE_TTL = 300
+
+
+def unknown_login_key(login_id: str) -> str:
+    # Every spelling of a phone number shares one key, so clearing one clears them all
+    if '@' not in login_id and validate_phone(normalize_phone(login_id)):
+        login_id = normalize_phone(login_id)
+    return f"login_unknown:{hashlib.sha256(login_id.lower().encode()).hexdigest()}"
+
+
+def forget_unknown_login_ids(*login_ids):
+    """Call once a user's email, phone or username has been committed, so logins with it work at once."""
+    keys = [unknown_login_key(login_id) for login_id in login_ids if login_id]
+    if keys:
+        redis_client.delete(*keys)
@@ -0,0 +1,125 @@
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from .database import db
+from .redis_client import redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+MATRIX_VERSION_KEY = "authz:matrix_version"
+
+
+class PermissionMatrix:
+    """Role -> permission mapping held in memory, one copy per process.
+
+    Bits are keyed on the database ids of roles and permissions, so a mask
+    stays valid across reloads. Any process that edits roles/permissions calls
+    notify_change(); the others reload on their next version check.
+    """
+
+    def __init__(self, check_interval: int = 5):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._version = None
+        self._last_check = 0
+        self.role_ids: Dict[str, int] = {}
+        self.role_names: Dict[int, str] = {}
+        self.permission_ids: Dict[str, int] = {}
+        self.role_permissions: Dict[int, FrozenSet[str]] = {}
+        self.role_permission_masks: Dict[int, int] = {}
+
+    def load(self):
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute("SELECT id, name FROM user_roles")
+                roles = cursor.fetchall()
+                cursor.execute("SELECT id, name FROM permissions")
+                permissions = cursor.fetchall()
+                cursor.execute("SELECT role_id, permission_id FROM role_permissions")
+                links = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Failed to load role/permission matrix: {e}")
+            return False
+        role_ids = {r['name']: r['id'] for r in roles}
+        permission_ids = {p['name']: p['id'] for p in permissions}
+        permission_names = {p['id']: p['name'] for p in permissions}
+        grouped: Dict[int, set] = {r['id']: set() for r in roles}
+        masks: Dict[int, int] = {r['id']: 0 for r in roles}
+        for link in links:
+            name = permission_names.get(link['permission_id'])
+            if name is None or link['role_id'] not in grouped:
+                continue
+            grouped[link['role_id']].add(name)
+            masks[link['role_id']] |= 1 << link['permission_id']
+        with self._lock:
+            self.role_ids = role_ids
+            self.role_names = {v: k for k, v in role_ids.items()}
+            self.permission_ids = permission_ids
+            self.role_permissions = {k: frozenset(v) for k, v in grouped.items()}
+            self.role_permission_masks = masks
+            self._loaded = True
+        logger.info(f"✅ Loaded permission matrix: {len(role_ids)} roles, {len(permission_ids)} permissions")
+        return True
+
+    def _ensure_fresh(self):
+        now = time.time()
+        if self._loaded and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        version = redis_client.get(MATRIX_VERSION_KEY)
+        if not self._loaded or version != self._version:
+            if self.load():
+                self._version = version
+
+    def notify_change(self):
+        """Call after editing user_roles, permissions or role_permissions."""
+        redis_client.incr(MATRIX_VERSION_KEY)
+        self._last_check = 0
+
+    def get_role_id(self, name: str) -> Optional[int]:
+        self._ensure_fresh()
+        return self.role_ids.get(name)
+
+    def get_user_role_ids(self, cursor, user_id: int) -> List[int]:
+        cursor.execute("SELECT role_id FROM user_role_assignments WHERE user_id = %s", (user_id,))
+        return [row['role_id'] for row in cursor.fetchall()]
+
+    def resolve(self, role_ids: Iterable[int]) -> Tuple[List[str], List[str]]:
+        """Role names and effective permissions for a set of role ids."""
+        self._ensure_fresh()
+        roles = []
+        permissions = set()
+        for role_id in role_ids:
+            name = self.role_names.get(role_id)
+            if name:
+                roles.append(name)
+                permissions |= self.role_permissions.get(role_id, frozenset())
+        return roles, list(permissions)
+
+    def role_mask(self, role_ids: Optional[Iterable[int]] = None, role_names: Optional[Iterable[str]] = None) -> int:
+        self._ensure_fresh()
+        mask = 0
+        for role_id in role_ids or ():
+            mask |= 1 << role_id
+        for name in role_names or ():
+            role_id = self.role_ids.get(name)
+            if role_id is not None:
+                mask |= 1 << role_id
+        return mask
+
+    def permission_mask(self, role_ids: Optional[Iterable[int]] = None,
+                        permission_names: Optional[Iterable[str]] = None) -> int:
+        self._ensure_fresh()
+        mask = 0
+        for role_id in role_ids or ():
+            mask |= self.role_permission_masks.get(role_id, 0)
+        for name in permission_names or ():
+            permission_id = self.permission_ids.get(name)
+            if permission_id is not None:
+                mask |= 1 << permission_id
+        return mask
+
+
+permission_matrix = PermissionMatrix()
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+from .redis_client import redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PrincipalCache:
+    """Verified-token cache: in-process LRU in front of Redis.
+
+    Entries never outlive the token's own `exp`. The local tier keeps a short
+    TTL so invalidations made by another process are picked up quickly.
+    """
+
+    def __init__(self, max_entries: int = 10000, local_ttl: int = 30, redis_ttl: int = 3600):
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self.token_key(token)
+        now = time.time()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry:
+                expires_at, principal = entry
+                if expires_at > now:
+                    self._local.move_to_end(key)
+                    return principal
+                del self._local[key]
+        try:
+            data = redis_client.get(f"principal:{key}")
+            if not data:
+                return None
+            cached = json.loads(data)
+            if cached.get('exp', 0) <= now:
+                return None
+            self._store_local(key, cached['principal'], cached['exp'])
+            return cached['principal']
+        except Exception as e:
+            logger.error(f"Failed to read principal cache: {e}")
+            return None
+
+    def set(self, token: str, principal: Dict[str, Any], token_exp: float):
+        key = self.token_key(token)
+        remaining = int(token_exp - time.time())
+        if remaining <= 0:
+            return
+        self._store_local(key, principal, token_exp)
+        try:
+            ttl = min(remaining, self.redis_ttl)
+            redis_client.setex(f"principal:{key}", ttl, json.dumps({'exp': token_exp, 'principal': principal}))
+            user_index = f"principal_index:{principal['sub']}"
+            redis_client.sadd(user_index, key)
+            if redis_client.ttl(user_index) < ttl:
+                redis_client.expire(user_index, ttl)
+        except Exception as e:
+            logger.error(f"Failed to write principal cache: {e}")
+
+    def _store_local(self, key: str, principal: Dict[str, Any], token_exp: float):
+        expires_at = min(token_exp, time.time() + self.local_ttl)
+        with self._lock:
+            self._local[key] = (expires_at, principal)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def invalidate_token(self, token: str):
+        key = self.token_key(token)
+        with self._lock:
+            self._local.pop(key, None)
+        redis_client.delete(f"principal:{key}")
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached principal for a user (role change, deactivation, password change)."""
+        user_index = f"principal_index:{user_id}"
+        keys = redis_client.smembers(user_index)
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+            for key in [k for k, (_, p) in self._local.items() if p.get('sub') == user_id]:
+                del self._local[key]
+        if keys:
+            redis_client.delete(*[f"principal:{key}" for key in keys])
+        redis_client.delete(user_index)
+        logger.info(f"Principal cache invalidated for user {user_id}")
+
+
+principal_cache = PrincipalCache()
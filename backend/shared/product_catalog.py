@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional, Sequence
+from .database import db
+from .redis_client import redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+CATALOG_KEY_PREFIX = "catalog:product:"
+
+# Columns held for every product; callers pick a subset with fields=
+CATALOG_FIELDS = (
+    'id', 'name', 'slug', 'sku', 'status', 'main_image_url', 'base_price', 'gst_rate',
+    'stock_quantity', 'stock_status', 'low_stock_threshold', 'track_inventory',
+    'max_cart_quantity', 'min_cart_quantity', 'category_id', 'brand_id'
+)
+
+
+def _plain(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: float(value) if isinstance(value, Decimal) else value for field, value in row.items()}
+
+
+class ProductCatalog:
+    """Batched product lookups: in-process LRU in front of Redis in front of MySQL.
+
+    get_many() answers from the local tier, then one MGET, then one
+    WHERE id IN (...) for whatever is left. Lookups never wait on each other,
+    since they are called from async routes and a blocking wait would stall
+    the event loop. Both tiers use short TTLs because stock is part of the record; writers call
+    invalidate(), and callers that must see committed stock pass fresh=True.
+    """
+
+    def __init__(self, max_entries: int = 5000, local_ttl: int = 5, redis_ttl: int = 60):
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, product_id: int) -> str:
+        return f"{CATALOG_KEY_PREFIX}{product_id}"
+
+    def get(self, product_id: int, fields: Optional[Sequence[str]] = None, active_only: bool = True,
+            fresh: bool = False, cursor=None) -> Optional[Dict[str, Any]]:
+        return self.get_many([product_id], fields, active_only, fresh, cursor).get(product_id)
+
+    def get_many(self, ids: Iterable[int], fields: Optional[Sequence[str]] = None, active_only: bool = True,
+                 fresh: bool = False, cursor=None) -> Dict[int, Dict[str, Any]]:
+        """Products keyed by id; ids that do not exist (or are inactive when active_only) are absent.
+
+        cursor runs the MySQL read inside the caller's transaction; fresh skips
+        both cache tiers (the result still refreshes them).
+        """
+        if fields is not None:
+            unknown = set(fields) - set(CATALOG_FIELDS)
+            if unknown:
+                raise ValueError(f"Unknown catalog fields: {', '.join(sorted(unknown))}")
+        wanted = list(dict.fromkeys(int(product_id) for product_id in ids))
+        if not wanted:
+            return {}
+        if fresh:
+            records = self._fetch(wanted, cursor)
+        else:
+            records = self._lookup(wanted, cursor)
+        result = {}
+        for product_id in wanted:
+            record = records.get(product_id)
+            if not record or (active_only and record['status'] != 'active'):
+                continue
+            result[product_id] = {field: record[field] for field in fields} if fields is not None else dict(record)
+        return result
+
+    def _lookup(self, ids, cursor) -> Dict[int, Dict[str, Any]]:
+        records = self._from_local(ids)
+        missing = [product_id for product_id in ids if product_id not in records]
+        if missing:
+            records.update(self._from_redis(missing))
+            missing = [product_id for product_id in missing if product_id not in records]
+        if missing:
+            records.update(self._fetch(missing, cursor))
+        return records
+
+    def _from_local(self, ids) -> Dict[int, Dict[str, Any]]:
+        now = time.time()
+        found = {}
+        with self._lock:
+            for product_id in ids:
+                entry = self._local.get(product_id)
+                if not entry:
+                    continue
+                expires_at, record = entry
+                if expires_at <= now:
+                    del self._local[product_id]
+                    continue
+                self._local.move_to_end(product_id)
+                found[product_id] = record
+        return found
+
+    def _from_redis(self, ids) -> Dict[int, Dict[str, Any]]:
+        found = {}
+        for product_id, data in zip(ids, redis_client.mget([self._key(product_id) for product_id in ids])):
+            if not data:
+                continue
+            try:
+                found[product_id] = json.loads(data)
+            except ValueError:
+                continue
+        self._store_local(found)
+        return found
+
+    def _fetch(self, ids, cursor=None) -> Dict[int, Dict[str, Any]]:
+        placeholders = ','.join(['%s'] * len(ids))
+        query = f"SELECT {', '.join(CATALOG_FIELDS)} FROM products WHERE id IN ({placeholders})"
+        if cursor is not None:
+            cursor.execute(query, list(ids))
+            rows = cursor.fetchall()
+        else:
+            with db.get_cursor() as own_cursor:
+                own_cursor.execute(query, list(ids))
+                rows = own_cursor.fetchall()
+        records = {row['id']: _plain(row) for row in rows}
+        self._store_local(records)
+        try:
+            pipeline = redis_client.pipeline()
+            for product_id, record in records.items():
+                pipeline.setex(self._key(product_id), self.redis_ttl, json.dumps(record, default=str))
+            pipeline.execute()
+        except Exception as e:
+            logger.error(f"Failed to write product catalog cache: {e}")
+        return records
+
+    def _store_local(self, records: Dict[int, Dict[str, Any]]):
+        expires_at = time.time() + self.local_ttl
+        with self._lock:
+            for product_id, record in records.items():
+                self._local[product_id] = (expires_at, record)
+                self._local.move_to_end(product_id)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def invalidate(self, *ids: int):
+        """Call after a committed write to these products (other processes expire within local_ttl)."""
+        if not ids:
+            return
+        with self._lock:
+            for product_id in ids:
+                self._local.pop(int(product_id), None)
+        redis_client.delete(*[self._key(int(product_id)) for product_id in ids])
+
+
+product_catalog = ProductCatalog()
@@ -1,6 +1,6 @@
 from fastapi import HTTPException, Request
 from fastapi.security import HTTPBearer
-from typing import Optional
+from typing import Optional, Callable, Union
 import time
 from .redis_client import redis_client
 from .config import config
@@ -40,6 +40,8 @@ class RateLimiter:
                 )
 
             return True
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Rate limit check failed: {e}")
             # FIX: Fail open instead of blocking users during Redis issues
@@ -50,6 +52,83 @@ class RateLimiter:
 rate_limiter = RateLimiter()
 
 
+# ===== PER-ROUTE POLICIES =====
+class RateLimitPolicy:
+    """Named default cost for a group of routes.
+
+    Every policy draws from the same per-client budget (site settings
+    rate_limit_requests per rate_limit_window), so a client cannot stack the
+    catalog, cart and bulk allowances on top of each other.
+    """
+
+    def __init__(self, name: str, cost: int = 1, exempt: bool = False):
+        self.name = name
+        self.cost = cost
+        self.exempt = exempt
+
+
+def client_limits():
+    max_requests = config.rate_limit_requests or 100
+    window = config.rate_limit_window or 900
+    return int(max_requests), int(window)
+
+
+SEARCH_COST = 5
+BULK_COST = 5
+
+rate_limit_policies = {
+    'exempt': RateLimitPolicy('exempt', exempt=True),
+    'catalog': RateLimitPolicy('catalog'),
+    'cart': RateLimitPolicy('cart'),
+    'bulk': RateLimitPolicy('bulk', cost=BULK_COST),
+}
+
+
+def search_cost(request: Request) -> int:
+    """Full-text search hits MySQL much harder than a filtered listing."""
+    return SEARCH_COST if request.query_params.get('search') else 1
+
+
+def rate_limited(policy: Union[str, RateLimitPolicy], cost: Union[None, int, Callable[[Request], int]] = None):
+    """Build a route dependency that charges `cost` units (default: the policy's) against the client budget."""
+    if isinstance(policy, str):
+        policy = rate_limit_policies[policy]
+    if cost is None:
+        cost = policy.cost
+
+    async def _check(request: Request):
+        # Exempt routes never touch Redis
+        if policy.exempt or config.debug_mode:
+            return True
+
+        weight = cost(request) if callable(cost) else cost
+        if weight <= 0:
+            return True
+
+        max_requests, window = client_limits()
+        identifier = request.client.host if request.client else "unknown"
+        key = f"rate_limit:client:{identifier}:{int(time.time()) // window}"
+
+        try:
+            current = redis_client.incr(key, weight)
+            if current == weight:
+                redis_client.expire(key, window)
+        except Exception as e:
+            logger.error(f"Rate limit check failed for {policy.name}: {e}")
+            return True
+
+        if current > max_requests:
+            logger.warning(f"Rate limit exceeded for {policy.name}:{identifier} - {current}/{max_requests}")
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded. Try again in {window} seconds.",
+                headers={"Retry-After": str(window - int(time.time()) % window)}
+            )
+        return True
+
+    return _check
+
+
 class RateLimitBearer(HTTPBearer):
     async def __call__(self, request: Request):
         await rate_limiter.check_rate_limit(request)
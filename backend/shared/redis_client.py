@@ -133,6 +133,202 @@ class RedisClient:
             logger.error(f"Redis keys failed for pattern {pattern}: {e}")
             return []
 
+    def set_if_not_exists(self, key: str, value: str, expire: Optional[int] = None) -> bool:
+        """SET NX. Fails open (returns True) when Redis is unavailable."""
+        if not self._ensure_connection():
+            return True
+
+        try:
+            return bool(self.redis_client.set(key, value, nx=True, ex=expire))
+        except Exception as e:
+            logger.error(f"Redis set_if_not_exists failed for {key}: {e}")
+            return True
+
+    def sadd(self, key: str, *members) -> int:
+        if not self._ensure_connection():
+            return 0
+
+        try:
+            return self.redis_client.sadd(key, *members)
+        except Exception as e:
+            logger.error(f"Redis sadd failed for {key}: {e}")
+            return 0
+
+    def smembers(self, key: str) -> set:
+        if not self._ensure_connection():
+            return set()
+
+        try:
+            return self.redis_client.smembers(key)
+        except Exception as e:
+            logger.error(f"Redis smembers failed for {key}: {e}")
+            return set()
+
+    def sismember(self, key: str, member: str) -> bool:
+        if not self._ensure_connection():
+            return False
+
+        try:
+            return bool(self.redis_client.sismember(key, member))
+        except Exception as e:
+            logger.error(f"Redis sismember failed for {key}: {e}")
+            return False
+
+    def srem(self, key: str, *members) -> int:
+        if not self._ensure_connection():
+            return 0
+
+        try:
+            return self.redis_client.srem(key, *members)
+        except Exception as e:
+            logger.error(f"Redis srem failed for {key}: {e}")
+            return 0
+
+    def hset(self, key: str, mapping: dict) -> int:
+        if not self._ensure_connection():
+            return 0
+
+        try:
+            return self.redis_client.hset(key, mapping=mapping)
+        except Exception as e:
+            logger.error(f"Redis hset failed for {key}: {e}")
+            return 0
+
+    def hgetall(self, key: str) -> dict:
+        if not self._ensure_connection():
+            return {}
+
+        try:
+            return self.redis_client.hgetall(key)
+        except Exception as e:
+            logger.error(f"Redis hgetall failed for {key}: {e}")
+            return {}
+
+    def hmget(self, key: str, fields: list) -> list:
+        if not self._ensure_connection():
+            return [None] * len(fields)
+
+        try:
+            return self.redis_client.hmget(key, fields)
+        except Exception as e:
+            logger.error(f"Redis hmget failed for {key}: {e}")
+            return [None] * len(fields)
+
+    def mget(self, keys: list) -> list:
+        if not keys or not self._ensure_connection():
+            return [None] * len(keys)
+
+        try:
+            return self.redis_client.mget(keys)
+        except Exception as e:
+            logger.error(f"Redis mget failed for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+
+    def hdel(self, key: str, *fields) -> int:
+        if not self._ensure_connection():
+            return 0
+
+        try:
+            return self.redis_client.hdel(key, *fields)
+        except Exception as e:
+            logger.error(f"Redis hdel failed for {key}: {e}")
+            return 0
+
+    def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        if not self._ensure_connection():
+            return 0
+
+        try:
+            return self.redis_client.hincrby(key, field, amount)
+        except Exception as e:
+            logger.error(f"Redis hincrby failed for {key}: {e}")
+            return 0
+
+    def rename(self, key: str, new_key: str) -> bool:
+        """RENAME; False when the source key does not exist or Redis is unavailable."""
+        if not self._ensure_connection():
+            return False
+
+        try:
+            return bool(self.redis_client.rename(key, new_key))
+        except redis.ResponseError:
+            return False
+        except Exception as e:
+            logger.error(f"Redis rename failed for {key}: {e}")
+            return False
+
+    def eval(self, script: str, keys: list, args: list):
+        """Run a Lua script atomically. Returns None when Redis is unavailable."""
+        if not self._ensure_connection():
+            return None
+
+        try:
+            return self.redis_client.eval(script, len(keys), *keys, *args)
+        except Exception as e:
+            logger.error(f"Redis eval failed for {keys}: {e}")
+            return None
+
+    def ttl(self, key: str) -> int:
+        if not self._ensure_connection():
+            return -2
+
+        try:
+            return self.redis_client.ttl(key)
+        except Exception as e:
+            logger.error(f"Redis ttl failed for {key}: {e}")
+            return -2
+
+    def zadd(self, key: str, mapping: dict) -> int:
+        if not self._ensure_connection():
+            return 0
+
+        try:
+            return self.redis_client.zadd(key, mapping)
+        except Exception as e:
+            logger.error(f"Redis zadd failed for {key}: {e}")
+            return 0
+
+    def zrangebyscore(self, key: str, min_score, max_score) -> list:
+        if not self._ensure_connection():
+            return []
+
+        try:
+            return self.redis_client.zrangebyscore(key, min_score, max_score)
+        except Exception as e:
+            logger.error(f"Redis zrangebyscore failed for {key}: {e}")
+            return []
+
+    def zremrangebyscore(self, key: str, min_score, max_score) -> int:
+        if not self._ensure_connection():
+            return 0
+
+        try:
+            return self.redis_client.zremrangebyscore(key, min_score, max_score)
+        except Exception as e:
+            logger.error(f"Redis zremrangebyscore failed for {key}: {e}")
+            return 0
+
+    def publish(self, channel: str, message: str) -> int:
+        if not self._ensure_connection():
+            return 0
+
+        try:
+            return self.redis_client.publish(channel, message)
+        except Exception as e:
+            logger.error(f"Redis publish failed for {channel}: {e}")
+            return 0
+
+    def pubsub(self):
+        """Return a raw PubSub object, or None when Redis is unavailable"""
+        if not self._ensure_connection():
+            return None
+
+        try:
+            return self.redis_client.pubsub(ignore_subscribe_messages=True)
+        except Exception as e:
+            logger.error(f"Redis pubsub failed: {e}")
+            return None
+
     def ping(self) -> bool:
         if not self._ensure_connection():
             return False
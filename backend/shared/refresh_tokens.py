@@ -0,0 +1,146 @@
+import hashlib
+import secrets
+import time
+import uuid
+from typing import Optional, Dict, Any, Tuple
+from fastapi import HTTPException, status
+from .config import config
+from .redis_client import redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+# KEYS: family hash, user's family set. ARGV: family id, presented hash, next hash, ttl, now.
+# Returns 1 on rotation, 0 if the family is unknown or revoked, -1 on reuse.
+ROTATE_SCRIPT = """
+if redis.call('SISMEMBER', KEYS[2], ARGV[1]) == 0 then
+    redis.call('DEL', KEYS[1])
+    return 0
+end
+local current = redis.call('HGET', KEYS[1], 'current')
+if not current then
+    return 0
+end
+if current ~= ARGV[2] then
+    redis.call('DEL', KEYS[1])
+    redis.call('SREM', KEYS[2], ARGV[1])
+    return -1
+end
+redis.call('HSET', KEYS[1], 'current', ARGV[3], 'rotated_at', ARGV[5])
+redis.call('HINCRBY', KEYS[1], 'generation', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+
+
+def _hash_secret(secret: str) -> str:
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+class RefreshTokenStore:
+    """Rotating refresh tokens grouped into families.
+
+    A refresh token is `<family_id>.<secret>`. Each login starts a family: a
+    Redis hash holding the owner and the hash of the only secret that may be
+    redeemed next. Every refresh swaps in a new secret; presenting an older one
+    means the token was copied, so the whole family is revoked. A per-user set
+    lists live families, so "log out everywhere" is a single DEL.
+    """
+
+    def _family_key(self, family_id: str) -> str:
+        return f"refresh_family:{family_id}"
+
+    def _user_key(self, user_id: int) -> str:
+        return f"refresh_families:{user_id}"
+
+    @property
+    def ttl(self) -> int:
+        return int(config.refresh_token_expiry_days or 30) * 86400
+
+    @staticmethod
+    def parse(token: str) -> Optional[Tuple[str, str]]:
+        family_id, _, secret = (token or '').partition('.')
+        if not family_id or not secret:
+            return None
+        return family_id, secret
+
+    def issue(self, user_id: int, email: Optional[str] = None) -> Optional[str]:
+        family_id = uuid.uuid4().hex
+        secret = secrets.token_urlsafe(32)
+        ttl = self.ttl
+        now = str(int(time.time()))
+        stored = redis_client.hset(self._family_key(family_id), {
+            'user_id': str(user_id),
+            'email': email or '',
+            'current': _hash_secret(secret),
+            'generation': 0,
+            'created_at': now,
+            'rotated_at': now
+        })
+        if not stored:
+            logger.error(f"❌ Failed to store refresh token family for user {user_id}")
+            return None
+        redis_client.expire(self._family_key(family_id), ttl)
+        user_key = self._user_key(user_id)
+        redis_client.sadd(user_key, family_id)
+        if redis_client.ttl(user_key) < ttl:
+            redis_client.expire(user_key, ttl)
+        return f"{family_id}.{secret}"
+
+    def rotate(self, token: str) -> Tuple[Dict[str, Any], str]:
+        """Redeem a refresh token. Returns the family data and the replacement token."""
+        parsed = self.parse(token)
+        if not parsed:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+        family_id, secret = parsed
+        family = redis_client.hgetall(self._family_key(family_id))
+        if not family or not family.get('user_id'):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired refresh token")
+        user_id = int(family['user_id'])
+        next_secret = secrets.token_urlsafe(32)
+        result = redis_client.eval(
+            ROTATE_SCRIPT,
+            [self._family_key(family_id), self._user_key(user_id)],
+            [family_id, _hash_secret(secret), _hash_secret(next_secret), self.ttl, int(time.time())]
+        )
+        if result == -1:
+            logger.warning(f"🚨 Refresh token reuse detected for user {user_id}, family {family_id} revoked")
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token reuse detected")
+        if result != 1:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired refresh token")
+        return {'user_id': user_id, 'email': family.get('email') or None, 'family_id': family_id}, f"{family_id}.{next_secret}"
+
+    def revoke(self, token: str, user_id: Optional[int] = None) -> bool:
+        """Revoke the token's family. Only the current secret may do so, and only for its owner when user_id is given."""
+        parsed = self.parse(token)
+        if not parsed:
+            return False
+        family_id, secret = parsed
+        family = redis_client.hgetall(self._family_key(family_id))
+        if not family.get('user_id') or family.get('current') != _hash_secret(secret):
+            return False
+        if user_id is not None and int(family['user_id']) != int(user_id):
+            logger.warning(f"🚨 User {user_id} tried to revoke a refresh token family of user {family['user_id']}")
+            return False
+        redis_client.srem(self._user_key(int(family['user_id'])), family_id)
+        return redis_client.delete(self._family_key(family_id))
+
+    def revoke_all(self, user_id: int) -> bool:
+        """Revoke every refresh token of a user. Orphaned family hashes expire on their own."""
+        logger.info(f"Revoking all refresh token families for user {user_id}")
+        # Access tokens signed before authz_ver existed are rejected against this timestamp
+        redis_client.setex(f"refresh_revoked_at:{user_id}", self.ttl, str(int(time.time())))
+        return redis_client.delete(self._user_key(user_id))
+
+    def revoked_before(self, user_id: int, issued_at: Optional[float]) -> bool:
+        revoked_at = redis_client.get(f"refresh_revoked_at:{user_id}")
+        if not revoked_at:
+            return False
+        return not issued_at or issued_at <= int(revoked_at)
+
+    def active_families(self, user_id: int) -> int:
+        return len(redis_client.smembers(self._user_key(user_id)))
+
+
+refresh_token_store = RefreshTokenStore()
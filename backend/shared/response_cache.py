@@ -0,0 +1,71 @@
+import hashlib
+from typing import Any, Optional, Tuple
+from fastapi import Response
+from pydantic import BaseModel
+from .redis_client import redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_KEY_PREFIX = "response:"
+
+
+def encode_body(payload: Any) -> str:
+    """JSON body exactly as FastAPI would send it for a model or a list of models."""
+    if isinstance(payload, BaseModel):
+        return payload.model_dump_json()
+    if isinstance(payload, (list, tuple)):
+        return "[" + ",".join(encode_body(item) for item in payload) + "]"
+    if isinstance(payload, str):
+        return payload
+    raise TypeError(f"Cannot encode response payload of type {type(payload).__name__}")
+
+
+def content_etag(body: str) -> str:
+    return '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+
+
+class ResponseCache:
+    """Encoded JSON responses cached in Redis together with their ETag.
+
+    A hit is one GET and a raw Response: no json.loads, no model construction
+    and no response_model validation. Entries are stored as "<etag>\\n<body>".
+    Callers that version their content pass the expected ETag; an entry stored
+    under any other ETag is treated as a miss.
+    """
+
+    def _key(self, key: str) -> str:
+        return f"{RESPONSE_KEY_PREFIX}{key}"
+
+    def get(self, key: str, etag: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        entry = redis_client.get(self._key(key))
+        if not entry:
+            return None
+        stored_etag, _, body = entry.partition("\n")
+        if not body or (etag and stored_etag != etag):
+            return None
+        return body, stored_etag
+
+    def set(self, key: str, payload: Any, expire: int = 1800, etag: Optional[str] = None) -> Tuple[str, str]:
+        body = encode_body(payload)
+        etag = etag or content_etag(body)
+        redis_client.setex(self._key(key), expire, f"{etag}\n{body}")
+        return body, etag
+
+    def delete(self, *keys: str) -> bool:
+        if not keys:
+            return True
+        return redis_client.delete(*[self._key(key) for key in keys])
+
+    def delete_prefix(self, prefix: str) -> bool:
+        return redis_client.delete_pattern(f"{self._key(prefix)}*")
+
+    @staticmethod
+    def respond(body: str, etag: Optional[str] = None, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+        response_headers = dict(headers or {})
+        if etag:
+            response_headers['ETag'] = etag
+        return Response(content=body, status_code=status_code, media_type="application/json", headers=response_headers)
+
+
+response_cache = ResponseCache()
@@ -2,8 +2,13 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException, status
+import asyncio
 import secrets
+import threading
+import time
+import uuid
 import string
 import re
 from .config import config
@@ -14,6 +19,16 @@ logger = logging.getLogger(__name__)
 # Password hashing - CHANGED: Use Argon2 instead of bcrypt
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
+
+def build_pwd_context(time_cost: int, memory_cost: int, parallelism: int) -> CryptContext:
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        argon2__time_cost=time_cost,
+        argon2__memory_cost=memory_cost,
+        argon2__parallelism=parallelism
+    )
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     try:
         if not plain_password or not hashed_password:
@@ -43,6 +58,106 @@ def get_password_hash(password: str) -> str:
         logger.error(f"❌ Password hashing failed: {str(e)}")
         raise
 
+
+# Argon2 runs in a bounded thread pool (argon2-cffi releases the GIL) so
+# hashing never blocks the event loop.
+class PasswordHasher:
+    def __init__(self):
+        self._executor = None
+        self._workers = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._completed = 0
+        self._rejected = 0
+        self._total_seconds = 0.0
+        self.params = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._workers = max(1, config.password_hash_workers or 4)
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="argon2")
+        return self._executor
+
+    def configure(self, time_cost: int, memory_cost: int, parallelism: int):
+        global pwd_context
+        pwd_context = build_pwd_context(time_cost, memory_cost, parallelism)
+        self.params = {'time_cost': time_cost, 'memory_cost': memory_cost, 'parallelism': parallelism}
+        logger.info(f"🔐 Argon2 parameters: {self.params}")
+
+    def calibrate(self, target_ms: Optional[int] = None) -> Dict[str, int]:
+        """Pick time_cost so one hash takes about target_ms. Explicit argon2_time_cost wins."""
+        memory_cost = config.argon2_memory_cost or 65536
+        parallelism = config.argon2_parallelism or 2
+        if config.argon2_time_cost:
+            self.configure(config.argon2_time_cost, memory_cost, parallelism)
+            return self.params
+        target = (target_ms or config.argon2_target_ms or 50) / 1000
+        time_cost = 1
+        for candidate in range(1, 11):
+            context = build_pwd_context(candidate, memory_cost, parallelism)
+            start = time.perf_counter()
+            context.hash("calibration-password")
+            elapsed = time.perf_counter() - start
+            time_cost = candidate
+            if elapsed >= target:
+                break
+        self.configure(time_cost, memory_cost, parallelism)
+        return self.params
+
+    async def _run(self, func, *args):
+        limit = config.password_hash_queue_limit or 32
+        with self._lock:
+            if self._pending >= limit:
+                self._rejected += 1
+                logger.warning(f"Password hashing saturated: {self._pending} pending")
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Server is busy. Please try again shortly.",
+                    headers={"Retry-After": "1"}
+                )
+            self._pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+                self._total_seconds += time.perf_counter() - start
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = self._pending
+            workers = self._workers or max(1, config.password_hash_workers or 4)
+            return {
+                'workers': workers,
+                'in_flight': min(pending, workers),
+                'queue_depth': max(0, pending - workers),
+                'queue_limit': config.password_hash_queue_limit or 32,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'avg_ms': round(self._total_seconds / self._completed * 1000, 2) if self._completed else 0,
+                'params': self.params
+            }
+
+
+password_hasher = PasswordHasher()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.hash(password)
+
 # JWT token handling
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -52,6 +167,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=30)
 
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     to_encode.update({
         "exp": expire,
         "iat": datetime.utcnow(),  # FIX: Add issued at timestamp
@@ -116,6 +232,10 @@ def validate_phone(phone: str) -> bool:
     pattern = r'^\+?[1-9]\d{1,14}$'
     return re.match(pattern, phone) is not None
 
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Phone number as stored and looked up: spaces, dashes and brackets removed."""
+    return re.sub(r'[\s\-()]', '', phone) if phone else phone
+
 
 # In backend/shared/security.py - enhance password validation
 def validate_password_strength(password: str) -> Dict[str, Any]:
@@ -19,21 +19,11 @@ class SecureSessionMiddleware:
         self.session_header_name = "X-Secure-Session-ID"
         self.security_header_name = "X-Security-Token"
         self.csrf_header_name = "X-CSRF-Token"
-        self.session_config = config.get_session_config()
-        self._load_cookie_settings()
 
-    def _load_cookie_settings(self):
-        try:
-            self.cookie_samesite = self.session_config.get('cookie_samesite', 'Lax')
-            self.cookie_httponly = self.session_config.get('cookie_httponly', True)
-            self.cookie_secure = self.session_config.get('cookie_secure', True)
-            self.enable_secure_cookies = self.session_config.get('enable_secure_cookies', True)
-        except Exception as e:
-            logger.error(f"Failed to load cookie settings: {e}")
-            self.cookie_samesite = 'Lax'
-            self.cookie_httponly = True
-            self.cookie_secure = True
-            self.enable_secure_cookies = True
+    @property
+    def session_config(self):
+        # Read on every use so a reloaded snapshot takes effect without a restart
+        return config.get_session_config()
 
     async def __call__(self, scope, receive, send):
         if scope["type"] != "http":
@@ -227,7 +217,7 @@ class SecureSessionMiddleware:
             logger.debug(f"Setting session ID in headers: {session_id}")
 
         should_set_cookie = (is_new_session or
-                             (session_id and self.enable_secure_cookies and
+                             (session_id and self.session_config.enable_secure_cookies and
                               not request.cookies.get(self.session_cookie_name) and
                               # Don't set cookie if we're using header-based authentication
                               not request.headers.get('X-Secure-Session-ID') and
@@ -261,13 +251,13 @@ class SecureSessionMiddleware:
             max_age = session_service.guest_session_duration
 
         # Chrome-compatible cookie settings
-        is_secure = self.cookie_secure and not config.debug_mode
+        is_secure = self.session_config.cookie_secure and not config.debug_mode
         samesite_value = "Lax"  # Use Lax for Chrome compatibility
 
         cookie_parts = [
             f"{self.session_cookie_name}={session_id}",
             f"Max-Age={max_age}",
-            f"HttpOnly={str(self.cookie_httponly).lower()}",
+            f"HttpOnly={str(self.session_config.cookie_httponly).lower()}",
             f"SameSite={samesite_value}",
             "Path=/"
         ]
@@ -282,13 +272,13 @@ class SecureSessionMiddleware:
         max_age = session_service.guest_session_duration
 
         # Chrome-compatible cookie settings
-        is_secure = self.cookie_secure and not config.debug_mode
+        is_secure = self.session_config.cookie_secure and not config.debug_mode
         samesite_value = "Lax"
 
         cookie_parts = [
             f"guest_id={guest_id}",
             f"Max-Age={max_age}",
-            f"HttpOnly={str(self.cookie_httponly).lower()}",
+            f"HttpOnly={str(self.session_config.cookie_httponly).lower()}",
             f"SameSite={samesite_value}",
             "Path=/"
         ]
@@ -303,11 +293,11 @@ class SecureSessionMiddleware:
         cookie_parts = [
             f"guest_id={guest_id}",
             f"Max-Age={max_age}",
-            f"HttpOnly={str(self.cookie_httponly).lower()}",
-            f"SameSite={self.cookie_samesite}",
+            f"HttpOnly={str(self.session_config.cookie_httponly).lower()}",
+            f"SameSite={self.session_config.cookie_samesite}",
             "Path=/"
         ]
-        if self.cookie_secure or not config.debug_mode:
+        if self.session_config.cookie_secure or not config.debug_mode:
             cookie_parts.append("Secure")
         return "; ".join(cookie_parts)
 
@@ -9,6 +9,7 @@ from typing import Optional, Dict, Any, List, Tuple
 from shared import get_logger, db, config
 from .redis_client import redis_client
 from .session_models import SessionData, SessionType
+from .config import SessionConfig
 import ipaddress
 import re
 
@@ -17,8 +18,6 @@ logger = get_logger(__name__)
 
 class SecureSessionService:
     def __init__(self):
-        self.session_config = config.get_session_config()
-        self._load_configuration()
         self._redis_session_prefix = "secure_session:"
         self._redis_user_session_prefix = "secure_user_session:"
         self._redis_guest_session_prefix = "secure_guest_session:"
@@ -27,58 +26,22 @@ class SecureSessionService:
         self._redis_user_primary_session = "user_primary_session:"
         self._security_token_secret = config.jwt_secret.encode()
 
-    def _load_configuration(self):
-        try:
-            self.inactivity_timeout = self.session_config['inactivity_timeout']
-            self.guest_session_duration = self.session_config['guest_session_duration']
-            self.user_session_duration = self.session_config['user_session_duration']
-            self.max_session_age = self.session_config['max_session_age']
-            self.max_sessions_per_user = self.session_config['max_sessions_per_user']
-            self.session_rotation_interval = self.session_config['session_rotation_interval']
-            self.session_cleanup_interval = self.session_config['session_cleanup_interval']
-            self.rate_limit_attempts = self.session_config['session_rate_limit_attempts']
-            self.rate_limit_window = self.session_config['session_rate_limit_window']
-            self.rate_limit_attempts_create = self.session_config['rate_limit_session_create']
-            self.rate_limit_attempts_access = self.session_config['rate_limit_session_access']
-            self.rate_limit_attempts_update = self.session_config['rate_limit_session_update']
-            self.rate_limit_attempts_delete = self.session_config['rate_limit_session_delete']
-            self.enable_csrf_protection = self.session_config['enable_csrf_protection']
-            self.enable_ip_validation = self.session_config['enable_ip_validation']
-            self.enable_user_agent_validation = self.session_config['enable_user_agent_validation']
-            self.enable_session_rotation = self.session_config['enable_session_rotation']
-            self.require_security_token = self.session_config['require_security_token']
-            self.enable_session_fingerprinting = self.session_config['enable_session_fingerprinting']
-            self.max_failed_attempts = self.session_config['max_failed_attempts']
-            self.failed_attempts_window = self.session_config['failed_attempts_window']
-            logger.info("Session configuration loaded from database")
-        except Exception as e:
-            logger.error(f"Failed to load session configuration: {e}")
-            self._set_fallback_config()
-
-    def _set_fallback_config(self):
-        self.inactivity_timeout = 1800
-        self.guest_session_duration = 86400
-        self.user_session_duration = 2592000
-        self.max_session_age = 604800
-        self.max_sessions_per_user = 5
-        self.session_rotation_interval = 3600
-        self.session_cleanup_interval = 86400
-        self.rate_limit_attempts = 10
-        self.rate_limit_window = 60
-        self.enable_csrf_protection = True
-        self.enable_ip_validation = True
-        self.enable_user_agent_validation = True
-        self.enable_session_rotation = True
-        self.require_security_token = True
-        self.enable_session_fingerprinting = True
-        self.max_failed_attempts = 5
-        self.failed_attempts_window = 900
+    @property
+    def session_config(self) -> SessionConfig:
+        # Read on every use so a reloaded snapshot takes effect without a restart
+        return config.get_session_config()
+
+    @property
+    def user_session_duration(self) -> int:
+        return self.session_config.user_session_duration
+
+    @property
+    def guest_session_duration(self) -> int:
+        return self.session_config.guest_session_duration
 
     def refresh_configuration(self):
         try:
             config.refresh_session_config()
-            self.session_config = config.get_session_config()
-            self._load_configuration()
             logger.info("Session configuration refreshed from database")
         except Exception as e:
             logger.error(f"Failed to refresh session configuration: {e}")
@@ -120,19 +83,20 @@ class SecureSessionService:
                 return True
             if not redis_client._ensure_connection():
                 return True
+            session_config = self.session_config
             current_time = int(time.time())
-            window_start = current_time // self.rate_limit_window
+            window_start = current_time // session_config.session_rate_limit_window
             limits = {
-                "create": self.rate_limit_attempts_create,
-                "access": self.rate_limit_attempts_access,
-                "update": self.rate_limit_attempts_update,
-                "delete": self.rate_limit_attempts_delete
+                "create": session_config.rate_limit_session_create,
+                "access": session_config.rate_limit_session_access,
+                "update": session_config.rate_limit_session_update,
+                "delete": session_config.rate_limit_session_delete
             }
-            limit = limits.get(operation, self.rate_limit_attempts)
+            limit = limits.get(operation, session_config.session_rate_limit_attempts)
             rate_key = f"{self._rate_limit_key(identifier)}:{operation}:{window_start}"
             current_attempts = redis_client.incr(rate_key)
             if current_attempts == 1:
-                redis_client.expire(rate_key, self.rate_limit_window)
+                redis_client.expire(rate_key, session_config.session_rate_limit_window)
             if current_attempts > limit:
                 logger.warning(f"Rate limit exceeded for {operation}: {identifier}")
                 return False
@@ -147,7 +111,7 @@ class SecureSessionService:
                 return True
             fail_key = self._failed_attempts_key(identifier)
             failures = redis_client.get(fail_key)
-            if failures and int(failures) >= self.max_failed_attempts:
+            if failures and int(failures) >= self.session_config.max_failed_attempts:
                 logger.warning(f"Too many failed attempts for: {identifier}")
                 return False
             return True
@@ -161,7 +125,7 @@ class SecureSessionService:
                 fail_key = self._failed_attempts_key(identifier)
                 current_failures = redis_client.incr(fail_key)
                 if current_failures == 1:
-                    redis_client.expire(fail_key, self.failed_attempts_window)
+                    redis_client.expire(fail_key, self.session_config.failed_attempts_window)
         except Exception as e:
             logger.error(f"Failed to record failed attempt: {e}")
 
@@ -181,9 +145,9 @@ class SecureSessionService:
                 except Exception:
                     continue
 
-            if len(user_sessions) > self.max_sessions_per_user:
+            if len(user_sessions) > self.session_config.max_sessions_per_user:
                 user_sessions.sort(key=lambda x: x[1])
-                sessions_to_remove = user_sessions[:-self.max_sessions_per_user]
+                sessions_to_remove = user_sessions[:-self.session_config.max_sessions_per_user]
                 for session_id, _ in sessions_to_remove:
                     self.delete_session(session_id)
                     logger.info(f"Cleaned up old session {session_id} for user {user_id}")
@@ -299,15 +263,15 @@ class SecureSessionService:
                 cart_items = {}
 
             security_token = None
-            if self.require_security_token and session_data.get('ip_address'):
+            if self.session_config.require_security_token and session_data.get('ip_address'):
                 security_token = self._generate_security_token(session_id, session_data.get('ip_address', 'unknown'))
 
             csrf_token = None
-            if self.enable_csrf_protection:
+            if self.session_config.enable_csrf_protection:
                 csrf_token = self._generate_csrf_token()
 
             fingerprint = None
-            if self.enable_session_fingerprinting and session_data.get('user_agent') and session_data.get('ip_address'):
+            if self.session_config.enable_session_fingerprinting and session_data.get('user_agent') and session_data.get('ip_address'):
                 fingerprint = self._calculate_fingerprint(
                     session_data.get('user_agent', ''),
                     session_data.get('ip_address', 'unknown')
@@ -451,7 +415,7 @@ class SecureSessionService:
                         return None
 
                     # Rotate session if needed
-                    if self.enable_session_rotation and self._should_rotate_session(session):
+                    if self.session_config.enable_session_rotation and self._should_rotate_session(session):
                         logger.info(f"Rotating session {session_id}")
                         return self.rotate_session(session_id)
 
@@ -556,12 +520,12 @@ class SecureSessionService:
                 return True
 
             # For guest sessions, maintain stricter IP validation
-            if self.require_security_token and security_token:
+            if self.session_config.require_security_token and security_token:
                 if not self._validate_security_token(session.session_id, request_ip, security_token):
                     logger.warning("Invalid security token")
                     return False
 
-            if self.enable_ip_validation and session.ip_address and request_ip:
+            if self.session_config.enable_ip_validation and session.ip_address and request_ip:
                 try:
                     # For guest sessions, allow IP changes but track them
                     if request_ip not in session.ip_addresses:
@@ -574,7 +538,7 @@ class SecureSessionService:
                     logger.warning("Invalid IP address format")
                     return False
 
-            if self.enable_user_agent_validation and request_user_agent and session.fingerprint:
+            if self.session_config.enable_user_agent_validation and request_user_agent and session.fingerprint:
                 expected_fingerprint = self._calculate_fingerprint(request_user_agent, request_ip)
                 if session.fingerprint != expected_fingerprint:
                     logger.warning("User agent fingerprint mismatch - session may be compromised")
@@ -586,7 +550,7 @@ class SecureSessionService:
     def _should_rotate_session(self, session: SessionData) -> bool:
         try:
             session_age = datetime.utcnow() - session.created_at
-            return session_age.total_seconds() > self.session_rotation_interval
+            return session_age.total_seconds() > self.session_config.session_rotation_interval
         except Exception as e:
             logger.error(f"Failed to check session rotation: {e}")
             return False
@@ -0,0 +1,159 @@
+import hashlib
+import math
+import threading
+import time
+from typing import Optional
+from jose import jwt
+from .redis_client import redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+BLACKLIST_INDEX_KEY = "token_blacklist:index"
+BLACKLIST_CHANNEL = "token_blacklist:events"
+
+
+class BloomFilter:
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.sha256(item.encode()).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+def token_id(token: str) -> str:
+    """jti claim of the token; tokens issued before jti existed fall back to a hash."""
+    try:
+        jti = jwt.get_unverified_claims(token).get('jti')
+        if jti:
+            return str(jti)
+    except Exception:
+        pass
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenBlacklist:
+    """Revoked-token store keyed by jti.
+
+    Redis holds the authoritative entries; each process keeps a Bloom filter of
+    them so the common "not revoked" answer needs no network round-trip. The
+    filter is rebuilt from a Redis index every sync_interval seconds and updated
+    live through pub/sub when any process blacklists a token.
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001, sync_interval: int = 60):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._synced = False
+        self._last_sync = 0
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def migrate_legacy_entries(self) -> int:
+        """Re-key entries written as token_blacklist:<raw token> before jti keys existed."""
+        migrated = 0
+        for key in redis_client.keys("token_blacklist:eyJ*"):
+            token = key[len("token_blacklist:"):]
+            ttl = redis_client.ttl(key)
+            if ttl is None or ttl <= 0:
+                continue
+            jti = token_id(token)
+            redis_client.setex(f"token_blacklist:{jti}", ttl, "blacklisted")
+            redis_client.zadd(BLACKLIST_INDEX_KEY, {jti: time.time() + ttl})
+            redis_client.delete(key)
+            migrated += 1
+        if migrated:
+            logger.info(f"Migrated {migrated} legacy token blacklist entries")
+        return migrated
+
+    def sync(self) -> bool:
+        now = time.time()
+        if not redis_client.ping():
+            return False
+        if not self._synced:
+            self.migrate_legacy_entries()
+        redis_client.zremrangebyscore(BLACKLIST_INDEX_KEY, '-inf', now)
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        for jti in redis_client.zrangebyscore(BLACKLIST_INDEX_KEY, now, '+inf'):
+            bloom.add(jti)
+        with self._lock:
+            self._bloom = bloom
+            self._synced = True
+            self._last_sync = now
+        return True
+
+    def _ensure_started(self):
+        if self._listener is None or not self._listener.is_alive():
+            self._listener = threading.Thread(target=self._listen, name="token-blacklist-listener", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            pubsub = redis_client.pubsub()
+            if pubsub is None:
+                time.sleep(5)
+                continue
+            try:
+                pubsub.subscribe(BLACKLIST_CHANNEL)
+                # Catch anything revoked while we were not subscribed
+                self.sync()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        with self._lock:
+                            self._bloom.add(message['data'])
+                    if time.time() - self._last_sync >= self.sync_interval:
+                        self.sync()
+            except Exception as e:
+                logger.error(f"Token blacklist listener error: {e}")
+                time.sleep(5)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    def add(self, token: str, expire: int = 86400, exp: Optional[float] = None) -> bool:
+        jti = token_id(token)
+        if exp is None:
+            try:
+                exp = jwt.get_unverified_claims(token).get('exp')
+            except Exception:
+                exp = None
+        ttl = int(exp - time.time()) if exp else expire
+        if ttl <= 0:
+            return True
+        success = redis_client.setex(f"token_blacklist:{jti}", ttl, "blacklisted")
+        redis_client.zadd(BLACKLIST_INDEX_KEY, {jti: time.time() + ttl})
+        with self._lock:
+            self._bloom.add(jti)
+        redis_client.publish(BLACKLIST_CHANNEL, jti)
+        return success
+
+    def is_blacklisted(self, token: str) -> bool:
+        self._ensure_started()
+        jti = token_id(token)
+        if self._synced and jti not in self._bloom:
+            return False
+        if not self._synced and redis_client.exists(f"token_blacklist:{token}"):
+            # Legacy entry the first sync has not migrated yet
+            return True
+        return redis_client.exists(f"token_blacklist:{jti}")
+
+
+token_blacklist = TokenBlacklist()
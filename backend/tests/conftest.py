@@ -0,0 +1,11 @@
+import os
+import sys
+
+# shared.config refuses to load without these; nothing here talks to a real database
+for name, value in {
+    'DB_HOST': 'localhost', 'DB_NAME': 'test', 'DB_USER': 'test', 'DB_PASSWORD': 'test', 'JWT_SECRET': 'test-secret',
+    'JWT_ALGORITHM': 'HS256'
+}.items():
+    os.environ.setdefault(name, value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,39 @@
+import json
+import pytest
+from product import recommendations
+from product.recommendations import RecommendationEngine
+
+
+@pytest.fixture
+def neighbor_lists(monkeypatch):
+    stored = {}
+
+    def mget(keys):
+        return [stored.get(key) for key in keys]
+
+    monkeypatch.setattr(recommendations.redis_client, 'mget', mget)
+
+    def store(product_id, items):
+        stored[f"{recommendations.NEIGHBORS_KEY_PREFIX}{product_id}"] = json.dumps(items)
+    return store
+
+
+def test_recommend_scales_each_list_by_its_own_seed_weight(neighbor_lists):
+    neighbor_lists(1, [[10, 0.5], [11, 0.2]])
+    neighbor_lists(2, [[20, 0.9]])
+    ranked = RecommendationEngine().recommend([(1, 1.0), (2, 0.1)], limit=3)
+    # 10 -> 0.5, 11 -> 0.2, 20 -> 0.09
+    assert ranked == [10, 11, 20]
+
+
+def test_recommend_skips_seeds_excluded_and_duplicates(neighbor_lists):
+    neighbor_lists(1, [[2, 0.8], [10, 0.6], [11, 0.4]])
+    neighbor_lists(2, [[10, 0.9], [12, 0.7]])
+    ranked = RecommendationEngine().recommend([(1, 1.0), (2, 1.0)], limit=5, exclude=[12])
+    assert ranked == [10, 11]
+
+
+def test_recommend_respects_limit_and_missing_lists(neighbor_lists):
+    neighbor_lists(1, [[10, 0.5], [11, 0.4], [12, 0.3]])
+    ranked = RecommendationEngine().recommend([(1, 1.0), (3, 1.0)], limit=2)
+    assert ranked == [10, 11]
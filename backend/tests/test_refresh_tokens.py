@@ -0,0 +1,181 @@
+import asyncio
+from contextlib import contextmanager
+import pytest
+from fastapi import HTTPException, Response
+from starlette.requests import Request
+from shared import config, redis_client, create_access_token, permission_matrix, session_service
+from shared.refresh_tokens import refresh_token_store, ROTATE_SCRIPT
+from auth import routes as auth_routes
+from auth.models import RefreshRequest
+
+USER_ID = 7
+
+
+class FakeRedis:
+    """The handful of redis_client calls the refresh token code makes, kept in dicts."""
+
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+        self.sets = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, expire, value):
+        self.values[key] = str(value)
+        return True
+
+    def incr(self, key, amount=1):
+        self.values[key] = str(int(self.values.get(key, 0)) + amount)
+        return int(self.values[key])
+
+    def delete(self, *keys):
+        found = False
+        for key in keys:
+            for store in (self.values, self.hashes, self.sets):
+                found = store.pop(key, None) is not None or found
+        return found
+
+    def expire(self, key, expire):
+        return True
+
+    def ttl(self, key):
+        return -1
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({field: str(value) for field, value in mapping.items()})
+        return len(mapping)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+        return len(members)
+
+    def srem(self, key, *members):
+        self.sets.get(key, set()).difference_update(members)
+        return len(members)
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def eval(self, script, keys, args):
+        # Python rendering of ROTATE_SCRIPT, the only script this code runs
+        assert script == ROTATE_SCRIPT
+        family_key, user_key = keys
+        family_id, presented, next_hash = args[0], args[1], args[2]
+        if family_id not in self.sets.get(user_key, set()):
+            self.hashes.pop(family_key, None)
+            return 0
+        family = self.hashes.get(family_key)
+        if not family or 'current' not in family:
+            return 0
+        if family['current'] != presented:
+            self.hashes.pop(family_key, None)
+            self.sets[user_key].discard(family_id)
+            return -1
+        family['current'] = next_hash
+        family['rotated_at'] = str(args[4])
+        family['generation'] = str(int(family['generation']) + 1)
+        return 1
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = FakeRedis()
+    for name in ('get', 'setex', 'incr', 'delete', 'expire', 'ttl', 'hset', 'hgetall', 'sadd', 'srem', 'smembers', 'eval'):
+        monkeypatch.setattr(redis_client, name, getattr(fake, name))
+    # Settings come from their defaults instead of the (absent) database
+    monkeypatch.setattr(config, '_get_db', lambda: None)
+    monkeypatch.setattr(config, '_check_settings_version', lambda: None)
+    return fake
+
+
+@pytest.fixture
+def active_user(monkeypatch, fake_redis):
+    class Cursor:
+        def execute(self, query, params=None):
+            pass
+
+        def fetchone(self):
+            return {'is_active': 1}
+
+    @contextmanager
+    def get_cursor():
+        yield Cursor()
+
+    monkeypatch.setattr(auth_routes.db, 'get_cursor', get_cursor)
+    monkeypatch.setattr(permission_matrix, 'get_user_role_ids', lambda cursor, user_id: [2])
+    monkeypatch.setattr(permission_matrix, 'resolve', lambda role_ids: (['customer'], ['view_products']))
+    return USER_ID
+
+
+def _request(token=None):
+    headers = [(b'authorization', f"Bearer {token}".encode())] if token else []
+    return Request({'type': 'http', 'method': 'POST', 'path': '/api/v1/auth/refresh', 'headers': headers})
+
+
+def _refresh(refresh_token=None, bearer=None):
+    body = RefreshRequest(refresh_token=refresh_token) if refresh_token else None
+    return asyncio.run(auth_routes.refresh_token(_request(bearer), body, Response()))
+
+
+def _rejected(refresh_token=None, bearer=None) -> str:
+    with pytest.raises(HTTPException) as error:
+        _refresh(refresh_token, bearer)
+    assert error.value.status_code == 401
+    return error.value.detail
+
+
+def test_refresh_rotates_to_a_new_token_in_the_same_family(active_user):
+    first = refresh_token_store.issue(active_user, 'user@example.com')
+    issued = _refresh(first)
+    assert issued.access_token
+    assert issued.refresh_token and issued.refresh_token != first
+    assert issued.refresh_token.split('.')[0] == first.split('.')[0]
+    assert _refresh(issued.refresh_token).refresh_token != issued.refresh_token
+
+
+def test_replaying_a_rotated_token_revokes_the_family(active_user):
+    first = refresh_token_store.issue(active_user)
+    second = _refresh(first).refresh_token
+    assert _rejected(first) == "Refresh token reuse detected"
+    # The legitimate holder's newer token dies with the family
+    _rejected(second)
+    assert refresh_token_store.active_families(active_user) == 0
+
+
+def test_logout_all_invalidates_every_family(active_user, monkeypatch):
+    monkeypatch.setattr(auth_routes, 'invalidate_user_authorization', lambda user_id: None)
+    monkeypatch.setattr(session_service, 'invalidate_all_user_sessions', lambda user_id: True)
+    phone = refresh_token_store.issue(active_user)
+    laptop = _refresh(refresh_token_store.issue(active_user)).refresh_token
+    other_user = refresh_token_store.issue(active_user + 1)
+    asyncio.run(auth_routes.logout_all_devices(_request(), Response(), current_user={'sub': active_user}))
+    _rejected(phone)
+    _rejected(laptop)
+    assert _refresh(other_user).refresh_token
+
+
+def test_refresh_requires_a_refresh_token(active_user):
+    access_token = create_access_token({'sub': str(active_user), 'roles': ['customer'], 'authz_ver': 0})
+    assert _rejected(bearer=access_token) == "Refresh token required"
+
+
+def test_reset_token_cannot_be_exchanged_for_an_access_token(active_user):
+    reset_token = create_access_token({'sub': str(active_user), 'type': 'password_reset'})
+    assert _rejected(bearer=reset_token) == "Refresh token required"
+    # Nor passed off as a refresh token
+    assert _rejected(reset_token) == "Invalid or expired refresh token"
+
+
+def test_revoke_needs_the_current_secret_and_the_owner(fake_redis):
+    first = refresh_token_store.issue(USER_ID)
+    _, second = refresh_token_store.rotate(first)
+    assert not refresh_token_store.revoke(first)
+    assert not refresh_token_store.revoke(second, user_id=USER_ID + 1)
+    assert refresh_token_store.revoke(second, user_id=USER_ID)
+    with pytest.raises(HTTPException):
+        refresh_token_store.rotate(second)
@@ -1,8 +1,9 @@
+import asyncio
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
-from shared import config, setup_logging, get_logger, db
+from shared import config, setup_logging, get_logger, db, password_hasher
 from shared.session_middleware import SecureSessionMiddleware, get_session_id
 from .notification_routes import router as notification_router
 from .routes import router
@@ -123,6 +124,17 @@ async def maintenance_mode_middleware(request, call_next):
     return response
 
 
+@app.on_event("startup")
+async def startup_event():
+    # Password changes hash here too, so use the same calibrated cost as the auth service
+    try:
+        loop = asyncio.get_running_loop()
+        params = await loop.run_in_executor(None, password_hasher.calibrate)
+        logger.info(f"✅ Argon2 calibrated: {params}")
+    except Exception as e:
+        logger.error(f"❌ Argon2 calibration failed, using library defaults: {e}")
+
+
 app.include_router(router, prefix="/api/v1/users")
 
 
@@ -1,13 +1,13 @@
-from fastapi import APIRouter, HTTPException, Depends, Form, status, BackgroundTasks, UploadFile, File, Request, Header
+from fastapi import APIRouter, HTTPException, Depends, Form, status, BackgroundTasks, UploadFile, File, Request, Header, Response
 from typing import List, Optional, Dict, Any
 import html
-from shared import config, db, sanitize_input, get_logger, redis_client, rabbitmq_client
-from shared.security import verify_password, get_password_hash
-from shared.auth_middleware import get_current_user, require_roles
-from shared.rate_limiter import rate_limiter
+from shared import config, db, sanitize_input, normalize_phone, forget_unknown_login_ids, get_logger, redis_client, rabbitmq_client, product_catalog, refresh_token_store, principal_cache
+from shared.security import verify_password_async, get_password_hash_async
+from shared.auth_middleware import get_current_user, require_roles, invalidate_user_authorization
+from shared.rate_limiter import rate_limited
 from shared.session_service import session_service, SessionType
 from shared.session_middleware import get_session, get_session_id
-from shared.cart_migration import migrate_guest_cart_to_user
+from shared.cart_migration import migrate_guest_cart_to_user, get_cart_version
 from .models import (
     UserProfileResponse, UserProfileUpdate, AddressResponse,
     AddressCreate, WishlistResponse, CartResponse, HealthResponse
@@ -235,55 +235,6 @@ async def get_current_user_or_session(request: Request):
             "cart_items": {}
         }
 
-def migrate_guest_cart_to_user_database(guest_session, user_id: int, cursor):
-    try:
-        if not guest_session or not guest_session.cart_items:
-            return 0
-        migrated_count = 0
-        guest_cart_items = guest_session.cart_items.copy()
-        for item_key, item_data in guest_cart_items.items():
-            try:
-                product_id = item_data['product_id']
-                variation_id = item_data.get('variation_id')
-                quantity = item_data['quantity']
-                cursor.execute(
-                    "SELECT id, stock_quantity, max_cart_quantity FROM products WHERE id = %s AND status = 'active'",
-                    (product_id,)
-                )
-                product = cursor.fetchone()
-                if not product:
-                    continue
-                max_quantity = product['max_cart_quantity'] or 20
-                available_quantity = min(quantity, product['stock_quantity']) if product['stock_quantity'] > 0 else quantity
-                cursor.execute("""
-                    SELECT id, quantity FROM shopping_cart
-                    WHERE user_id = %s AND product_id = %s
-                    AND (variation_id = %s OR (variation_id IS NULL AND %s IS NULL))
-                """, (user_id, product_id, variation_id, variation_id))
-                existing_item = cursor.fetchone()
-                if existing_item:
-                    existing_quantity = existing_item['quantity']
-                    new_quantity = min(existing_quantity + available_quantity, max_quantity)
-                    cursor.execute("""
-                        UPDATE shopping_cart
-                        SET quantity = %s, updated_at = NOW()
-                        WHERE id = %s
-                    """, (new_quantity, existing_item['id']))
-                else:
-                    cursor.execute("""
-                        INSERT INTO shopping_cart (user_id, product_id, variation_id, quantity)
-                        VALUES (%s, %s, %s, %s)
-                    """, (user_id, product_id, variation_id, available_quantity))
-                migrated_count += 1
-                logger.info(f"✅ Migrated cart item: product {product_id}, quantity {available_quantity}")
-            except Exception as e:
-                logger.error(f"❌ Failed to migrate cart item {item_key}: {e}")
-                continue
-        return migrated_count
-    except Exception as e:
-        logger.error(f"❌ Cart migration failed: {e}")
-        return 0
-
 # ===== CART CONVERSION FUNCTIONS =====
 async def _convert_session_cart_to_response(cart_items: Dict[str, Any]) -> CartResponse:
     try:
@@ -310,15 +261,7 @@ async def _convert_session_cart_to_response(cart_items: Dict[str, Any]) -> CartR
                 continue
         if not product_ids:
             return CartResponse(items=[], subtotal=0.0, total_items=0)
-        with db.get_cursor() as cursor:
-            placeholders = ','.join(['%s'] * len(product_ids))
-            cursor.execute(f"""
-                SELECT id, name, slug, main_image_url, base_price,
-                       stock_quantity, stock_status, max_cart_quantity
-                FROM products
-                WHERE id IN ({placeholders}) AND status = 'active'
-            """, product_ids)
-            products = {p['id']: p for p in cursor.fetchall()}
+        products = product_catalog.get_many(product_ids)
         for product_id, product in products.items():
             if product_id in item_map:
                 item_data = item_map[product_id]['data']
@@ -503,7 +446,7 @@ async def update_user_profile(
                 update_params.append(sanitize_input(profile_data.last_name))
             if profile_data.phone is not None:
                 update_fields.append("phone = %s")
-                update_params.append(sanitize_input(profile_data.phone))
+                update_params.append(normalize_phone(sanitize_input(profile_data.phone)))
             if profile_data.username is not None:
                 update_fields.append("username = %s")
                 update_params.append(sanitize_input(profile_data.username))
@@ -537,17 +480,21 @@ async def update_user_profile(
             cursor.execute(update_query, update_params)
             cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
             updated_user = cursor.fetchone()
-            if background_tasks:
-                background_tasks.add_task(
-                    publish_user_event,
-                    updated_user,
-                    'profile_updated'
-                )
-            invalidate_user_cache(user_id)
-            cached_profile = get_cached_user_profile(user_id)
-            if cached_profile:
-                return UserProfileResponse(**cached_profile)
-            return await get_user_profile(current_user)
+        # After the commit, so a concurrent failed login cannot re-cache the new identifier as unknown
+        forget_unknown_login_ids(updated_user['phone'] if profile_data.phone is not None else None,
+                                 updated_user['username'] if profile_data.username is not None else None)
+        if background_tasks:
+            background_tasks.add_task(
+                publish_user_event,
+                updated_user,
+                'profile_updated'
+            )
+        invalidate_user_cache(user_id)
+        principal_cache.invalidate_user(user_id)
+        cached_profile = get_cached_user_profile(user_id)
+        if cached_profile:
+            return UserProfileResponse(**cached_profile)
+        return await get_user_profile(current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -810,16 +757,18 @@ async def remove_from_wishlist(
         )
 
 # ===== CART MANAGEMENT ENDPOINTS =====
-@router.get("/cart", response_model=CartResponse)
+@router.get("/cart", response_model=CartResponse, dependencies=[Depends(rate_limited('cart'))])
 async def get_cart(
         request: Request,
+        response: Response,
         current_user_or_session: dict = Depends(get_current_user_or_session)
 ):
     try:
-        await rate_limiter.check_rate_limit(request)
         user_id = current_user_or_session.get('user_id')
         is_guest = current_user_or_session.get('is_guest', True)
         session_id = current_user_or_session.get('session_id')
+        if not is_guest and user_id:
+            response.headers["X-Cart-Version"] = str(get_cart_version(user_id))
         logger.info(f"🛒 GET CART - User ID: {user_id}, Is Guest: {is_guest}, Session: {session_id}")
         if session_id:
             try:
@@ -945,13 +894,12 @@ async def explicit_migrate_guest_cart_to_user(
             "user_id": current_user['sub']
         }
 
-@router.delete("/cart")
+@router.delete("/cart", dependencies=[Depends(rate_limited('cart'))])
 async def clear_cart(
         request: Request,
         current_user_or_session: dict = Depends(get_current_user_or_session)
 ):
     try:
-        await rate_limiter.check_rate_limit(request)
         session_id = current_user_or_session.get('session_id')
         if not current_user_or_session.get('is_guest'):
             user_id = current_user_or_session['user_id']
@@ -992,26 +940,21 @@ async def add_to_cart(
     try:
         if quantity < 1:
             raise HTTPException(status_code=400, detail="Quantity must be at least 1")
-        with db.get_cursor() as cursor:
-            cursor.execute("""
-                SELECT id, name, stock_quantity, stock_status, max_cart_quantity, base_price
-                FROM products WHERE id = %s AND status = 'active'
-            """, (product_id,))
-            product = cursor.fetchone()
-            if not product:
-                raise HTTPException(status_code=404, detail="Product not found")
-            if product['stock_status'] == 'out_of_stock':
-                raise HTTPException(status_code=400, detail="Product is out of stock")
-            max_cart_quantity = getattr(config, 'max_cart_quantity_per_product', 20)
-            product_max_quantity = product['max_cart_quantity']
-            if product_max_quantity:
-                max_quantity = min(product_max_quantity, max_cart_quantity)
-            else:
-                max_quantity = max_cart_quantity
-            if quantity > product['stock_quantity'] and product['stock_status'] != 'on_backorder':
-                raise HTTPException(status_code=400, detail=f"Only {product['stock_quantity']} items available")
-            if quantity > max_quantity:
-                raise HTTPException(status_code=400, detail=f"Maximum {max_quantity} items can be added")
+        product = product_catalog.get(product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if product['stock_status'] == 'out_of_stock':
+            raise HTTPException(status_code=400, detail="Product is out of stock")
+        max_cart_quantity = getattr(config, 'max_cart_quantity_per_product', 20)
+        product_max_quantity = product['max_cart_quantity']
+        if product_max_quantity:
+            max_quantity = min(product_max_quantity, max_cart_quantity)
+        else:
+            max_quantity = max_cart_quantity
+        if quantity > product['stock_quantity'] and product['stock_status'] != 'on_backorder':
+            raise HTTPException(status_code=400, detail=f"Only {product['stock_quantity']} items available")
+        if quantity > max_quantity:
+            raise HTTPException(status_code=400, detail=f"Maximum {max_quantity} items can be added")
         session = current_user_or_session.get('session')
         session_id = current_user_or_session.get('session_id')
         if not current_user_or_session.get('is_guest'):
@@ -1102,7 +1045,7 @@ async def add_to_cart(
         logger.error(f"❌ Failed to add to cart: {e}")
         raise HTTPException(status_code=500, detail="Failed to add to cart")
 
-@router.put("/cart/{cart_item_id}")
+@router.put("/cart/{cart_item_id}", dependencies=[Depends(rate_limited('cart'))])
 async def update_cart_item(
         request: Request,
         cart_item_id: int,
@@ -1110,7 +1053,6 @@ async def update_cart_item(
         current_user_or_session: dict = Depends(get_current_user_or_session)
 ):
     try:
-        await rate_limiter.check_rate_limit(request)
         if quantity < 0:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -1164,19 +1106,15 @@ async def update_cart_item(
                         if quantity == 0:
                             del cart_items[item_key]
                         else:
-                            with db.get_cursor() as cursor:
-                                cursor.execute("""
-                                    SELECT stock_quantity, max_cart_quantity
-                                    FROM products WHERE id = %s
-                                """, (product_id,))
-                                product = cursor.fetchone()
-                                if product:
-                                    max_quantity = min(product['max_cart_quantity'] or 20, product['stock_quantity'])
-                                    if quantity > max_quantity:
-                                        raise HTTPException(
-                                            status_code=status.HTTP_400_BAD_REQUEST,
-                                            detail=f"Maximum {max_quantity} items available"
-                                        )
+                            product = product_catalog.get(product_id, fields=('stock_quantity', 'max_cart_quantity'),
+                                                          active_only=False)
+                            if product:
+                                max_quantity = min(product['max_cart_quantity'] or 20, product['stock_quantity'])
+                                if quantity > max_quantity:
+                                    raise HTTPException(
+                                        status_code=status.HTTP_400_BAD_REQUEST,
+                                        detail=f"Maximum {max_quantity} items available"
+                                    )
                             cart_items[item_key]['quantity'] = quantity
                         success = session_service.update_session_data(session_id, {"cart_items": cart_items})
                         if success:
@@ -1213,14 +1151,13 @@ async def update_cart_item(
             detail="Failed to update cart"
         )
 
-@router.delete("/cart/{cart_item_id}")
+@router.delete("/cart/{cart_item_id}", dependencies=[Depends(rate_limited('cart'))])
 async def remove_from_cart(
         request: Request,
         cart_item_id: int,
         current_user_or_session: dict = Depends(get_current_user_or_session)
 ):
     try:
-        await rate_limiter.check_rate_limit(request)
         session = current_user_or_session.get('session')
         session_id = current_user_or_session.get('session_id')
         if not current_user_or_session.get('is_guest'):
@@ -1409,12 +1346,11 @@ async def migrate_session_cart_to_user(request: Request, current_user: dict = De
             raise HTTPException(status_code=404, detail="User session not found")
         current_session = get_session(request)
         migrated_count = 0
-        with db.get_cursor() as cursor:
-            if current_session and current_session.session_type == SessionType.GUEST:
-                migrated_count = migrate_guest_cart_to_user_database(current_session, user_id, cursor)
-                logger.info(f"🔄 Migrated {migrated_count} cart items from guest session to user {user_id}")
-                if migrated_count > 0:
-                    session_service.update_session_activity(user_session.session_id)
+        if current_session and current_session.session_type == SessionType.GUEST:
+            migrated_count = migrate_guest_cart_to_user(current_session.session_id, user_id)
+            logger.info(f"🔄 Migrated {migrated_count} cart items from guest session to user {user_id}")
+            if migrated_count > 0:
+                session_service.update_session_activity(user_session.session_id)
         redis_client.delete(f"user_cart:{user_id}")
         logger.info(f"Cart migration completed for user {user_id}, {migrated_count} items migrated")
         return {
@@ -1465,6 +1401,7 @@ async def upload_avatar(
                 (f"/uploads/avatars/{unique_filename}", user_id)
             )
         invalidate_user_cache(user_id)
+        principal_cache.invalidate_user(user_id)
         return {
             "message": "Avatar uploaded successfully",
             "avatar_url": f"/uploads/avatars/{unique_filename}"
@@ -1559,7 +1496,7 @@ async def change_password(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="User not found"
                 )
-            if not verify_password(current_password, user_data['password_hash']):
+            if not await verify_password_async(current_password, user_data['password_hash']):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Current password is incorrect"
@@ -1567,12 +1504,12 @@ async def change_password(
             if user_data['previous_hashes']:
                 previous_hashes = user_data['previous_hashes'].split(',')
                 for old_hash in previous_hashes[-5:]:
-                    if verify_password(new_password, old_hash):
+                    if await verify_password_async(new_password, old_hash):
                         raise HTTPException(
                             status_code=status.HTTP_400_BAD_REQUEST,
                             detail="New password cannot be the same as any of your previous 5 passwords"
                         )
-            new_password_hash = get_password_hash(new_password)
+            new_password_hash = await get_password_hash_async(new_password)
             cursor.execute("START TRANSACTION")
             try:
                 cursor.execute(
@@ -1604,6 +1541,8 @@ async def change_password(
                 if user_sessions:
                     redis_client.delete(*user_sessions)
                 invalidate_user_cache(user_id)
+                refresh_token_store.revoke_all(user_id)
+                invalidate_user_authorization(user_id)
                 cursor.execute("""
                     INSERT INTO security_logs (user_id, action, ip_address, user_agent)
                     VALUES (%s, 'password_change', %s, %s)
@@ -1681,6 +1620,7 @@ async def update_user_status(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="User not found"
                 )
+            invalidate_user_authorization(user_id)
             action = "activated" if is_active else "deactivated"
             logger.info(f"User {user_id} {action} by admin {current_user['sub']}")
             return {"message": f"User {action} successfully"}
@@ -169,6 +169,22 @@ export const productService = {
     }
   },
 
+  getCategoryTree: async () => {
+    try {
+      console.log('📦 Fetching category tree...');
+      const response = await productApi.get('/categories/tree');
+      console.log('📦 Category tree response received');
+      return response.data;
+    } catch (error) {
+      console.error('❌ Error fetching category tree:', error);
+      if (error.response?.status === 503 || !error.response) {
+        console.log('🌐 Network error, returning empty category tree');
+        return [];
+      }
+      throw error;
+    }
+  },
+
   getCategoryBySlug: async (categorySlug) => {
     try {
       console.log(`📦 Fetching category by slug: ${categorySlug}`);
@@ -0,0 +1,21 @@
+-- Login resolves the identifier to a single column (email, phone or username)
+-- and needs each of them indexed. Older databases were created before the
+-- username column got its unique key, so add it only where it is missing.
+
+SET @username_indexed := (
+    SELECT COUNT(*) FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'users'
+      AND column_name = 'username'
+      AND seq_in_index = 1
+);
+
+SET @ddl := IF(@username_indexed = 0,
+    'ALTER TABLE users ADD UNIQUE KEY `idx_username` (`username`)',
+    'SELECT ''username index already present'' AS status');
+
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SELECT 'Login lookup indexes verified successfully!' as status;
@@ -0,0 +1,8 @@
+-- Registration relies on unique keys instead of pre-check SELECTs, so phone
+-- needs one too. NULL phones are allowed to repeat. Resolve any duplicate
+-- phone numbers before running this.
+
+ALTER TABLE `users`
+ADD UNIQUE KEY `uniq_phone` (`phone`);
+
+SELECT 'Users phone unique key added successfully!' as status;
@@ -0,0 +1,70 @@
+-- products.specification and products.image_gallery are read as JSON by the
+-- product service. Older databases hold them as text written with Python's
+-- str(), e.g. {'color': 'red', 'wifi': True}. Convert those values to JSON
+-- once, then make sure both columns are of type JSON.
+--
+-- Values that are still not valid JSON after the conversion (for example
+-- strings containing apostrophes) are copied to products_json_backfill_rejects
+-- and set to NULL so the ALTER can succeed. Review that table afterwards.
+
+CREATE TABLE IF NOT EXISTS products_json_backfill_rejects (
+    product_id int NOT NULL,
+    column_name varchar(32) NOT NULL,
+    original_value longtext,
+    created_at timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (product_id, column_name)
+);
+
+UPDATE products
+SET specification = REPLACE(REPLACE(REPLACE(REPLACE(specification,
+        '''', '"'), ': True', ': true'), ': False', ': false'), ': None', ': null')
+WHERE specification IS NOT NULL AND JSON_VALID(specification) = 0;
+
+UPDATE products
+SET image_gallery = REPLACE(image_gallery, '''', '"')
+WHERE image_gallery IS NOT NULL AND JSON_VALID(image_gallery) = 0;
+
+INSERT IGNORE INTO products_json_backfill_rejects (product_id, column_name, original_value)
+SELECT id, 'specification', specification FROM products
+WHERE specification IS NOT NULL AND JSON_VALID(specification) = 0;
+
+INSERT IGNORE INTO products_json_backfill_rejects (product_id, column_name, original_value)
+SELECT id, 'image_gallery', image_gallery FROM products
+WHERE image_gallery IS NOT NULL AND JSON_VALID(image_gallery) = 0;
+
+UPDATE products SET specification = NULL
+WHERE specification IS NOT NULL AND JSON_VALID(specification) = 0;
+
+UPDATE products SET image_gallery = NULL
+WHERE image_gallery IS NOT NULL AND JSON_VALID(image_gallery) = 0;
+
+SET @specification_type := (
+    SELECT DATA_TYPE FROM information_schema.columns
+    WHERE table_schema = DATABASE() AND table_name = 'products' AND column_name = 'specification'
+);
+
+SET @ddl := IF(@specification_type <> 'json',
+    'ALTER TABLE products MODIFY `specification` json DEFAULT NULL',
+    'SELECT ''specification already json'' AS status');
+
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @image_gallery_type := (
+    SELECT DATA_TYPE FROM information_schema.columns
+    WHERE table_schema = DATABASE() AND table_name = 'products' AND column_name = 'image_gallery'
+);
+
+SET @ddl := IF(@image_gallery_type <> 'json',
+    'ALTER TABLE products MODIFY `image_gallery` json DEFAULT NULL',
+    'SELECT ''image_gallery already json'' AS status');
+
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Listing documents cached from the old text values are rebuilt on next read
+-- once the Redis hash product_listing:docs is cleared.
+SELECT COUNT(*) AS rejected_values FROM products_json_backfill_rejects;
+SELECT 'Product JSON columns migrated successfully!' as status;
@@ -0,0 +1,71 @@
+-- Cursor pagination on product listings reads one index range per page:
+-- WHERE status = 'active' [AND flag] AND (sort_col, id) < cursor ORDER BY sort_col, id.
+-- InnoDB appends the primary key to every secondary index, so (status, sort_col)
+-- already orders ties by id. Each index is created only where it is missing.
+
+SET @exists := (
+    SELECT COUNT(*) FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'products' AND index_name = 'idx_status_created'
+);
+
+SET @ddl := IF(@exists = 0,
+    'ALTER TABLE products ADD KEY `idx_status_created` (`status`, `created_at`)',
+    'SELECT ''idx_status_created already present'' AS status');
+
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @exists := (
+    SELECT COUNT(*) FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'products' AND index_name = 'idx_featured_created'
+);
+
+SET @ddl := IF(@exists = 0,
+    'ALTER TABLE products ADD KEY `idx_featured_created` (`status`, `is_featured`, `created_at`)',
+    'SELECT ''idx_featured_created already present'' AS status');
+
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @exists := (
+    SELECT COUNT(*) FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'products' AND index_name = 'idx_bestseller_sold'
+);
+
+SET @ddl := IF(@exists = 0,
+    'ALTER TABLE products ADD KEY `idx_bestseller_sold` (`status`, `is_bestseller`, `total_sold`, `created_at`)',
+    'SELECT ''idx_bestseller_sold already present'' AS status');
+
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @exists := (
+    SELECT COUNT(*) FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'products' AND index_name = 'idx_status_price'
+);
+
+SET @ddl := IF(@exists = 0,
+    'ALTER TABLE products ADD KEY `idx_status_price` (`status`, `base_price`)',
+    'SELECT ''idx_status_price already present'' AS status');
+
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @exists := (
+    SELECT COUNT(*) FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'products' AND index_name = 'idx_status_sold'
+);
+
+SET @ddl := IF(@exists = 0,
+    'ALTER TABLE products ADD KEY `idx_status_sold` (`status`, `total_sold`)',
+    'SELECT ''idx_status_sold already present'' AS status');
+
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SELECT 'Product keyset pagination indexes verified successfully!' as status;
@@ -0,0 +1,19 @@
+-- products.image_variants maps each uploaded image URL to its generated sizes:
+-- {"/uploads/products/x.jpg": {"width": 2000, "height": 1500,
+--   "thumb": {"width": 160, "height": 120, "webp": "...", "avif": "..."}, "card": {...}, "detail": {...}}}
+-- Images uploaded before the column existed have no entry and are served as-is.
+
+SET @exists := (
+    SELECT COUNT(*) FROM information_schema.columns
+    WHERE table_schema = DATABASE() AND table_name = 'products' AND column_name = 'image_variants'
+);
+
+SET @ddl := IF(@exists = 0,
+    'ALTER TABLE products ADD COLUMN `image_variants` json DEFAULT NULL AFTER `image_gallery`',
+    'SELECT ''image_variants already present'' AS status');
+
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SELECT 'Product image variants column migrated successfully!' as status;
@@ -0,0 +1,22 @@
+-- Login looks phones up with spaces, dashes and brackets removed, and
+-- registration and profile updates now store them that way. Backfill older
+-- rows. A row whose normalised number already belongs to another user is
+-- left as is (uniq_phone would reject it); list those with the final SELECT
+-- and resolve them by hand.
+
+UPDATE `users` u
+LEFT JOIN (
+    SELECT REGEXP_REPLACE(`phone`, '[[:space:]()-]', '') AS normalized
+    FROM `users`
+    WHERE `phone` IS NOT NULL
+    AND `phone` = REGEXP_REPLACE(`phone`, '[[:space:]()-]', '')
+) existing ON existing.normalized = REGEXP_REPLACE(u.`phone`, '[[:space:]()-]', '')
+SET u.`phone` = REGEXP_REPLACE(u.`phone`, '[[:space:]()-]', '')
+WHERE u.`phone` REGEXP '[[:space:]()-]'
+AND existing.normalized IS NULL;
+
+SELECT id, phone AS unnormalized_phone
+FROM `users`
+WHERE `phone` REGEXP '[[:space:]()-]';
+
+SELECT 'Users phone numbers normalized successfully!' as status;